@@ -54,6 +54,8 @@ python manage.py migrate
 python manage.py compilemessages
 # Collect all staticfiles from dist/ and python packages to static/
 python manage.py collectstatic --noinput --clear
+# Write the deployed version, so that zds does not read it from the repository
+python manage.py write_version_file
 deactivate
 
 # Restart zds
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Key bits telling when a family of resources was last updated.
+
+A cached API response stays valid until the resources it shows change: the models signals store the date of the
+change (see `change_api_updated_at()`), and since this date is part of the key of the cached responses, the next
+request does not find the former response anymore. Each family is split by user or by object, so that a change only
+invalidates the responses concerned.
+"""
+
+import time
+
+from django.core.cache import get_cache
+from rest_framework_extensions.key_constructor.bits import KeyBitBase
+from rest_framework_extensions.settings import extensions_api_settings
+
+# Families of resources
+PRIVATE_TOPICS = 'private_topics'  # private topics of a member (by user)
+PRIVATE_POSTS = 'private_posts'  # messages of a private topic (by private topic)
+PROFILES = 'profiles'  # list of the members
+PROFILE = 'profile'  # profile of a member (by user)
+
+
+def get_updated_at_key(family, pk=None):
+    if pk is None:
+        return 'api_updated_{}'.format(family)
+    return 'api_updated_{}_{}'.format(family, pk)
+
+
+def get_api_updated_at(family, pk=None):
+    """
+    :param str family: the family of resources
+    :param pk: primary key of the user or object the resources belong to, `None` for a family shared by everyone
+    :return: the date of the last change of the resources, as a string
+    :rtype: str
+    """
+    cache = get_cache(extensions_api_settings.DEFAULT_USE_CACHE)
+    key = get_updated_at_key(family, pk)
+    value = cache.get(key)
+    if value is None:
+        value = repr(time.time())
+        cache.set(key, value, None)
+    return value
+
+
+def change_api_updated_at(family, pks=None):
+    """
+    Mark some resources as updated, which invalidates their cached responses.
+
+    :param str family: the family of resources
+    :param pks: primary keys of the users or objects the updated resources belong to, `None` for a family shared by
+        everyone
+    """
+    cache = get_cache(extensions_api_settings.DEFAULT_USE_CACHE)
+    value = repr(time.time())
+    if pks is None:
+        cache.set(get_updated_at_key(family), value, None)
+    else:
+        keys = [get_updated_at_key(family, pk) for pk in set(pks) if pk is not None]
+        if keys:
+            cache.set_many({key: value for key in keys}, None)
+
+
+class UpdatedAtKeyBit(KeyBitBase):
+    """
+    Date of the last change of a family of resources, split by an argument of the URL (or not split at all if
+    `url_kwarg` is `None`).
+    """
+
+    def __init__(self, family, url_kwarg=None):
+        super(UpdatedAtKeyBit, self).__init__()
+        self.family = family
+        self.url_kwarg = url_kwarg
+
+    def get_data(self, params, view_instance, view_method, request, args, kwargs):
+        pk = None if self.url_kwarg is None else kwargs.get(self.url_kwarg)
+        return get_api_updated_at(self.family, pk)
+
+
+class UserUpdatedAtKeyBit(UpdatedAtKeyBit):
+    """
+    Date of the last change of a family of resources, split by user: the resources of the authenticated user.
+    """
+
+    def get_data(self, params, view_instance, view_method, request, args, kwargs):
+        if not request.user.is_authenticated():
+            return u'anonymous'
+        return get_api_updated_at(self.family, request.user.pk)
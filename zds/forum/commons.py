@@ -2,10 +2,11 @@
 from datetime import datetime
 from django.core.exceptions import PermissionDenied
 from django.contrib import messages
+from django.db import transaction
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.views.generic.detail import SingleObjectMixin
-from zds.forum.models import Forum, TopicFollowed, follow, follow_by_email, Post, TopicRead
+from zds.forum.models import Forum, TopicFollowed, follow, follow_by_email, Post, TopicRead, move_topic_counters
 from django.utils.translation import ugettext as _
 from zds.utils.forums import get_tag_by_title
 from zds.utils.models import Alert, CommentLike, CommentDislike
@@ -60,6 +61,7 @@ class TopicEditMixin(object):
             except (KeyError, ValueError, TypeError):
                 raise Http404
             forum = get_object_or_404(Forum, pk=forum_pk)
+            former_forum = topic.forum
             topic.forum = forum
 
             # If the topic is moved in a restricted forum, users that cannot read this topic any more un-follow it.
@@ -70,7 +72,10 @@ class TopicEditMixin(object):
                     follower.delete()
 
             # Save topic to update update_index_date
-            topic.save()
+            with transaction.atomic():
+                topic.save()
+                if former_forum.pk != forum.pk:
+                    move_topic_counters(topic, former_forum)
             messages.success(request,
                              _(u"Le sujet « {0} » a bien été déplacé dans « {1} ».").format(topic.title, forum.title))
         else:
@@ -0,0 +1,15 @@
+# coding: utf-8
+
+from django.core.management.base import BaseCommand
+
+from zds.forum.models import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the numbers of topics and posts and the last post of every forum, and the number of posts of ' \
+           'every topic.'
+    # python manage.py rebuild_forum_counters
+
+    def handle(self, *args, **options):
+        rebuild_counters()
+        self.stdout.write(u'Counters of the topics and forums rebuilt.')
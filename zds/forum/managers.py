@@ -16,25 +16,22 @@ class ForumManager(models.Manager):
 
         :param category: the related category
         :type category: zds.forum.models.Category
-        :param with_count: optional parameter: if true, will preload thread and post number for each forum inside \
-        category
+        :param with_count: optional parameter: if true, will preload the last post of each forum inside category (the \
+        numbers of threads and posts are counters of the forums)
         :type with_count: bool
         """
         query_set = self.filter(category=category, group__isnull=True).select_related("category").distinct()
         if with_count:
-            # this request count the threads in each forum
-            thread_sub_query = "SELECT COUNT(*) FROM forum_topic WHERE forum_topic.forum_id=forum_forum.id"
-            # this request count the posts in each forum
-            post_sub_query = "SELECT COUNT(*) FROM forum_post WHERE forum_post.topic_id " \
-                             "IN(SELECT id FROM forum_topic WHERE forum_topic.forum_id=forum_forum.id)"
-
-            query_set = query_set.extra(select={"thread_count": thread_sub_query, "post_count": post_sub_query})
+            query_set = query_set.select_related("last_post__topic")
         return query_set.all()
 
     def get_private_forums_of_category(self, category, user):
-        return self.filter(category=category, group__in=user.groups.all())\
+        from zds.forum.models import get_forum_groups, get_readable_forum_pks
+        forum_groups = get_forum_groups()
+        private_forum_pks = [pk for pk in get_readable_forum_pks(user) if forum_groups.get(pk)]
+        return self.filter(category=category, pk__in=private_forum_pks)\
             .order_by('position_in_category')\
-            .select_related("category").distinct().all()
+            .select_related("category").all()
 
 
 class TopicManager(models.Manager):
@@ -50,8 +47,8 @@ class TopicManager(models.Manager):
         :param user: Request user.
         :return: List of topics.
         """
-        return self.filter(author=author) \
-                   .exclude(Q(forum__group__isnull=False) & ~Q(forum__group__in=user.groups.all())) \
+        from zds.forum.models import get_readable_forum_pks
+        return self.filter(author=author, forum__pk__in=get_readable_forum_pks(user)) \
                    .prefetch_related("author") \
                    .order_by("-pubdate") \
                    .all()[:settings.ZDS_APP['forum']['home_number']]
@@ -74,16 +71,16 @@ class TopicManager(models.Manager):
             .prefetch_related('last_message', 'tags').all()
 
     def get_all_topics_of_a_user(self, current, target):
-        return self.filter(author=target)\
-            .exclude(Q(forum__group__isnull=False) & ~Q(forum__group__in=current.groups.all()))\
+        from zds.forum.models import get_readable_forum_pks
+        return self.filter(author=target, forum__pk__in=get_readable_forum_pks(current))\
             .prefetch_related("author")\
             .order_by("-pubdate").all()
 
     def get_all_topics_of_a_tag(self, tag, user):
-        return self.filter(tags__in=[tag])\
+        from zds.forum.models import get_readable_forum_pks
+        return self.filter(tags__in=[tag], forum__pk__in=get_readable_forum_pks(user))\
             .order_by("-last_message__pubdate")\
             .prefetch_related('author', 'last_message', 'tags')\
-            .exclude(Q(forum__group__isnull=False) & ~Q(forum__group__in=user.groups.all()))\
             .all()
 
 
@@ -101,14 +98,14 @@ class PostManager(InheritanceManager):
             .order_by("position").all()
 
     def get_all_messages_of_a_user(self, current, target):
+        from zds.forum.models import get_readable_forum_pks
+        readable_forum_pks = get_readable_forum_pks(current)
         if current.has_perm("forum.change_post"):
-            return self.filter(author=target)\
-                .exclude(Q(topic__forum__group__isnull=False) & ~Q(topic__forum__group__in=current.groups.all()))\
+            return self.filter(author=target, topic__forum__pk__in=readable_forum_pks)\
                 .prefetch_related("author")\
                 .order_by("-pubdate").all()
-        return self.filter(author=target)\
+        return self.filter(author=target, topic__forum__pk__in=readable_forum_pks)\
             .filter(is_visible=True)\
-            .exclude(Q(topic__forum__group__isnull=False) & ~Q(topic__forum__group__in=current.groups.all()))\
             .prefetch_related("author")\
             .order_by("-pubdate").all()
 
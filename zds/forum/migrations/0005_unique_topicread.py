@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicates(apps, schema_editor):
+    """Keep only the last TopicRead of each (topic, user) pair."""
+    TopicRead = apps.get_model('forum', 'TopicRead')
+    duplicates = TopicRead.objects\
+        .values('topic', 'user')\
+        .annotate(last_pk=Max('pk'), count=Count('pk'))\
+        .filter(count__gt=1)
+    for duplicate in duplicates:
+        TopicRead.objects\
+            .filter(topic__pk=duplicate['topic'], user__pk=duplicate['user'])\
+            .exclude(pk=duplicate['last_pk'])\
+            .delete()
+
+
+def keep_rows(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0004_topic_update_index_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, keep_rows),
+        migrations.AlterUniqueTogether(
+            name='topicread',
+            unique_together=set([('topic', 'user')]),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+
+
+# Fill the counters from the current topics and posts (see `zds.forum.models.COUNTERS_SQL`).
+TOPIC_COUNTERS_SQL = '''
+    update forum_topic
+    set post_count = (select count(*) from forum_post p where p.topic_id = forum_topic.id)'''
+
+FORUM_COUNTERS_SQL = '''
+    update forum_forum
+    set topic_count = (select count(*) from forum_topic t where t.forum_id = forum_forum.id),
+        post_count = (select coalesce(sum(t.post_count), 0) from forum_topic t where t.forum_id = forum_forum.id),
+        last_post_id = (select max(t.last_message_id) from forum_topic t where t.forum_id = forum_forum.id)'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0005_unique_topicread'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forum',
+            name='last_post',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, editable=False, to='forum.Post', null=True, verbose_name=b'Dernier message'),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='forum',
+            name='post_count',
+            field=models.IntegerField(default=0, verbose_name=b'Nombre de messages', editable=False),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='forum',
+            name='topic_count',
+            field=models.IntegerField(default=0, verbose_name=b'Nombre de sujets', editable=False),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='post_count',
+            field=models.IntegerField(default=0, verbose_name=b'Nombre de messages', editable=False),
+            preserve_default=True,
+        ),
+        migrations.RunSQL(TOPIC_COUNTERS_SQL, 'update forum_topic set post_count = 0'),
+        migrations.RunSQL(FORUM_COUNTERS_SQL,
+                          'update forum_forum set topic_count = 0, post_count = 0, last_post_id = null'),
+    ]
@@ -1,7 +1,7 @@
 # coding: utf-8
 
 from django.conf import settings
-from django.db import models
+from django.db import models, connection, transaction
 from zds.settings import ZDS_APP
 from zds.utils import slugify
 from math import ceil
@@ -11,12 +11,48 @@ import uuid
 
 from django.contrib.auth.models import Group, User
 from datetime import datetime, timedelta
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db.models import F, Max
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from django.utils.encoding import smart_text
 
 from zds.forum.managers import TopicManager, ForumManager, PostManager, TopicReadManager
 from zds.utils import get_current_user
+from zds.utils.misc import upsert
 from zds.utils.models import Comment, Tag
+from zds.utils.signals import content_read, content_followed
+
+
+# Filters of the list of the topics of a forum
+TOPIC_FILTERS = ['all', 'solve', 'unsolve', 'noanswer']
+
+# Recompute the counters of all the topics and forums, in two statements (see `rebuild_counters()`). The last post of
+# a forum is its most recent one, the posts being numbered in the order of their creation.
+COUNTERS_SQL = [
+    '''
+    update forum_topic
+    set post_count = (select count(*) from forum_post p where p.topic_id = forum_topic.id)''',
+    '''
+    update forum_forum
+    set topic_count = (select count(*) from forum_topic t where t.forum_id = forum_forum.id),
+        post_count = (select coalesce(sum(t.post_count), 0) from forum_topic t where t.forum_id = forum_forum.id),
+        last_post_id = (select max(t.last_message_id) from forum_topic t where t.forum_id = forum_forum.id)''',
+]
+
+
+def exclude_counters(instance, counters, kwargs):
+    """
+    Keep the counters of an instance out of the update of its row: they are only changed with `F()` expressions (see
+    the receivers below), and the values loaded with the instance may be outdated by now.
+
+    :param counters: names of the counter fields
+    :param kwargs: arguments of `save()`, given `update_fields` if they had none
+    """
+    if not instance._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+        kwargs['update_fields'] = [field.name for field in instance._meta.concrete_fields
+                                   if not field.primary_key and field.name not in counters]
 
 
 def sub_tag(tag):
@@ -109,6 +145,13 @@ class Forum(models.Model):
                                                null=True, blank=True, db_index=True)
 
     slug = models.SlugField(max_length=80, unique=True)
+
+    # Counters, updated with the topics and posts (see the receivers below and `rebuild_counters()`)
+    topic_count = models.IntegerField('Nombre de sujets', default=0, editable=False)
+    post_count = models.IntegerField('Nombre de messages', default=0, editable=False)
+    last_post = models.ForeignKey('Post', null=True, blank=True, related_name='+', on_delete=models.SET_NULL,
+                                  editable=False, verbose_name='Dernier message')
+
     objects = ForumManager()
 
     def __unicode__(self):
@@ -117,36 +160,33 @@ class Forum(models.Model):
     def get_absolute_url(self):
         return reverse('forum-topics-list', kwargs={'cat_slug': self.category.slug, 'forum_slug': self.slug})
 
-    def get_topic_count(self):
-        """Retrieve or agregate the number of threads in this forum. If this number already exists, it must be stored \
-        in thread_count. Otherwise it will process a SQL query
+    def save(self, *args, **kwargs):
+        exclude_counters(self, ('topic_count', 'post_count', 'last_post'), kwargs)
+        super(Forum, self).save(*args, **kwargs)
 
+    def get_topic_count(self):
+        """
         :return: the number of threads in the forum.
         """
-        try:
-            return self.thread_count
-        except AttributeError:
-            return Topic.objects.filter(forum=self).count()
+        return self.topic_count
 
     def get_post_count(self):
-        """Retrieve or agregate the number of posts in this forum. If this number already exists, it must be stored \
-        in post_count. Otherwise it will process a SQL query
-
+        """
         :return: the number of posts for a forum.
         """
-        try:
-            return self.post_count
-        except AttributeError:
-            return Post.objects.filter(topic__forum=self).count()
+        return self.post_count
 
     def get_last_message(self):
         """
         :return: the last message on the forum, if there are any.
         """
-        try:
-            return Post.objects.filter(topic__forum=self).order_by('-pubdate').all()[0]
-        except IndexError:
-            return None
+        return self.last_post
+
+    def update_last_post(self):
+        """Look for the last post of the forum again, after a topic left it or a post was deleted."""
+        last_post_pk = Topic.objects.filter(forum__pk=self.pk).aggregate(last=Max('last_message'))['last']
+        Forum.objects.filter(pk=self.pk).update(last_post=last_post_pk)
+        self.last_post_id = last_post_pk
 
     def can_read(self, user):
         """
@@ -158,16 +198,7 @@ class Forum(models.Model):
         :return: `True` if the user can read this forum, `False` otherwise.
         """
 
-        if self.group.count() == 0:
-            return True
-        else:
-            if user is not None and user.is_authenticated():
-                groups = Group.objects.filter(user=user).all()
-                return Forum.objects.filter(
-                    group__in=groups,
-                    pk=self.pk).exists()
-            else:
-                return False
+        return self.pk in get_readable_forum_pks(user)
 
 
 class Topic(models.Model):
@@ -209,6 +240,9 @@ class Topic(models.Model):
         blank=True,
         db_index=True)
 
+    # Counter, updated with the posts (see the receivers below and `rebuild_counters()`)
+    post_count = models.IntegerField('Nombre de messages', default=0, editable=False)
+
     # This attribute is the link between beta of tutorials and topic of these beta.
     # In Tuto logic we can found something like this: `Topic.objet.get(key=tutorial.pk)`
     # TODO: 1. Use a better name, 2. maybe there can be a cleaner way to do this
@@ -222,6 +256,10 @@ class Topic(models.Model):
     def get_absolute_url(self):
         return reverse('topic-posts-list', args=[self.pk, self.slug()])
 
+    def save(self, *args, **kwargs):
+        exclude_counters(self, ('post_count',), kwargs)
+        super(Topic, self).save(*args, **kwargs)
+
     def slug(self):
         return slugify(self.title)
 
@@ -229,7 +267,7 @@ class Topic(models.Model):
         """
         :return: the number of posts in the topic.
         """
-        return Post.objects.filter(topic__pk=self.pk).count()
+        return self.post_count
 
     def get_last_post(self):
         """
@@ -295,9 +333,8 @@ class Topic(models.Model):
         try:
             return TopicRead.objects \
                             .select_related() \
-                            .filter(topic__pk=self.pk,
-                                    user__pk=get_current_user().pk) \
-                            .latest('post__position').post
+                            .get(topic__pk=self.pk,
+                                 user__pk=get_current_user().pk).post
         except TopicRead.DoesNotExist:
             return self.first_post()
 
@@ -330,9 +367,8 @@ class Topic(models.Model):
         """
         t_read = TopicRead.objects\
                           .select_related('post')\
-                          .filter(topic__pk=self.pk,
-                                  user__pk=user.pk) \
-                          .latest('post__position')
+                          .get(topic__pk=self.pk,
+                               user__pk=user.pk)
         if t_read:
             return t_read.post.pk, t_read.post.position
         return Post.objects\
@@ -365,9 +401,9 @@ class Topic(models.Model):
         # TODO: Why 2 nearly-identical functions? What is the functional need of these 2 things?
         try:
             last_post = TopicRead.objects \
-                                 .filter(topic__pk=self.pk,
-                                         user__pk=get_current_user().pk) \
-                                 .latest('post__position').post
+                                 .select_related('post') \
+                                 .get(topic__pk=self.pk,
+                                      user__pk=get_current_user().pk).post
 
             next_post = Post.objects.filter(topic__pk=self.pk,
                                             position__gt=last_post.position) \
@@ -482,8 +518,8 @@ class TopicRead(models.Model):
     class Meta:
         verbose_name = 'Sujet lu'
         verbose_name_plural = 'Sujets lus'
+        unique_together = ('topic', 'user')
 
-    # TODO: ça a l'air d'être OK en base, mais ne devrait-il pas y avoir une contrainte unique sur (topic, user) ?
     topic = models.ForeignKey(Topic, db_index=True)
     post = models.ForeignKey(Post, db_index=True)
     user = models.ForeignKey(User, related_name='topics_read', db_index=True)
@@ -540,13 +576,8 @@ def mark_read(topic, user=None):
         user = get_current_user()
 
     if user and user.is_authenticated():
-        # TODO: voilà entre autres pourquoi il devrait y avoir une contrainte unique sur (topic, user) sur TopicRead.
-        current_topic_read = TopicRead.objects.filter(topic=topic, user=user).first()
-        if current_topic_read is None:
-            current_topic_read = TopicRead(post=topic.last_message, topic=topic, user=user)
-        else:
-            current_topic_read.post = topic.last_message
-        current_topic_read.save()
+        upsert(TopicRead, {'topic_id': topic.pk, 'user_id': user.pk}, {'post_id': topic.last_message_id})
+        content_read.send(sender=Topic, instance=topic, user=user)
 
 
 def follow(topic, user=None):
@@ -567,10 +598,12 @@ def follow(topic, user=None):
         # Make the user follow the topic
         topic_followed = TopicFollowed(topic=topic, user=user)
         topic_followed.save()
+        content_followed.send(sender=Topic, instance=topic, user=user)
         return True
 
     # If user is already following the topic, we make him don't anymore
     existing.delete()
+    content_followed.send(sender=Topic, instance=topic, user=user)
     return False
 
 
@@ -592,6 +625,7 @@ def follow_by_email(topic, user=None):
         # Make the user follow the topic
         topic_followed = TopicFollowed(topic=topic, user=user, email=True)
         topic_followed.save()
+        content_followed.send(sender=Topic, instance=topic, user=user)
         return True
 
     existing.email = not existing.email
@@ -601,15 +635,183 @@ def follow_by_email(topic, user=None):
 
 def get_last_topics(user):
     """Returns the 5 very last topics."""
-    # TODO semble inutilisé (et peu efficace dans la manière de faire)
-    topics = Topic.objects.all().order_by('-last_message__pubdate')
-
-    tops = []
-    cpt = 1
-    for topic in topics:
-        if topic.forum.can_read(user):
-            tops.append(topic)
-            cpt += 1
-        if cpt > 5:
-            break
-    return tops
+    # TODO semble inutilisé
+    return list(Topic.objects
+                .filter(forum__pk__in=get_readable_forum_pks(user))
+                .order_by('-last_message__pubdate')
+                .select_related('forum')[:5])
+
+
+# Access to the forums: the groups allowed to read each forum are kept in the cache, under a key changed (see
+# `change_forum_groups_version()`) whenever a forum or its groups change. The forums readable by a member are cached
+# under the same version, and removed when the groups of the member change.
+FORUM_GROUPS_VERSION_KEY = 'forum_groups_version'
+
+
+def get_forum_groups_version():
+    version = cache.get(FORUM_GROUPS_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(FORUM_GROUPS_VERSION_KEY, version, None)
+    return version
+
+
+def change_forum_groups_version():
+    """Forget the groups of the forums and the forums readable by each member."""
+    cache.set(FORUM_GROUPS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_readable_forums_key(version, user_pk):
+    return 'forum_readable_{}_{}'.format(version, user_pk)
+
+
+def get_forum_groups(version=None):
+    """
+    :param version: the version of the groups of the forums, the current one if `None`
+    :return: the groups allowed to read each forum, as a dictionary `{forum pk: frozenset of group pks}` (the set is \
+    empty for a public forum)
+    :rtype: dict
+    """
+    if version is None:
+        version = get_forum_groups_version()
+    key = 'forum_groups_{}'.format(version)
+    forum_groups = cache.get(key)
+    if forum_groups is None:
+        groups = {}
+        for forum_pk, group_pk in Forum.objects.order_by().values_list('pk', 'group__pk'):
+            forum_group_pks = groups.setdefault(forum_pk, set())
+            if group_pk is not None:
+                forum_group_pks.add(group_pk)
+        forum_groups = {forum_pk: frozenset(group_pks) for forum_pk, group_pks in groups.items()}
+        cache.set(key, forum_groups, settings.ZDS_APP['forum']['access_cache_timeout'])
+    return forum_groups
+
+
+def get_readable_forum_pks(user):
+    """
+    :param user: a member, or an anonymous user (or `None`)
+    :return: the pks of the forums the user can read: the public forums, and the forums of the groups of the user
+    :rtype: frozenset
+    """
+    version = get_forum_groups_version()
+    authenticated = user is not None and user.is_authenticated()
+    key = get_readable_forums_key(version, user.pk if authenticated else 'anonymous')
+    forum_pks = cache.get(key)
+    if forum_pks is None:
+        user_group_pks = set(user.groups.values_list('pk', flat=True)) if authenticated else set()
+        forum_pks = frozenset(forum_pk for forum_pk, group_pks in get_forum_groups(version).items()
+                              if not group_pks or group_pks & user_group_pks)
+        cache.set(key, forum_pks, settings.ZDS_APP['forum']['access_cache_timeout'])
+    return forum_pks
+
+
+@receiver(post_save, sender=Forum)
+def invalidate_forum_groups_on_save(sender, instance, created, **kwargs):
+    if created:
+        change_forum_groups_version()
+
+
+@receiver(post_delete, sender=Forum)
+@receiver(post_delete, sender=Group)
+def invalidate_forum_groups_on_delete(sender, instance, **kwargs):
+    # the links between the forums and a deleted group are deleted without `m2m_changed` signal
+    change_forum_groups_version()
+
+
+@receiver(m2m_changed, sender=Forum.group.through)
+def invalidate_forum_groups(sender, action, **kwargs):
+    if action.startswith('post_'):
+        change_forum_groups_version()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_readable_forums(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        cache.delete(get_readable_forums_key(get_forum_groups_version(), instance.pk))
+    elif pk_set is None:  # all the members of a group were removed
+        change_forum_groups_version()
+    else:
+        version = get_forum_groups_version()
+        cache.delete_many([get_readable_forums_key(version, user_pk) for user_pk in pk_set])
+
+
+def get_topic_pages_key(forum_pk, filter_param):
+    """
+    :return: the cache key of the pages of the topics of a forum (see `zds.utils.paginator.SeekPaginator`)
+    :rtype: str
+    """
+    return 'forum_topic_pages_{}_{}'.format(forum_pk, filter_param)
+
+
+def clear_topic_pages(forum_pk):
+    cache.delete_many([get_topic_pages_key(forum_pk, filter_param) for filter_param in TOPIC_FILTERS])
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def invalidate_topic_pages(sender, instance, **kwargs):
+    # the topics are ordered by their last message, which is saved with the topic
+    clear_topic_pages(instance.forum_id)
+
+
+@receiver(post_save, sender=Topic)
+def count_new_topic(sender, instance, created, **kwargs):
+    if created:
+        Forum.objects.filter(pk=instance.forum_id).update(topic_count=F('topic_count') + 1)
+
+
+@receiver(post_delete, sender=Topic)
+def uncount_deleted_topic(sender, instance, **kwargs):
+    # its posts were deleted (and uncounted) before
+    Forum.objects.filter(pk=instance.forum_id).update(topic_count=F('topic_count') - 1)
+    Forum(pk=instance.forum_id).update_last_post()
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if not created:
+        return
+    topic = instance.topic
+    Topic.objects.filter(pk=topic.pk).update(post_count=F('post_count') + 1)
+    Forum.objects.filter(pk=topic.forum_id).update(post_count=F('post_count') + 1, last_post=instance)
+    # the count is not saved with the topic (see `exclude_counters()`), but the instance is kept up to date
+    topic.post_count += 1
+
+
+@receiver(post_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    Topic.objects.filter(pk=instance.topic_id).update(post_count=F('post_count') - 1)
+    forum = Forum.objects.filter(topic__pk=instance.topic_id).first()
+    if forum is not None:
+        Forum.objects.filter(pk=forum.pk).update(post_count=F('post_count') - 1)
+        if forum.last_post_id is None:  # it was this post
+            forum.update_last_post()
+
+
+def move_topic_counters(topic, former_forum):
+    """
+    Update the counters (and the cached pages of topics) of the forums after a topic moved from a forum to another.
+
+    :param topic: the topic, already saved in its new forum
+    :type topic: Topic
+    :param former_forum: the forum the topic left
+    :type former_forum: Forum
+    """
+    Forum.objects.filter(pk=former_forum.pk)\
+        .update(topic_count=F('topic_count') - 1, post_count=F('post_count') - topic.post_count)
+    Forum.objects.filter(pk=topic.forum_id)\
+        .update(topic_count=F('topic_count') + 1, post_count=F('post_count') + topic.post_count)
+    former_forum.update_last_post()
+    topic.forum.update_last_post()
+    # the pages of the new forum were cleared when the topic was saved
+    clear_topic_pages(former_forum.pk)
+
+
+def rebuild_counters():
+    """Recompute the counters of all the topics and forums (see `COUNTERS_SQL`)."""
+    with transaction.atomic():
+        cursor = connection.cursor()
+        for sql in COUNTERS_SQL:
+            cursor.execute(sql)
@@ -3,7 +3,8 @@
 from django.conf import settings
 from django.test import TestCase
 
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import AnonymousUser, Group
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from zds.utils import slugify
 
@@ -15,8 +16,10 @@ from zds.member.factories import ProfileFactory, StaffProfileFactory
 from zds.utils.models import CommentLike, CommentDislike, Alert, Tag
 from django.core import mail
 
-from zds.forum.models import Post, Topic, TopicFollowed, TopicRead
+from zds.forum.models import Post, Topic, TopicFollowed, TopicRead, get_readable_forum_pks, mark_read, \
+    rebuild_counters, get_topic_pages_key
 from zds.utils.forums import get_tag_by_title
+from zds.utils.outbox import send_queued_emails
 from zds.forum.models import Forum
 
 
@@ -210,6 +213,8 @@ class ForumMemberTests(TestCase):
             follow=False)
 
         self.assertEqual(result.status_code, 302)
+        self.assertEquals(len(mail.outbox), 0)
+        send_queued_emails()
         self.assertEquals(len(mail.outbox), 2)
 
         # check topic's number
@@ -218,6 +223,13 @@ class ForumMemberTests(TestCase):
         # check post's number
         self.assertEqual(Post.objects.all().count(), 4)
 
+        # check counters
+        self.assertEqual(Topic.objects.get(pk=topic1.pk).post_count, 4)
+        forum = Forum.objects.get(pk=self.forum11.pk)
+        self.assertEqual(forum.topic_count, 1)
+        self.assertEqual(forum.post_count, 4)
+        self.assertEqual(forum.get_last_message(), Post.objects.last())
+
         # check topic and post
         self.assertEqual(post1.topic, topic1)
         self.assertEqual(post2.topic, topic1)
@@ -784,6 +796,9 @@ class ForumMemberTests(TestCase):
                 password='hostel77'),
             True)
 
+        # the pages of the topics of the former forum are cached
+        self.client.get(reverse('forum-topics-list', args=[self.category1.slug, self.forum11.slug]))
+
         result = self.client.post(
             reverse('topic-edit'),
             {
@@ -793,6 +808,7 @@ class ForumMemberTests(TestCase):
             }, follow=False)
 
         self.assertEqual(result.status_code, 302)
+        self.assertIsNone(cache.get(get_topic_pages_key(self.forum11.pk, 'all')))
 
         # check value
         self.assertEqual(
@@ -800,6 +816,12 @@ class ForumMemberTests(TestCase):
                 pk=topic1.pk).forum.pk,
             self.forum12.pk)
 
+        # check counters
+        former_forum = Forum.objects.get(pk=self.forum11.pk)
+        self.assertEqual((0, 0, None), (former_forum.topic_count, former_forum.post_count, former_forum.last_post))
+        forum = Forum.objects.get(pk=self.forum12.pk)
+        self.assertEqual((1, 3, topic1.last_message), (forum.topic_count, forum.post_count, forum.last_post))
+
     def test_failing_moving_topic(self):
         """Test some failing case when playing with the "move topic" feature"""
         user1 = ProfileFactory().user
@@ -1424,6 +1446,25 @@ class ManagerTests(TestCase):
             topics = Topic.objects.get_last_topics()
             self.assertEqual(2, len(topics))
 
+        def test_readable_forums_follow_the_groups(self):
+            member = ProfileFactory().user
+            staff_group = Group.objects.filter(name="staff").first()
+            self.assertTrue(self.forum3.can_read(self.staff.user))
+            self.assertFalse(self.forum3.can_read(member))
+            self.assertFalse(self.forum3.can_read(AnonymousUser()))
+
+            staff_group.user_set.add(member)
+            self.assertTrue(self.forum3.can_read(member))
+            member.groups.remove(staff_group)
+            self.assertFalse(self.forum3.can_read(member))
+
+            other_group = Group.objects.create(name="other")
+            self.forum1.group.add(other_group)
+            self.assertFalse(self.forum1.can_read(member))
+            self.assertEqual({self.forum2.pk}, set(get_readable_forum_pks(member)))
+            other_group.delete()
+            self.assertTrue(self.forum1.can_read(member))
+
         def test_get_unread_post(self):
             author = ProfileFactory()
             topic = TopicFactory(author=author.user, forum=self.forum1)
@@ -1436,3 +1477,52 @@ class ManagerTests(TestCase):
             TopicRead(post=topic.last_post, user=self.staff.user, topic=topic).save()
             self.assertEqual(1, len(TopicRead.objects.list_read_topic_pk(self.staff.user)))
             self.assertEqual(0, len(TopicRead.objects.list_read_topic_pk(author.user)))
+
+        def test_rebuild_counters(self):
+            topic = TopicFactory(author=self.staff.user, forum=self.forum1)
+            PostFactory(topic=topic, position=1, author=self.staff.user)
+            last_post = PostFactory(topic=topic, position=2, author=self.staff.user)
+            Forum.objects.update(topic_count=0, post_count=0, last_post=None)
+            Topic.objects.update(post_count=0)
+
+            rebuild_counters()
+
+            self.assertEqual(2, Topic.objects.get(pk=topic.pk).get_post_count())
+            forum = Forum.objects.get(pk=self.forum1.pk)
+            self.assertEqual((2, 2), (forum.get_topic_count(), forum.get_post_count()))
+            self.assertEqual(last_post, forum.get_last_message())
+            self.assertEqual(1, Forum.objects.get(pk=self.forum2.pk).get_topic_count())
+
+        def test_saving_a_topic_keeps_the_counters(self):
+            topic = TopicFactory(author=self.staff.user, forum=self.forum1)
+            PostFactory(topic=topic, position=1, author=self.staff.user)
+            stale_topic = Topic.objects.get(pk=topic.pk)
+            stale_forum = Forum.objects.get(pk=self.forum1.pk)
+            last_post = PostFactory(topic=topic, position=2, author=self.staff.user)
+
+            # as a moderator locking the topic, or renaming the forum, during the reply
+            stale_topic.is_locked = True
+            stale_topic.save()
+            stale_forum.title = u'Nouveau titre'
+            stale_forum.save()
+
+            topic = Topic.objects.get(pk=topic.pk)
+            self.assertEqual(2, topic.get_post_count())
+            self.assertTrue(topic.is_locked)
+            forum = Forum.objects.get(pk=self.forum1.pk)
+            self.assertEqual((2, 2), (forum.get_topic_count(), forum.get_post_count()))
+            self.assertEqual(last_post, forum.get_last_message())
+            self.assertEqual(u'Nouveau titre', forum.title)
+
+        def test_mark_read_keeps_one_row(self):
+            author = ProfileFactory()
+            topic = TopicFactory(author=author.user, forum=self.forum1)
+            PostFactory(topic=topic, position=1, author=author.user)
+            mark_read(topic, self.staff.user)
+            last_post = PostFactory(topic=topic, position=2, author=author.user)
+            mark_read(topic, self.staff.user)
+
+            reads = TopicRead.objects.filter(topic=topic, user=self.staff.user)
+            self.assertEqual(1, reads.count())
+            self.assertEqual(last_post, reads.first().post)
+            self.assertEqual((last_post.pk, 2), topic.resolve_last_post_pk_and_pos_read_by_user(self.staff.user))
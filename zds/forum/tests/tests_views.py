@@ -2,6 +2,7 @@
 
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib.auth.models import Group
 from django.core.urlresolvers import reverse
 from django.test import TestCase
@@ -187,6 +188,30 @@ class ForumTopicsListViewTest(TestCase):
         self.assertEqual(forum, response.context['forum'])
         self.assertEqual(2, len(response.context['topics']))
 
+    def test_success_list_topics_of_a_forum_on_several_pages(self):
+        profile = ProfileFactory()
+        category, forum = create_category()
+        topics_per_page = settings.ZDS_APP['forum']['topics_per_page']
+        topics = [add_topic_in_a_forum(forum, profile) for __ in range(topics_per_page + 1)]
+        url = reverse('forum-topics-list', args=[category.slug, forum.slug])
+
+        response = self.client.get(url + '?page=2')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, response.context['paginator'].num_pages)
+        self.assertEqual([topics[0]], response.context['topics'])
+
+        # a new topic is on the first page, which pushes another topic to the second one
+        new_topic = add_topic_in_a_forum(forum, profile)
+
+        response = self.client.get(url + '?page=2')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([topics[1], topics[0]], response.context['topics'])
+        response = self.client.get(url)
+        self.assertEqual(new_topic, response.context['topics'][0])
+        self.assertEqual(topics_per_page, len(response.context['topics']))
+        self.assertEqual(404, self.client.get(url + '?page=3').status_code)
+
 
 class TopicPostsListViewTest(TestCase):
     def test_failure_list_all_posts_of_a_topic_of_a_forum_we_cannot_read(self):
@@ -223,6 +248,22 @@ class TopicPostsListViewTest(TestCase):
         self.assertIsNotNone(response.context['form'])
         self.assertIsNotNone(response.context['form_move'])
 
+    def test_success_list_posts_of_a_topic_on_the_second_page(self):
+        profile = ProfileFactory()
+        category, forum = create_category()
+        topic = add_topic_in_a_forum(forum, profile)
+        posts_per_page = settings.ZDS_APP['forum']['posts_per_page']
+        posts = [PostFactory(topic=topic, author=profile.user, position=position)
+                 for position in range(2, posts_per_page + 3)]
+
+        response = self.client.get(reverse('topic-posts-list', args=[topic.pk, topic.slug()]) + '?page=2')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, response.context['paginator'].num_pages)
+        # the last post of the first page, then the posts of the second page
+        self.assertEqual(posts[-3:], response.context['posts'])
+        self.assertEqual(posts[-1].get_absolute_url(), topic.get_absolute_url() + '?page=2#p' + str(posts[-1].pk))
+
 
 class TopicNewTest(TestCase):
     def test_failure_create_topic_with_a_post_with_client_unauthenticated(self):
@@ -22,7 +22,8 @@ from haystack.inputs import AutoQuery
 from haystack.query import SearchQuerySet
 
 from zds.forum.forms import TopicForm, PostForm, MoveTopicForm
-from zds.forum.models import Category, Forum, Topic, Post, never_read, mark_read, TopicRead
+from zds.forum.models import Category, Forum, Topic, Post, never_read, mark_read, TopicRead, TOPIC_FILTERS, \
+    get_topic_pages_key
 from zds.forum.commons import TopicEditMixin, PostEditMixin, SinglePostObjectMixin
 from zds.member.decorator import can_write_and_read_now
 from zds.utils import slugify
@@ -30,7 +31,7 @@ from zds.utils.forums import create_topic, send_post, CreatePostView
 from zds.utils.mixins import FilterMixin
 from zds.utils.models import Alert, Tag, CommentDislike, CommentLike
 from zds.utils.mps import send_mp
-from zds.utils.paginator import paginator_range, ZdSPagingListView
+from zds.utils.paginator import paginator_range, ZdSPagingListView, PositionPaginator, SeekPaginator
 
 
 class CategoriesForumsListView(ListView):
@@ -102,6 +103,13 @@ class ForumTopicsListView(FilterMixin, ZdSPagingListView, SingleObjectMixin):
         self.queryset = Topic.objects.get_all_topics_of_a_forum(self.object.pk)
         return super(ForumTopicsListView, self).get_queryset()
 
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        filter_param = self.get_filter_param()
+        if filter_param not in TOPIC_FILTERS:
+            filter_param = self.default_filter_param
+        return SeekPaginator(queryset, per_page, get_topic_pages_key(self.object.pk, filter_param),
+                             allow_empty_first_page=allow_empty_first_page, **kwargs)
+
     def filter_queryset(self, queryset, filter_param):
         if filter_param == 'solve':
             queryset = queryset.filter(is_solved=True)
@@ -160,6 +168,10 @@ class TopicPostsListView(ZdSPagingListView, SingleObjectMixin):
     def get_queryset(self):
         return Post.objects.get_messages_of_a_topic(self.object.pk)
 
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return PositionPaginator(queryset, per_page, last_position=self.object.last_message.position,
+                                 allow_empty_first_page=allow_empty_first_page, **kwargs)
+
 
 class TopicNew(CreateView, SingleObjectMixin):
 
@@ -2,7 +2,7 @@
 
 from django.contrib import admin
 
-from zds.member.models import Profile, Ban, TokenRegister, TokenForgotPassword, KarmaNote
+from zds.member.models import Profile, Ban, TokenRegister, TokenForgotPassword, KarmaNote, UnregistrationJob
 
 
 class ProfileAdmin(admin.ModelAdmin):
@@ -42,8 +42,17 @@ class KarmaNoteAdmin(admin.ModelAdmin):
     list_display = ('user', 'staff', 'comment', 'value', 'create_at')
 
 
+class UnregistrationJobAdmin(admin.ModelAdmin):
+
+    """Representation of UnregistrationJob model in the admin interface."""
+
+    list_display = ('username', 'state', 'step', 'progress', 'attempts', 'creation_date', 'end_date')
+    list_filter = ('state',)
+
+
 admin.site.register(Profile, ProfileAdmin)
 admin.site.register(Ban, BanAdmin)
 admin.site.register(TokenRegister, TokenRegisterAdmin)
 admin.site.register(TokenForgotPassword, TokenForgotPasswordAdmin)
 admin.site.register(KarmaNote, KarmaNoteAdmin)
+admin.site.register(UnregistrationJob, UnregistrationJobAdmin)
@@ -1140,6 +1140,21 @@ class CacheMemberAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(another_profile.user.username, response.data.get('username'))
 
+    def test_cache_of_member_profile_after_an_update(self):
+        """
+        Cache must be invalidated when the profile is updated.
+        """
+        profile = ProfileFactory()
+        response = self.client.get(reverse('api-member-detail', args=[profile.user.id]))
+        self.assertEqual(profile.site, response.data.get('site'))
+
+        profile.site = 'http://zestedesavoir.com'
+        profile.save()
+
+        response = self.client.get(reverse('api-member-detail', args=[profile.user.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual('http://zestedesavoir.com', response.data.get('site'))
+
 
 def create_oauth2_client(user):
     client = Application.objects.create(user=user,
@@ -10,6 +10,7 @@ from rest_framework_extensions.etag.decorators import etag
 from rest_framework_extensions.key_constructor import bits
 from rest_framework_extensions.key_constructor.constructors import DefaultKeyConstructor
 from zds.api.DJRF3xPaginationKeyBit import DJRF3xPaginationKeyBit
+from zds.api.bits import UpdatedAtKeyBit, UserUpdatedAtKeyBit, PROFILES, PROFILE
 
 from zds.member.api.serializers import ProfileListSerializer, ProfileCreateSerializer, \
     ProfileDetailSerializer, ProfileValidatorSerializer
@@ -23,8 +24,8 @@ from zds.member.models import Profile
 
 class PagingSearchListKeyConstructor(DefaultKeyConstructor):
     pagination = DJRF3xPaginationKeyBit()
-    search = bits.QueryParamsKeyBit(['search'])
-    list_sql_query = bits.ListSqlQueryKeyBit()
+    search = bits.QueryParamsKeyBit(['search', 'page_size'])
+    updated_at = UpdatedAtKeyBit(PROFILES)
     unique_view_id = bits.UniqueViewIdKeyBit()
     user = bits.UserKeyBit()
 
@@ -32,7 +33,8 @@ class PagingSearchListKeyConstructor(DefaultKeyConstructor):
 class DetailKeyConstructor(DefaultKeyConstructor):
     format = bits.FormatKeyBit()
     language = bits.LanguageKeyBit()
-    retrieve_sql_query = bits.RetrieveSqlQueryKeyBit()
+    url_kwargs = bits.KwargsKeyBit('*')
+    updated_at = UpdatedAtKeyBit(PROFILE, 'user__id')
     unique_view_id = bits.UniqueViewIdKeyBit()
     user = bits.UserKeyBit()
 
@@ -40,6 +42,7 @@ class DetailKeyConstructor(DefaultKeyConstructor):
 class MyDetailKeyConstructor(DefaultKeyConstructor):
     format = bits.FormatKeyBit()
     language = bits.LanguageKeyBit()
+    updated_at = UserUpdatedAtKeyBit(PROFILE)
     user = bits.UserKeyBit()
 
 
@@ -0,0 +1,38 @@
+# coding: utf-8
+
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from zds.member.unregistration import claim_unregistration_job, run_unregistration_job
+
+
+class Command(BaseCommand):
+    help = 'Run the unregistrations of the members, queued when they unregistered.'
+    # python manage.py unregister_members --loop
+
+    option_list = BaseCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    dest='loop',
+                    default=False,
+                    help='Keep waiting for new unregistrations instead of stopping when the queue is empty.'),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                job = claim_unregistration_job()
+                if job is None:
+                    if not options['loop']:
+                        return
+                    time.sleep(settings.ZDS_APP['member']['unregistration_queue_interval'])
+                    continue
+
+                state = run_unregistration_job(job)
+                self.stdout.write(u'Unregistration of {} (attempt {}): {}, {} rows handled'.format(
+                    job.username, job.attempts, state, job.progress))
+        except KeyboardInterrupt:
+            pass
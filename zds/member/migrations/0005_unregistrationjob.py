@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('member', '0004_profile_allow_temp_visual_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnregistrationJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('username', models.CharField(max_length=30, verbose_name=b'Nom du membre')),
+                ('state', models.CharField(default=b'PENDING', max_length=10, verbose_name=b'\xc3\x89tat', db_index=True, choices=[(b'PENDING', b'En attente'), (b'RUNNING', b'En cours'), (b'SUCCESS', b'Termin\xc3\xa9e'), (b'FAILURE', b'\xc3\x89chec')])),
+                ('step', models.CharField(max_length=30, verbose_name=b'\xc3\x89tape', blank=True)),
+                ('progress', models.IntegerField(default=0, verbose_name=b'Lignes trait\xc3\xa9es')),
+                ('attempts', models.IntegerField(default=0, verbose_name=b"Nombre d'essais")),
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name=b'Date de la demande')),
+                ('start_date', models.DateTimeField(null=True, verbose_name=b'Date de d\xc3\xa9but', blank=True)),
+                ('end_date', models.DateTimeField(null=True, verbose_name=b'Date de fin', blank=True)),
+                ('last_error', models.TextField(verbose_name=b'Derni\xc3\xa8re erreur', blank=True)),
+                ('user', models.OneToOneField(related_name='unregistration_job', null=True, blank=True, on_delete=django.db.models.deletion.SET_NULL, verbose_name=b'Membre', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'D\xe9sinscription',
+                'verbose_name_plural': 'D\xe9sinscriptions',
+            },
+            bases=(models.Model,),
+        ),
+    ]
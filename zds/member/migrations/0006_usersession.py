@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import datetime
+from importlib import import_module
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+def index_sessions(apps, schema_editor):
+    """Index the sessions opened before the index existed: they are decoded one last time."""
+    Session = apps.get_model('sessions', 'Session')
+    User = apps.get_model('auth', 'User')
+    UserSession = apps.get_model('member', 'UserSession')
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+
+    user_pks = set(User.objects.values_list('pk', flat=True))
+    user_sessions = []
+    for session in Session.objects.filter(expire_date__gt=datetime.now()).iterator():
+        user_pk = store.decode(session.session_data).get('_auth_user_id')
+        try:
+            user_pk = int(user_pk)
+        except (TypeError, ValueError):
+            continue
+        if user_pk in user_pks:
+            user_sessions.append(UserSession(user_id=user_pk, session_key=session.session_key))
+    UserSession.objects.bulk_create(user_sessions, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sessions', '0001_initial'),
+        ('member', '0005_unregistrationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSession',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('session_key', models.CharField(unique=True, max_length=40, verbose_name=b'Cl\xc3\xa9 de la session')),
+                ('user', models.ForeignKey(related_name='user_sessions', verbose_name=b'Membre', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': "Session d'un membre",
+                'verbose_name_plural': 'Sessions des membres',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.RunPython(index_sessions, lambda apps, schema_editor: None),
+    ]
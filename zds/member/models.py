@@ -4,9 +4,8 @@ from datetime import datetime
 from django.conf import settings
 from django.db import models
 from hashlib import md5
-from django.http import HttpRequest
 from django.contrib.sessions.models import Session
-from django.contrib.auth import logout
+from django.contrib.auth.signals import user_logged_in, user_logged_out
 import os
 
 from django.contrib.auth.models import User
@@ -14,6 +13,7 @@ from django.core.urlresolvers import reverse
 from django.dispatch import receiver
 
 import pygeoip
+from zds.api.bits import change_api_updated_at, PROFILES, PROFILE
 from zds.forum.models import Post, Topic
 from zds.member.managers import ProfileManager
 from zds.tutorialv2.models.models_database import PublishableContent, PublishedContent
@@ -385,6 +385,29 @@ class Profile(models.Model):
         return request.user and request.user.has_perm("member.change_profile")
 
 
+# Fields shown in the list of the members of the API: the list is only invalidated when one of them may have changed
+API_LIST_PROFILE_FIELDS = {'avatar_url'}
+API_LIST_USER_FIELDS = {'username', 'is_active', 'date_joined'}
+
+
+@receiver(models.signals.post_save, sender=Profile)
+@receiver(models.signals.post_delete, sender=Profile)
+def change_api_profile_updated_at(sender, instance, update_fields=None, **kwargs):
+    change_api_updated_at(PROFILE, [instance.user_id])
+    if update_fields is None or API_LIST_PROFILE_FIELDS & set(update_fields):
+        change_api_updated_at(PROFILES)
+
+
+@receiver(models.signals.post_save, sender=User)
+def change_api_user_updated_at(sender, instance, update_fields=None, **kwargs):
+    # the date of the last login is saved alone, and is not shown
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    change_api_updated_at(PROFILE, [instance.pk])
+    if update_fields is None or API_LIST_USER_FIELDS & set(update_fields):
+        change_api_updated_at(PROFILES)
+
+
 @receiver(models.signals.post_delete, sender=User)
 def auto_delete_token_on_unregistering(sender, instance, **kwargs):
     """
@@ -506,24 +529,89 @@ class KarmaNote(models.Model):
         return u"{0} - note : {1} ({2}) ".format(self.user.username, self.comment, self.create_at)
 
 
+UNREGISTRATION_STATE_CHOICES = (
+    ('PENDING', 'En attente'),
+    ('RUNNING', 'En cours'),
+    ('SUCCESS', 'Terminée'),
+    ('FAILURE', 'Échec'),
+)
+
+
+class UnregistrationJob(models.Model):
+    """
+    The unregistration of a member, done out of the request by the `unregister_members` command (see
+    `zds.member.unregistration`). The member is kept, deactivated, until the end of the job; the job is kept afterwards.
+    """
+    class Meta:
+        verbose_name = 'Désinscription'
+        verbose_name_plural = 'Désinscriptions'
+
+    user = models.OneToOneField(User, verbose_name='Membre', related_name='unregistration_job',
+                                null=True, blank=True, on_delete=models.SET_NULL)
+    username = models.CharField('Nom du membre', max_length=30)
+    state = models.CharField('État', max_length=10, choices=UNREGISTRATION_STATE_CHOICES, default='PENDING',
+                             db_index=True)
+    # progress: current step, and number of rows handled since the beginning of the job
+    step = models.CharField('Étape', max_length=30, blank=True)
+    progress = models.IntegerField('Lignes traitées', default=0)
+    attempts = models.IntegerField('Nombre d\'essais', default=0)
+    creation_date = models.DateTimeField('Date de la demande', auto_now_add=True)
+    start_date = models.DateTimeField('Date de début', null=True, blank=True)
+    end_date = models.DateTimeField('Date de fin', null=True, blank=True)
+    last_error = models.TextField('Dernière erreur', blank=True)
+
+    def __unicode__(self):
+        return u'<Désinscription de {0} ({1})>'.format(self.username, self.state)
+
+
+class UserSession(models.Model):
+    """
+    A session opened by a member, so that all the sessions of a member can be found without decoding the others (see
+    `logout_user()`). The index is kept by the `user_logged_in` and `user_logged_out` signals.
+    """
+    class Meta:
+        verbose_name = 'Session d\'un membre'
+        verbose_name_plural = 'Sessions des membres'
+
+    user = models.ForeignKey(User, verbose_name='Membre', related_name='user_sessions')
+    session_key = models.CharField('Clé de la session', max_length=40, unique=True)
+
+    def __unicode__(self):
+        return u'<Session de {0}>'.format(self.user.username)
+
+
+@receiver(user_logged_in)
+def index_user_session(sender, request, user, **kwargs):
+    session_key = request.session.session_key
+    if session_key is None:
+        return
+    UserSession.objects.get_or_create(session_key=session_key, defaults={'user': user})
+    # forget the sessions of the member which have expired meanwhile
+    UserSession.objects.filter(user=user)\
+        .exclude(session_key__in=Session.objects.filter(expire_date__gt=datetime.now()).values('session_key'))\
+        .exclude(session_key=session_key)\
+        .delete()
+
+
+@receiver(user_logged_out)
+def unindex_user_session(sender, request, user, **kwargs):
+    session_key = getattr(request, 'session', None) and request.session.session_key
+    if session_key is not None:
+        UserSession.objects.filter(session_key=session_key).delete()
+
+
 def logout_user(username):
     """
-    Logout the member.
+    Logout the member from all their sessions.
     :param username: the name of the user to logout.
     """
-    now = datetime.now()
-    request = HttpRequest()
-
-    sessions = Session.objects.filter(expire_date__gt=now)
-    user = User.objects.get(username=username)
-
-    for session in sessions:
-        user_id = session.get_decoded().get('_auth_user_id')
-        if user.id == user_id:
-            engine = import_module(settings.SESSION_ENGINE)
-            request.session = engine.SessionStore(session.session_key)
-            logout(request)
-            break
+    engine = import_module(settings.SESSION_ENGINE)
+    sessions = UserSession.objects.filter(user__username=username)
+
+    for session_key in sessions.values_list('session_key', flat=True):
+        # removes the session from the cache too, with the `cached_db` engine
+        engine.SessionStore(session_key).delete()
+    sessions.delete()
 
 
 def listing():
@@ -5,8 +5,9 @@ import shutil
 from django.conf import settings
 from django.contrib.auth.models import User, Group
 from django.core import mail
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.test import TestCase, Client
 from django.test.utils import override_settings
 
 from zds.settings import BASE_DIR
@@ -15,7 +16,7 @@ from zds.member.factories import ProfileFactory, StaffProfileFactory, NonAsciiPr
 from zds.mp.factories import PrivateTopicFactory, PrivatePostFactory
 from zds.member.models import Profile, KarmaNote, TokenForgotPassword
 from zds.mp.models import PrivatePost, PrivateTopic
-from zds.member.models import TokenRegister, Ban
+from zds.member.models import TokenRegister, Ban, UnregistrationJob, UserSession, logout_user
 from zds.tutorialv2.factories import PublishableContentFactory, PublishedContentFactory, BetaContentFactory
 from zds.tutorialv2.models.models_database import PublishableContent, PublishedContent
 from zds.forum.factories import CategoryFactory, ForumFactory, TopicFactory, PostFactory
@@ -235,6 +236,27 @@ class MemberTests(TestCase):
                             '?next=' + reverse('gallery-list'),
                             count=1)
 
+    def test_logout_user(self):
+        """
+        To test that a member is logged out of all their sessions, which are indexed on login.
+        """
+        user = ProfileFactory().user
+        other_client = Client()
+        self.assertTrue(self.client.login(username=user.username, password='hostel77'))
+        self.assertTrue(other_client.login(username=user.username, password='hostel77'))
+        self.assertEqual(UserSession.objects.filter(user=user).count(), 2)
+
+        # logging out removes the session from the index
+        other_client.post(reverse('zds.member.views.logout_view'), follow=False)
+        self.assertEqual(UserSession.objects.filter(user=user).count(), 1)
+
+        self.assertTrue(other_client.login(username=user.username, password='hostel77'))
+        logout_user(user.username)
+        self.assertEqual(UserSession.objects.filter(user=user).count(), 0)
+        for client in [self.client, other_client]:
+            result = client.get(reverse('zds.member.views.warning_unregister'), follow=False)
+            self.assertEqual(result.status_code, 302)
+
     def test_register(self):
         """
         To test user registration.
@@ -294,7 +316,13 @@ class MemberTests(TestCase):
             reverse('zds.member.views.unregister'),
             follow=False)
         self.assertEqual(result.status_code, 302)
+        # logged out and deactivated at once, unregistered by the queue
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertFalse(User.objects.get(username=user.user.username).is_active)
+        call_command('unregister_members')
         self.assertEqual(User.objects.filter(username=user.user.username).count(), 0)
+        job = UnregistrationJob.objects.get(username=user.user.username)
+        self.assertEqual(('SUCCESS', None), (job.state, job.user))
 
         # Attach a user at tutorials, articles, topics and private topics. After that,
         # unregister this user and check that he is well removed in all contents.
@@ -371,6 +399,8 @@ class MemberTests(TestCase):
             reverse('zds.member.views.unregister'),
             follow=False)
         self.assertEqual(result.status_code, 302)
+        call_command('unregister_members')
+        self.assertGreater(UnregistrationJob.objects.get(username=user.user.username).progress, 0)
 
         # check that the bot have taken authorship of tutorial:
         self.assertEqual(published_tutorial_alone.authors.count(), 1)
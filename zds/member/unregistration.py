@@ -0,0 +1,245 @@
+# coding: utf-8
+
+"""
+Unregistration of the members.
+
+A member who unregisters is deactivated and logged out at once, and an `UnregistrationJob` is queued with
+`queue_unregistration()`. The `unregister_members` command then hands their contents, messages and galleries over to
+the anonymous and external accounts, and deletes the member. Each step works on chunks of
+`ZDS_APP['member']['unregistration_chunk_size']` rows, each chunk in its own transaction and with set-based queries, and
+records its progress in the job. A step only picks the rows it has not handled yet: a job which was interrupted is
+simply run again.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.encoding import force_text
+from django.utils.translation import ugettext as _
+
+from zds.api.bits import change_api_updated_at, PRIVATE_TOPICS, PRIVATE_POSTS
+from zds.forum.models import Topic, TopicFollowed
+from zds.gallery.models import UserGallery
+from zds.member.models import UnregistrationJob
+from zds.mp.models import PrivatePost, PrivateTopic
+from zds.tutorialv2.models.models_database import PublishableContent
+from zds.utils.models import Comment, CommentLike, CommentDislike
+
+logger = logging.getLogger(__name__)
+
+
+def queue_unregistration(user):
+    """
+    Deactivate a member, so that they cannot log in anymore, and queue their unregistration.
+
+    :param user: the member
+    :return: the job
+    :rtype: zds.member.models.UnregistrationJob
+    """
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    job, __ = UnregistrationJob.objects.get_or_create(user=user, defaults={'username': user.username})
+    return job
+
+
+def claim_unregistration_job():
+    """
+    Take the next job to run, if any. A job belongs to the worker which manages to switch it to "RUNNING". A job which
+    is still running after `ZDS_APP['member']['unregistration_job_timeout']` seconds is considered lost (the worker
+    died) and is run again.
+
+    :return: the job, or `None` if there is nothing to do
+    :rtype: zds.member.models.UnregistrationJob
+    """
+    now = datetime.now()
+    lost = Q(state='RUNNING', start_date__lte=now - timedelta(
+        seconds=settings.ZDS_APP['member']['unregistration_job_timeout']))
+
+    for job in UnregistrationJob.objects.filter(Q(state='PENDING') | lost).order_by('pk')[:10]:
+        claimed = UnregistrationJob.objects\
+            .filter(pk=job.pk, state=job.state, start_date=job.start_date)\
+            .update(state='RUNNING', start_date=now, attempts=F('attempts') + 1)
+        if claimed:
+            job.state = 'RUNNING'
+            job.start_date = now
+            job.attempts += 1
+            return job
+
+    return None
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    Yield the pks of the rows of a queryset, chunk by chunk. The rows of a chunk must leave the queryset (be deleted or
+    updated) before the next chunk is asked for.
+    """
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield pks
+
+
+def report(job, step, count):
+    job.step = step
+    job.progress += count
+    UnregistrationJob.objects.filter(pk=job.pk).update(step=step, progress=job.progress)
+
+
+def hand_over_contents(job, user, external, chunk_size):
+    """The contents which are not published and written by the member alone are deleted, the member is removed from
+    the authors of the others (and replaced by the external account if they were alone)."""
+    for pks in iter_chunks(PublishableContent.objects.filter(authors=user), chunk_size):
+        for content in PublishableContent.objects.filter(pk__in=pks):
+            # one transaction by content, which also has a repository and a gallery
+            with transaction.atomic():
+                if not content.in_public() and content.authors.count() == 1:
+                    if content.in_beta() and content.beta_topic:
+                        beta_topic = content.beta_topic
+                        beta_topic.is_locked = True
+                        beta_topic.save()
+                        first_post = beta_topic.first_post()
+                        first_post.update_content(_(u"# Le tutoriel présenté par ce topic n\'existe plus."))
+                        first_post.save()
+                    content.delete()
+                else:
+                    if content.authors.count() == 1:
+                        content.authors.add(external)
+                        UserGallery.objects.create(user=external, gallery=content.gallery, mode='W')
+                        UserGallery.objects.filter(user=user, gallery=content.gallery).delete()
+
+                    content.authors.remove(user)
+                    content.save()
+        report(job, 'contents', len(pks))
+
+
+def remove_votes(job, user, vote_model, counter, chunk_size):
+    """Delete the likes (or dislikes) of the member, and decrement the counters of the comments."""
+    for pks in iter_chunks(vote_model.objects.filter(user=user), chunk_size):
+        with transaction.atomic():
+            votes = defaultdict(int)
+            for comment_pk in vote_model.objects.filter(pk__in=pks).values_list('comments', flat=True):
+                votes[comment_pk] += 1
+            # one query by number of votes, usually only one
+            comments_by_votes = defaultdict(list)
+            for comment_pk, count in votes.items():
+                comments_by_votes[count].append(comment_pk)
+            for count, comment_pks in comments_by_votes.items():
+                Comment.objects.filter(pk__in=comment_pks).update(**{counter: F(counter) - count})
+            vote_model.objects.filter(pk__in=pks).delete()
+        report(job, counter + 's', len(pks))
+
+
+def reassign(job, queryset, step, chunk_size, after_chunk=None, **values):
+    """
+    Update the rows of a queryset with `values`, chunk by chunk.
+
+    :param after_chunk: called with the pks of each chunk, once updated
+    """
+    for pks in iter_chunks(queryset, chunk_size):
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=pks).update(**values)
+        if after_chunk is not None:
+            after_chunk(pks)
+        report(job, step, len(pks))
+
+
+def change_api_private_posts_updated_at(pks):
+    topic_pks = PrivatePost.objects.filter(pk__in=pks).values_list('privatetopic', flat=True).distinct()
+    change_api_updated_at(PRIVATE_POSTS, topic_pks)
+
+
+def leave_private_topics(job, user, chunk_size):
+    """The private topics of the member go to their first participant (or are deleted if there is none), and the
+    member leaves the other private topics."""
+    for pks in iter_chunks(PrivateTopic.objects.filter(author=user), chunk_size):
+        with transaction.atomic():
+            for topic in PrivateTopic.objects.filter(pk__in=pks):
+                topic.participants.remove(user)
+                new_author = topic.participants.first()
+                if new_author is not None:
+                    topic.author = new_author
+                    topic.participants.remove(new_author)
+                    topic.save()
+                else:
+                    topic.delete()
+        report(job, 'private_topics', len(pks))
+
+    participations = PrivateTopic.participants.through.objects.filter(user=user)
+    for pks in iter_chunks(participations, chunk_size):
+        with transaction.atomic():
+            topic_pks = list(participations.filter(pk__in=pks).values_list('privatetopic', flat=True))
+            participations.filter(pk__in=pks).delete()
+        # the other members of these private topics see the list of the participants
+        members = set(PrivateTopic.objects.filter(pk__in=topic_pks).values_list('author', flat=True))
+        members.update(PrivateTopic.participants.through.objects
+                       .filter(privatetopic__in=topic_pks)
+                       .values_list('user', flat=True))
+        change_api_updated_at(PRIVATE_TOPICS, members)
+        report(job, 'private_topics', len(pks))
+
+
+def hand_over_galleries(job, user, external, chunk_size):
+    """The member leaves their galleries, which go to the external account if the member was their only user."""
+    for pks in iter_chunks(UserGallery.objects.filter(user=user), chunk_size):
+        with transaction.atomic():
+            for user_gallery in UserGallery.objects.filter(pk__in=pks).select_related('gallery'):
+                if user_gallery.gallery.get_linked_users().count() == 1:
+                    UserGallery.objects.create(user=external, gallery=user_gallery.gallery, mode='W')
+            UserGallery.objects.filter(pk__in=pks).delete()
+        report(job, 'galleries', len(pks))
+
+
+def run_unregistration_job(job):
+    """
+    Unregister the member of a job, then delete the member. If a step fails, the job is run again later (the rows
+    already handled are not handled twice), up to `ZDS_APP['member']['unregistration_max_attempts']` times.
+
+    :param job: a job claimed with `claim_unregistration_job()`
+    :type job: zds.member.models.UnregistrationJob
+    :return: the new state of the job
+    :rtype: str
+    """
+    config = settings.ZDS_APP['member']
+    chunk_size = config['unregistration_chunk_size']
+    running = UnregistrationJob.objects.filter(pk=job.pk, state='RUNNING')
+
+    try:
+        user = User.objects.filter(pk=job.user_id).first()
+        if user is not None:
+            anonymous = User.objects.get(username=config['anonymous_account'])
+            external = User.objects.get(username=config['external_account'])
+
+            hand_over_contents(job, user, external, chunk_size)
+            remove_votes(job, user, CommentLike, 'like', chunk_size)
+            remove_votes(job, user, CommentDislike, 'dislike', chunk_size)
+            # messages of the forums and comments of the contents, and the ones edited by the member
+            reassign(job, Comment.objects.filter(author=user), 'comments', chunk_size,
+                     author=anonymous, update_index_date=datetime.now())
+            reassign(job, Comment.objects.filter(editor=user), 'edited_comments', chunk_size, editor=anonymous)
+            reassign(job, PrivatePost.objects.filter(author=user), 'private_posts', chunk_size,
+                     after_chunk=change_api_private_posts_updated_at, author=anonymous)
+            leave_private_topics(job, user, chunk_size)
+            reassign(job, Topic.objects.filter(author=user), 'topics', chunk_size,
+                     author=anonymous, update_index_date=datetime.now())
+            for pks in iter_chunks(TopicFollowed.objects.filter(user=user), chunk_size):
+                TopicFollowed.objects.filter(pk__in=pks).delete()
+                report(job, 'followed_topics', len(pks))
+            hand_over_galleries(job, user, external, chunk_size)
+
+            with transaction.atomic():
+                user.delete()
+    except Exception as e:
+        error = u'{}: {}'.format(type(e).__name__, force_text(e, errors='replace'))
+        logger.exception(u'Unregistration of %s failed (attempt %s)', job.username, job.attempts)
+        state = 'FAILURE' if job.attempts >= config['unregistration_max_attempts'] else 'PENDING'
+        running.update(state=state, last_error=error)
+        return state
+
+    running.update(state='SUCCESS', step='', end_date=datetime.now(), last_error='')
+    return 'SUCCESS'
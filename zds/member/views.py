@@ -28,15 +28,13 @@ from zds.member.forms import LoginForm, MiniProfileForm, ProfileForm, RegisterFo
     ChangePasswordForm, ChangeUserForm, NewPasswordForm, \
     OldTutoForm, PromoteMemberForm, KarmaForm, UsernameAndEmailForm
 
-from zds.utils.models import Comment, CommentLike, CommentDislike
-from zds.member.models import Profile, TokenForgotPassword, TokenRegister, KarmaNote
+from zds.member.models import Profile, TokenForgotPassword, TokenRegister, KarmaNote, logout_user
+from zds.member.unregistration import queue_unregistration
 from zds.gallery.forms import ImageAsAvatarForm
-from zds.gallery.models import UserGallery
-from zds.forum.models import Topic, follow, TopicFollowed, TopicRead
+from zds.forum.models import Topic, follow, TopicRead
 from zds.member.decorator import can_write_and_read_now
 from zds.member.commons import ProfileCreate, TemporaryReadingOnlySanction, ReadingOnlySanction, \
     DeleteReadingOnlySanction, TemporaryBanSanction, BanSanction, DeleteBanSanction, TokenGenerator
-from zds.mp.models import PrivatePost, PrivateTopic
 from zds.utils.decorators import https_required
 from zds.utils.mps import send_mp
 from zds.utils.paginator import ZdSPagingListView
@@ -343,92 +341,15 @@ def warning_unregister(request):
 
 @login_required
 @require_POST
-@transaction.atomic
 def unregister(request):
-    """allow members to unregister"""
-
-    anonymous = get_object_or_404(User, username=settings.ZDS_APP["member"]["anonymous_account"])
-    external = get_object_or_404(User, username=settings.ZDS_APP["member"]["external_account"])
-    current = request.user
-    for content in request.user.profile.get_contents():
-        # we delete article only if not published with only one author
-        if not content.in_public() and content.authors.count() == 1:
-            if content.in_beta() and content.beta_topic:
-                beta_topic = content.beta_topic
-                beta_topic.is_locked = True
-                beta_topic.save()
-                first_post = beta_topic.first_post()
-                first_post.update_content(_(u"# Le tutoriel présenté par ce topic n\'existe plus."))
-                first_post.save()
-            content.delete()
-        else:
-            if content.authors.count() == 1:
-                content.authors.add(external)
-                external_gallery = UserGallery()
-                external_gallery.user = external
-                external_gallery.gallery = content.gallery
-                external_gallery.mode = 'W'
-                external_gallery.save()
-                UserGallery.objects.filter(user=current).filter(gallery=content.gallery).delete()
-
-            content.authors.remove(current)
-            content.save()
-    # comments likes / dislikes
-    for like in CommentLike.objects.filter(user=current):
-        like.comments.like -= 1
-        like.comments.save()
-        like.delete()
-    for dislike in CommentDislike.objects.filter(user=current):
-        dislike.comments.dislike -= 1
-        dislike.comments.save()
-        dislike.delete()
-    # all messages anonymisation (forum, article and tutorial posts)
-    for message in Comment.objects.filter(author=current):
-        message.author = anonymous
-        message.save()
-    for message in PrivatePost.objects.filter(author=current):
-        message.author = anonymous
-        message.save()
-    # in case current has been moderator in his old day
-    for message in Comment.objects.filter(editor=current):
-        message.editor = anonymous
-        message.save()
-    for topic in PrivateTopic.objects.filter(author=current):
-        topic.participants.remove(current)
-        if topic.participants.count() > 0:
-            topic.author = topic.participants.first()
-            topic.participants.remove(topic.author)
-            topic.save()
-        else:
-            topic.delete()
-    for topic in PrivateTopic.objects.filter(participants__in=[current]):
-        topic.participants.remove(current)
-        topic.save()
-    for topic in Topic.objects.filter(author=current):
-        topic.author = anonymous
-        topic.save()
-    TopicFollowed.objects.filter(user=current).delete()
-    # Before deleting gallery let's summurize what we deleted
-    # - unpublished tutorials with only the unregistering member as an author
-    # - unpublished articles with only the unregistering member as an author
-    # - all category associated with those entites (have a look on article.delete_entity_and_tree
-    # and tutorial.delete_entity_and_tree
-    # So concerning galleries, we just have for us
-    # - "personnal galleries" with only one owner (unregistering user)
-    # - "personnal galleries" with more than one owner
-    # so we will just delete the unretistering user ownership and give it to anonymous in the only case
-    # he was alone so that gallery is not lost
-    for gallery in UserGallery.objects.filter(user=current):
-        if gallery.gallery.get_linked_users().count() == 1:
-            anonymous_gallery = UserGallery()
-            anonymous_gallery.user = external
-            anonymous_gallery.mode = "w"
-            anonymous_gallery.gallery = gallery.gallery
-            anonymous_gallery.save()
-        gallery.delete()
+    """allow members to unregister: they are logged out at once, and the `unregister_members` command hands their
+    contents and messages over to the anonymous and external accounts (see `zds.member.unregistration`)"""
 
+    queue_unregistration(request.user)
+    # the sessions opened elsewhere, then this one
+    logout_user(request.user.username)
     logout(request)
-    User.objects.filter(pk=current.pk).delete()
+    messages.info(request, _(u'Votre désinscription est en cours, elle sera terminée dans quelques minutes.'))
     return redirect(reverse("zds.pages.views.home"))
 
 
@@ -651,7 +572,7 @@ def login_view(request):
                     if "remember" not in request.POST:
                         request.session.set_expiry(0)
                     profile.last_ip_address = get_client_ip(request)
-                    profile.save()
+                    profile.save(update_fields=['last_ip_address'])
                     # redirect the user if needed
                     try:
                         return redirect(next_page)
@@ -67,6 +67,20 @@ class PrivateTopicListAPITest(APITestCase):
         self.assertIsNone(response.data.get('next'))
         self.assertIsNone(response.data.get('previous'))
 
+    def test_list_of_private_topics_after_a_new_private_topic(self):
+        """
+        Gets list of private topics of a member, cached before one of them is created.
+        """
+        response = self.client.get(reverse('api-mp-list'))
+        self.assertEqual(response.data.get('count'), 0)
+
+        private_topic = PrivateTopicFactory(author=UserFactory())
+        private_topic.participants.add(self.profile.user)
+
+        response = self.client.get(reverse('api-mp-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('count'), 1)
+
     def test_list_of_private_topics_with_several_pages(self):
         """
         Gets list of private topics of a member with several pages.
@@ -651,6 +665,28 @@ class PrivatePostListAPI(APITestCase):
         self.assertIsNone(response.data.get('next'))
         self.assertIsNone(response.data.get('previous'))
 
+    def test_list_of_private_posts_after_an_answer(self):
+        """
+        Gets list of private posts, cached before an answer, and only invalidated for this private topic.
+        """
+        another_private_topic = PrivateTopicFactory(author=self.profile.user)
+        PrivatePostFactory(author=self.profile.user, privatetopic=another_private_topic, position_in_topic=1)
+        self.client.get(reverse('api-mp-message-list', args=[another_private_topic.id]))
+        response = self.client.get(reverse('api-mp-message-list', args=[self.private_topic.id]))
+        self.assertEqual(response.data.get('count'), 0)
+
+        data = {
+            'text': 'Welcome to this private post!'
+        }
+        self.client.post(reverse('api-mp-message-list', args=[self.private_topic.id]), data)
+
+        response = self.client.get(reverse('api-mp-message-list', args=[self.private_topic.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('count'), 1)
+        response = self.client.get(reverse('api-mp-message-list', args=[another_private_topic.id]))
+        self.assertEqual(response.data.get('count'), 1)
+        self.assertEqual(response.data.get('results')[0].get('privatetopic'), another_private_topic.id)
+
     def test_list_of_private_posts_with_several_pages(self):
         """
         Gets list of private posts of a member with several pages.
@@ -10,42 +10,59 @@ from rest_framework_extensions.etag.decorators import etag
 from rest_framework_extensions.key_constructor import bits
 from rest_framework_extensions.key_constructor.constructors import DefaultKeyConstructor
 from zds.api.DJRF3xPaginationKeyBit import DJRF3xPaginationKeyBit
+from zds.api.bits import UpdatedAtKeyBit, UserUpdatedAtKeyBit, PRIVATE_TOPICS, PRIVATE_POSTS
 
 from zds.mp.api.permissions import IsParticipant, IsParticipantFromPrivatePost, IsLastPrivatePostOfCurrentUser, \
     IsAloneInPrivatePost, IsAuthor
 from zds.mp.api.serializers import PrivateTopicSerializer, PrivateTopicUpdateSerializer, PrivateTopicCreateSerializer, \
     PrivatePostSerializer, PrivatePostUpdateSerializer, PrivatePostCreateSerializer
 from zds.mp.commons import LeavePrivateTopic, MarkPrivateTopicAsRead
-from zds.mp.models import PrivateTopic, PrivatePost
-from zds.utils.templatetags.interventions import interventions_privatetopics
+from zds.mp.models import PrivateTopic, PrivatePost, list_unread_privatetopics
 
 
 class PagingPrivateTopicListKeyConstructor(DefaultKeyConstructor):
     pagination = DJRF3xPaginationKeyBit()
-    search = bits.QueryParamsKeyBit(['search', 'ordering'])
-    list_sql_query = bits.ListSqlQueryKeyBit()
+    search = bits.QueryParamsKeyBit(['search', 'ordering', 'page_size', 'expand'])
+    updated_at = UserUpdatedAtKeyBit(PRIVATE_TOPICS)
     unique_view_id = bits.UniqueViewIdKeyBit()
     user = bits.UserKeyBit()
 
 
 class PagingPrivateTopicUnreadListKeyConstructor(DefaultKeyConstructor):
     pagination = DJRF3xPaginationKeyBit()
+    search = bits.QueryParamsKeyBit(['page_size', 'expand'])
+    updated_at = UserUpdatedAtKeyBit(PRIVATE_TOPICS)
     unique_view_id = bits.UniqueViewIdKeyBit()
     user = bits.UserKeyBit()
 
 
-class DetailKeyConstructor(DefaultKeyConstructor):
+class PrivateTopicDetailKeyConstructor(DefaultKeyConstructor):
     format = bits.FormatKeyBit()
     language = bits.LanguageKeyBit()
-    retrieve_sql_query = bits.RetrieveSqlQueryKeyBit()
+    search = bits.QueryParamsKeyBit(['expand'])
+    url_kwargs = bits.KwargsKeyBit('*')
+    updated_at = UserUpdatedAtKeyBit(PRIVATE_TOPICS)
+    unique_view_id = bits.UniqueViewIdKeyBit()
+    user = bits.UserKeyBit()
+
+
+class PrivatePostDetailKeyConstructor(DefaultKeyConstructor):
+    format = bits.FormatKeyBit()
+    language = bits.LanguageKeyBit()
+    search = bits.QueryParamsKeyBit(['expand'])
+    data_format = bits.HeadersKeyBit(['X-Data-Format'])
+    url_kwargs = bits.KwargsKeyBit('*')
+    updated_at = UpdatedAtKeyBit(PRIVATE_POSTS, 'pk_ptopic')
     unique_view_id = bits.UniqueViewIdKeyBit()
     user = bits.UserKeyBit()
 
 
 class PagingPrivatePostListKeyConstructor(DefaultKeyConstructor):
     pagination = DJRF3xPaginationKeyBit()
-    search = bits.QueryParamsKeyBit(['ordering'])
-    list_sql_query = bits.ListSqlQueryKeyBit()
+    search = bits.QueryParamsKeyBit(['ordering', 'page_size', 'expand'])
+    data_format = bits.HeadersKeyBit(['X-Data-Format'])
+    url_kwargs = bits.KwargsKeyBit('*')
+    updated_at = UpdatedAtKeyBit(PRIVATE_POSTS, 'pk_ptopic')
     unique_view_id = bits.UniqueViewIdKeyBit()
     user = bits.UserKeyBit()
 
@@ -187,7 +204,7 @@ class PrivateTopicDetailAPI(LeavePrivateTopic, RetrieveUpdateDestroyAPIView):
     """
 
     queryset = PrivateTopic.objects.all()
-    obj_key_func = DetailKeyConstructor()
+    obj_key_func = PrivateTopicDetailKeyConstructor()
 
     @etag(obj_key_func)
     @cache_response(key_func=obj_key_func)
@@ -391,7 +408,7 @@ class PrivatePostDetailAPI(RetrieveUpdateAPIView):
     """
 
     queryset = PrivatePost.objects.all()
-    obj_key_func = DetailKeyConstructor()
+    obj_key_func = PrivatePostDetailKeyConstructor()
 
     @etag(obj_key_func)
     @cache_response(key_func=obj_key_func)
@@ -517,4 +534,4 @@ class PrivateTopicReadAPI(ListAPIView):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        return interventions_privatetopics(user=self.get_current_user())['unread']
+        return list_unread_privatetopics(self.get_current_user())
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
+from zds.api.bits import change_api_updated_at, PRIVATE_TOPICS as API_PRIVATE_TOPICS
 from zds.mp.models import never_privateread, mark_read
+from zds.utils.notifications import invalidate_notifications, PRIVATE_TOPICS
 from zds.utils.templatetags.emarkdown import emarkdown
 
 
@@ -18,6 +20,10 @@ class LeavePrivateTopic(object):
             instance.author = move
             instance.participants.remove(move)
             instance.save()
+            # the former author is not a participant, so the participants update did not refresh their notifications
+            # and their private topics in the API
+            invalidate_notifications([self.get_current_user().pk], PRIVATE_TOPICS)
+            change_api_updated_at(API_PRIVATE_TOPICS, [self.get_current_user().pk])
         else:
             instance.participants.remove(self.get_current_user())
             instance.save()
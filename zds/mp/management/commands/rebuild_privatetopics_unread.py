@@ -0,0 +1,19 @@
+# coding: utf-8
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from zds.mp.models import PrivateTopicUnread, UNREAD_MEMBERS_SQL
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the index of the unread private topics from the private topics read by each member.'
+    # python manage.py rebuild_privatetopics_unread
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            PrivateTopicUnread.objects.all().delete()
+            connection.cursor().execute('insert into mp_privatetopicunread (privatetopic_id, user_id) ' +
+                                        UNREAD_MEMBERS_SQL)
+
+        self.stdout.write(u'{} unread private topics indexed.'.format(PrivateTopicUnread.objects.count()))
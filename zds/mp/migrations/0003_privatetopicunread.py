@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+# Fill the index with the current read state: every member of a private topic without read of its last message.
+BACKFILL_SQL = '''
+    insert into mp_privatetopicunread (privatetopic_id, user_id)
+    select m.privatetopic_id, m.user_id
+    from (
+        select t.id as privatetopic_id, t.author_id as user_id from mp_privatetopic t
+        union
+        select p.privatetopic_id as privatetopic_id, p.user_id as user_id from mp_privatetopic_participants p
+    ) m
+    inner join mp_privatetopic t on t.id = m.privatetopic_id
+    left outer join mp_privatetopicread r on r.user_id = m.user_id and r.privatepost_id = t.last_message_id
+    where r.id is null'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mp', '0002_auto_20150416_1750'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrivateTopicUnread',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('privatetopic', models.ForeignKey(to='mp.PrivateTopic')),
+                ('user', models.ForeignKey(related_name='privatetopics_unread', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Message priv\xe9 non lu',
+                'verbose_name_plural': 'Messages priv\xe9s non lus',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='privatetopicunread',
+            unique_together=set([('privatetopic', 'user')]),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, 'delete from mp_privatetopicunread'),
+    ]
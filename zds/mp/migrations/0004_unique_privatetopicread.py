@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicates(apps, schema_editor):
+    """Keep only the last PrivateTopicRead of each (privatetopic, user) pair."""
+    PrivateTopicRead = apps.get_model('mp', 'PrivateTopicRead')
+    duplicates = PrivateTopicRead.objects\
+        .values('privatetopic', 'user')\
+        .annotate(last_pk=Max('pk'), count=Count('pk'))\
+        .filter(count__gt=1)
+    for duplicate in duplicates:
+        PrivateTopicRead.objects\
+            .filter(privatetopic__pk=duplicate['privatetopic'], user__pk=duplicate['user'])\
+            .exclude(pk=duplicate['last_pk'])\
+            .delete()
+
+
+def keep_rows(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mp', '0003_privatetopicunread'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, keep_rows),
+        migrations.AlterUniqueTogether(
+            name='privatetopicread',
+            unique_together=set([('privatetopic', 'user')]),
+        ),
+    ]
@@ -4,9 +4,27 @@ from math import ceil
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from zds.api.bits import change_api_updated_at, PRIVATE_TOPICS, PRIVATE_POSTS
 from zds.mp.managers import PrivateTopicManager, PrivatePostManager
 from zds.utils import get_current_user, slugify
+from zds.utils.misc import upsert
+from zds.utils.signals import content_read
+
+
+# Members (author and participants) of the private topics who did not read the last message, see `PrivateTopicUnread`.
+UNREAD_MEMBERS_SQL = '''
+    select m.privatetopic_id, m.user_id
+    from (
+        select t.id as privatetopic_id, t.author_id as user_id from mp_privatetopic t
+        union
+        select p.privatetopic_id as privatetopic_id, p.user_id as user_id from mp_privatetopic_participants p
+    ) m
+    inner join mp_privatetopic t on t.id = m.privatetopic_id
+    left outer join mp_privatetopicread r on r.user_id = m.user_id and r.privatepost_id = t.last_message_id
+    where r.id is null'''
 
 
 class PrivateTopic(models.Model):
@@ -107,14 +125,11 @@ class PrivateTopic(models.Model):
             user = get_current_user()
 
         try:
-            post = PrivateTopicRead.objects \
+            return PrivateTopicRead.objects \
                 .select_related() \
-                .filter(privatetopic=self, user=user)
-            if len(post) == 0:
-                return self.first_post()
-            return post.latest('privatepost__position_in_topic').privatepost
+                .get(privatetopic=self, user=user).privatepost
 
-        except PrivatePost.DoesNotExist:
+        except (PrivatePost.DoesNotExist, PrivateTopicRead.DoesNotExist):
             return self.first_post()
 
     def first_unread_post(self, user=None):
@@ -133,8 +148,7 @@ class PrivateTopic(models.Model):
         try:
             last_post = PrivateTopicRead.objects \
                 .select_related() \
-                .filter(privatetopic=self, user=user) \
-                .latest('privatepost__position_in_topic').privatepost
+                .get(privatetopic=self, user=user).privatepost
 
             next_post = PrivatePost.objects.filter(
                 privatetopic__pk=self.pk,
@@ -290,6 +304,7 @@ class PrivateTopicRead(models.Model):
     class Meta:
         verbose_name = u'Message privé lu'
         verbose_name_plural = u'Messages privés lus'
+        unique_together = ('privatetopic', 'user')
 
     privatetopic = models.ForeignKey(PrivateTopic, db_index=True)
     privatepost = models.ForeignKey(PrivatePost, db_index=True)
@@ -305,6 +320,33 @@ class PrivateTopicRead(models.Model):
         return u'<Sujet « {0} » lu par {1}, #{2}>'.format(self.privatetopic, self.user, self.privatepost.pk)
 
 
+class PrivateTopicUnread(models.Model):
+    """
+    Denormalized read state of the private topics.
+
+    There is one row per member (author or participant) of a private topic who did not read its last message yet, so
+    the unread private topics of a member are found with a single indexed lookup. Rows are created by
+    `send_message_mp()` and removed by `mark_read()`.
+    """
+
+    class Meta:
+        verbose_name = u'Message privé non lu'
+        verbose_name_plural = u'Messages privés non lus'
+        unique_together = ('privatetopic', 'user')
+
+    privatetopic = models.ForeignKey(PrivateTopic, db_index=True)
+    user = models.ForeignKey(User, related_name='privatetopics_unread', db_index=True)
+
+    def __unicode__(self):
+        """
+        Human-readable representation of the PrivateTopicUnread model.
+
+        :return: PrivateTopicUnread description
+        :rtype: unicode
+        """
+        return u'<Sujet « {0} » non lu par {1}>'.format(self.privatetopic, self.user)
+
+
 def never_privateread(privatetopic, user=None):
     """
     Check if a private topic has been read by an user since it last post was added.
@@ -340,7 +382,105 @@ def mark_read(privatetopic, user=None):
     if user is None:
         user = get_current_user()
 
-    # Delete the old PrivateTopic and add the new as the last read
-    PrivateTopicRead.objects.filter(privatetopic=privatetopic, user=user).delete()
-    topic = PrivateTopicRead(privatepost=privatetopic.last_message, privatetopic=privatetopic, user=user)
-    topic.save()
+    upsert(PrivateTopicRead,
+           {'privatetopic_id': privatetopic.pk, 'user_id': user.pk},
+           {'privatepost_id': privatetopic.last_message_id})
+    PrivateTopicUnread.objects.filter(privatetopic=privatetopic, user=user).delete()
+    content_read.send(sender=PrivateTopic, instance=privatetopic, user=user)
+
+
+def mark_unread(privatetopic, users=None):
+    """
+    Mark a private topic as unread for some of its members.
+
+    :param privatetopic: a PrivateTopic
+    :type privatetopic: PrivateTopic object
+    :param users: primary keys of the users. If None, all the members (author and participants) of the private topic
+    :type users: iterable
+    :return: nothing is returned
+    :rtype: None
+    """
+    if users is None:
+        users = list(privatetopic.participants.values_list('pk', flat=True)) + [privatetopic.author_id]
+
+    already_unread = PrivateTopicUnread.objects\
+        .filter(privatetopic=privatetopic)\
+        .values_list('user__pk', flat=True)
+    unread = [PrivateTopicUnread(privatetopic=privatetopic, user_id=pk) for pk in set(users) - set(already_unread)]
+    try:
+        with transaction.atomic():
+            PrivateTopicUnread.objects.bulk_create(unread)
+    except IntegrityError:
+        # another message was sent at the same time, some rows already exist
+        for row in unread:
+            PrivateTopicUnread.objects.get_or_create(privatetopic=privatetopic, user_id=row.user_id)
+
+
+def list_unread_privatetopics(user):
+    """
+    Get the private topics whose last message is not read by the user, from the newest to the oldest.
+
+    :param user: an user as Django User object
+    :type user: User object
+    :return: the unread private topics
+    :rtype: QuerySet
+    """
+    return PrivateTopic.objects.filter(privatetopicunread__user=user).order_by('-pubdate')
+
+
+@receiver(post_save, sender=PrivateTopic)
+def update_unread_members(sender, instance, created, **kwargs):
+    # a new private topic without message is unread by its author, and the former author does not see it anymore once
+    # he left it.
+    if created:
+        mark_unread(instance, [instance.author_id])
+    else:
+        PrivateTopicUnread.objects\
+            .filter(privatetopic=instance)\
+            .exclude(user__pk=instance.author_id)\
+            .exclude(user__in=instance.participants.all())\
+            .delete()
+
+
+@receiver(m2m_changed, sender=PrivateTopic.participants.through)
+def update_unread_participants(sender, instance, action, pk_set, **kwargs):
+    if not pk_set or not isinstance(instance, PrivateTopic):
+        return
+    if action == 'post_add':
+        already_read = PrivateTopicRead.objects\
+            .filter(privatetopic=instance, privatepost__pk=instance.last_message_id)\
+            .values_list('user__pk', flat=True)
+        mark_unread(instance, set(pk_set) - set(already_read))
+    elif action == 'post_remove':
+        PrivateTopicUnread.objects\
+            .filter(privatetopic=instance, user__pk__in=pk_set)\
+            .exclude(user__pk=instance.author_id)\
+            .delete()
+
+
+@receiver(post_save, sender=PrivateTopic)
+@receiver(post_delete, sender=PrivateTopic)
+def change_api_private_topics_updated_at(sender, instance, **kwargs):
+    # a private topic is only deleted when its author is alone, the participants are already removed
+    members = [instance.author_id]
+    if kwargs['signal'] == post_save:
+        members += list(instance.participants.values_list('pk', flat=True))
+    change_api_updated_at(PRIVATE_TOPICS, members)
+
+
+@receiver(m2m_changed, sender=PrivateTopic.participants.through)
+def change_api_participants_updated_at(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove') and pk_set and isinstance(instance, PrivateTopic):
+        change_api_updated_at(PRIVATE_TOPICS, pk_set)
+
+
+@receiver(post_save, sender=PrivatePost)
+@receiver(post_delete, sender=PrivatePost)
+def change_api_private_posts_updated_at(sender, instance, **kwargs):
+    change_api_updated_at(PRIVATE_POSTS, [instance.privatetopic_id])
+
+
+@receiver(content_read, sender=PrivateTopic)
+def change_api_reader_updated_at(sender, instance, user, **kwargs):
+    # `PrivateTopicRead` is saved by `upsert()`, without signal: the unread private topics of the reader changed
+    change_api_updated_at(PRIVATE_TOPICS, [user.pk])
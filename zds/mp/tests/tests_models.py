@@ -6,7 +6,8 @@ from math import ceil
 
 from zds.member.factories import ProfileFactory
 from zds.mp.factories import PrivateTopicFactory, PrivatePostFactory
-from zds.mp.models import mark_read, never_privateread, PrivateTopicRead
+from zds.mp.models import mark_read, never_privateread, PrivateTopicRead, list_unread_privatetopics
+from zds.utils.mps import send_message_mp
 from zds import settings
 
 # by moment, i wrote the scenario to be simpler
@@ -264,3 +265,29 @@ class FunctionTest(TestCase):
             author=self.profile2.user,
             position_in_topic=3)
         self.assertTrue(self.topic1.never_read(self.profile1.user))
+
+    def test_list_unread_privatetopics(self):
+        profile3 = ProfileFactory()
+        self.assertEqual([self.topic1], list(list_unread_privatetopics(self.profile1.user)))
+        self.assertEqual([self.topic1], list(list_unread_privatetopics(self.profile2.user)))
+        self.assertEqual([], list(list_unread_privatetopics(profile3.user)))
+
+        mark_read(self.topic1, self.profile1.user)
+        self.assertEqual([], list(list_unread_privatetopics(self.profile1.user)))
+
+        # a new message makes the topic unread again
+        send_message_mp(self.profile2.user, self.topic1, u'Une réponse', send_by_mail=False)
+        self.assertEqual([self.topic1], list(list_unread_privatetopics(self.profile1.user)))
+
+        # only the members see it
+        self.topic1.participants.add(profile3.user)
+        self.assertEqual([self.topic1], list(list_unread_privatetopics(profile3.user)))
+        self.topic1.participants.remove(profile3.user)
+        self.assertEqual([], list(list_unread_privatetopics(profile3.user)))
+
+        # the author leaves the topic
+        self.topic1.author = self.profile2.user
+        self.topic1.participants.remove(self.profile2.user)
+        self.topic1.save()
+        self.assertEqual([], list(list_unread_privatetopics(self.profile1.user)))
+        self.assertEqual([self.topic1], list(list_unread_privatetopics(self.profile2.user)))
@@ -6,6 +6,7 @@ from django.test import TestCase
 from zds import settings
 from zds.member.factories import ProfileFactory
 from zds.mp.models import PrivateTopic
+from zds.utils.outbox import send_queued_emails
 
 
 class MpUtilTest(TestCase):
@@ -62,6 +63,7 @@ class MpUtilTest(TestCase):
                                    self.user4.email]
 
         # Check everyone receive a MP, except op
+        send_queued_emails()
         self.assertEquals(len(mail.outbox), len(should_receive_response))
 
         for response in mail.outbox:
@@ -87,6 +89,7 @@ class MpUtilTest(TestCase):
             follow=True
         )
 
+        send_queued_emails()
         mail.outbox = []
         self.client.logout()
         login_check = self.client.login(
@@ -108,6 +111,7 @@ class MpUtilTest(TestCase):
 
         # Check user1 receive mails
         should_receive_response = [self.user1.email]
+        send_queued_emails()
 
         self.assertEquals(len(mail.outbox), len(should_receive_response))
 
@@ -23,7 +23,7 @@ from zds.mp.decorator import is_participant
 from zds.mp.commons import LeavePrivateTopic, MarkPrivateTopicAsRead, UpdatePrivatePost
 from zds.utils.forums import CreatePostView
 from zds.utils.mps import send_mp, send_message_mp
-from zds.utils.paginator import ZdSPagingListView
+from zds.utils.paginator import ZdSPagingListView, PositionPaginator
 from .forms import PrivateTopicForm, PrivatePostForm, PrivateTopicEditForm
 from .models import PrivateTopic, PrivatePost
 
@@ -269,6 +269,11 @@ class PrivatePostList(MarkPrivateTopicAsRead, ZdSPagingListView, SingleObjectMix
     def get_queryset(self):
         return PrivatePost.objects.get_message_of_a_private_topic(self.object.pk)
 
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return PositionPaginator(queryset, per_page, 'position_in_topic',
+                                 last_position=self.object.last_message.position_in_topic,
+                                 allow_empty_first_page=allow_empty_first_page, **kwargs)
+
 
 class PrivatePostAnswer(CreatePostView):
     """
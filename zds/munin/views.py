@@ -1,5 +1,6 @@
+from django.db.models import Sum
 from munin.helpers import muninview
-from zds.forum.models import Topic, Post
+from zds.forum.models import Forum, Topic
 from zds.mp.models import PrivateTopic, PrivatePost
 from zds.tutorialv2.models.models_database import PublishableContent, ContentReaction
 
@@ -7,9 +8,8 @@ from zds.tutorialv2.models.models_database import PublishableContent, ContentRea
 @muninview(config="""graph_title Total Topics
 graph_vlabel topics""")
 def total_topics(request):
-    topics = Topic.objects.all()
-    return [("topics", topics.count()),
-            ("solved", topics.filter(is_solved=True).count())]
+    return [("topics", Forum.objects.aggregate(count=Sum('topic_count'))['count'] or 0),
+            ("solved", Topic.objects.filter(is_solved=True).count())]
 
 
 @muninview(config="""graph_title Total Posts
@@ -19,7 +19,7 @@ posts.draw LINE1
 comments.label Article and Tutorial comments
 comments.draw STACK""")
 def total_posts(request):
-    return [tuple(["posts", Post.objects.all().count()]),
+    return [tuple(["posts", Forum.objects.aggregate(count=Sum('post_count'))['count'] or 0]),
             tuple(["comments", ContentReaction.objects.count()])]
 
 
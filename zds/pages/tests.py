@@ -1,11 +1,21 @@
 # coding: utf-8
 
+import json
+import os
+import shutil
+import tempfile
+
 from django.conf import settings
 from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from mock import patch
 
 from zds.member.factories import ProfileFactory, StaffProfileFactory
+from zds.utils import context_processor
+from zds.utils.context_processor import get_git_version
 
 
 class PagesMemberTests(TestCase):
@@ -247,3 +257,42 @@ class PagesGuestTests(TestCase):
         )
 
         self.assertTrue('git_version' in result.context[-1])
+
+    def test_version(self):
+        """Test: the version is read from the version file once, and given by /version."""
+
+        path = os.path.join(tempfile.mkdtemp(), 'version.json')
+        with open(path, 'w') as version_file:
+            json.dump({'branch': 'prod', 'commit': '0123456789abcdef'}, version_file)
+        version_file_setting = settings.ZDS_APP['site']['version_file']
+        settings.ZDS_APP['site']['version_file'] = path
+        context_processor._git_version = None
+        try:
+            self.assertEqual(u'prod/0123456', get_git_version()['name'])
+            os.remove(path)
+            self.assertEqual(u'prod/0123456', get_git_version()['name'])  # not read again
+
+            result = self.client.get(reverse('zds.pages.views.version'))
+            self.assertEqual(result.status_code, 200)
+            self.assertEqual('0123456789abcdef', json.loads(result.content)['commit'])
+        finally:
+            settings.ZDS_APP['site']['version_file'] = version_file_setting
+            context_processor._git_version = None
+            shutil.rmtree(os.path.dirname(path))
+
+    def test_write_version_file_without_version(self):
+        """Test: the file of a former deployment is removed when the version cannot be read."""
+
+        path = os.path.join(tempfile.mkdtemp(), 'version.json')
+        with open(path, 'w') as version_file:
+            json.dump({'branch': 'prod', 'commit': '0123456789abcdef'}, version_file)
+        version_file_setting = settings.ZDS_APP['site']['version_file']
+        settings.ZDS_APP['site']['version_file'] = path
+        try:
+            with patch('zds.utils.context_processor.read_git_version', return_value=None):
+                with self.assertRaises(CommandError):
+                    call_command('write_version_file')
+            self.assertFalse(os.path.exists(path))
+        finally:
+            settings.ZDS_APP['site']['version_file'] = version_file_setting
+            shutil.rmtree(os.path.dirname(path))
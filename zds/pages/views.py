@@ -1,5 +1,6 @@
 # coding: utf-8
 
+import json
 import os.path
 import random
 from django.contrib import messages
@@ -9,6 +10,7 @@ from django.contrib.auth.models import Group, User
 from django.core.exceptions import PermissionDenied
 from django.core.mail import EmailMultiAlternatives
 from django.core.urlresolvers import reverse
+from django.http import HttpResponse
 from django.template.loader import render_to_string
 from django.shortcuts import render
 from zds import settings
@@ -19,6 +21,7 @@ from zds.featured.models import FeaturedResource, FeaturedMessage
 from zds.pages.forms import AssocSubscribeForm
 from zds.settings import BASE_DIR
 from utils import get_last_tutorials, get_tutorials_count, get_last_articles
+from zds.utils.context_processor import get_git_version
 from zds.utils.models import Alert
 from django.utils.translation import ugettext_lazy as _
 
@@ -162,6 +165,11 @@ def alerts(request):
     })
 
 
+def version(request):
+    """The deployed version of the site, in JSON."""
+    return HttpResponse(json.dumps(get_git_version()), content_type='application/json')
+
+
 def custom_error_500(request):
     """Custom view for 500 errors"""
     return render(request, '500.html')
@@ -0,0 +1,146 @@
+# coding: utf-8
+
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from haystack import connections
+from haystack.constants import DJANGO_CT, DJANGO_ID, ID
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet, SQ
+
+from zds.forum.models import Post
+
+CONNECTION_ALIAS = 'benchmark'
+VOCABULARY_SIZE = 5000
+GROUPS = ['staff', 'devs']
+
+
+def create_vocabulary(generator):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [u''.join(generator.choice(letters) for __ in range(generator.randint(3, 10)))
+            for __ in range(VOCABULARY_SIZE)]
+
+
+def pick_word(generator, vocabulary):
+    """Pick a word, the first ones of the vocabulary being much more frequent than the last ones (as in a real
+    text)."""
+    return vocabulary[int(len(vocabulary) * generator.random() ** 3)]
+
+
+def create_post(generator, vocabulary, number):
+    """
+    :return: a document, as ``PostIndex`` would prepare it for a post
+    :rtype: dict
+    """
+    text = u' '.join(pick_word(generator, vocabulary) for __ in range(generator.randint(20, 300)))
+    topic_title = u' '.join(pick_word(generator, vocabulary) for __ in range(5))
+    return {
+        ID: u'forum.post.{}'.format(number),
+        DJANGO_CT: u'forum.post',
+        DJANGO_ID: u'{}'.format(number),
+        'text': u'membre{}\n\n{}'.format(number % 100, text),
+        'txt': text,
+        'author': u'membre{}'.format(number % 100),
+        'pubdate': datetime.datetime(2015, 1, 1) + datetime.timedelta(minutes=number),
+        'topic_title': topic_title,
+        'topic_author': u'membre{}'.format(number % 50),
+        'topic_forum': u'Forum {}'.format(number % 20),
+        'tags': [u'tag{}'.format(number % 30)],
+        # one post out of ten in a private forum
+        'permissions': [generator.choice(GROUPS)] if number % 10 == 0 else u'public',
+    }
+
+
+class Command(BaseCommand):
+    help = 'Index synthetic forum posts with the SQLite search backend (in a temporary database), then report the ' \
+           'indexing throughput and the latency of searches filtered as in the search page.'
+    # python manage.py benchmark_search --posts=10000 --queries=200
+
+    option_list = BaseCommand.option_list + (
+        make_option('--posts',
+                    type='int',
+                    dest='posts',
+                    default=10000,
+                    help='Number of posts to index.'),
+        make_option('--queries',
+                    type='int',
+                    dest='queries',
+                    default=100,
+                    help='Number of searches.'),
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=1000,
+                    help='Number of posts indexed in each transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        generator = random.Random(42)
+        vocabulary = create_vocabulary(generator)
+        path = tempfile.mkdtemp()
+        connections.connections_info[CONNECTION_ALIAS] = {
+            'ENGINE': 'zds.search.sqlite_backend.SQLiteEngine',
+            'PATH': os.path.join(path, 'search.sqlite3'),
+            'SILENTLY_FAIL': False,
+        }
+
+        try:
+            backend = connections[CONNECTION_ALIAS].get_backend()
+            backend.ensure_setup()
+
+            indexing = 0.0
+            for start in range(0, options['posts'], options['batch_size']):
+                end = min(start + options['batch_size'], options['posts'])
+                posts = [create_post(generator, vocabulary, number) for number in range(start, end)]
+                begin = time.time()
+                backend.index_documents(posts)
+                indexing += time.time() - begin
+
+            size = os.path.getsize(backend.path) / (1024.0 * 1024.0)
+            self.stdout.write(u'{} posts indexed in {:.1f} s ({:.0f} posts/s), index of {:.1f} MB'.format(
+                options['posts'], indexing, options['posts'] / max(indexing, 0.001), size))
+
+            self.stdout.write(u'{:>12} {:>10} {:>10} {:>10} {:>10}'.format(
+                'search', 'mean (ms)', 'median', '95%', 'max'))
+            for label, highlight in [('results', False), ('highlighted', True)]:
+                latencies = []
+                for __ in range(options['queries']):
+                    words = [pick_word(generator, vocabulary) for __ in range(generator.randint(1, 3))]
+                    latencies.append(self.search(u' '.join(words), highlight))
+                self.write_latencies(label, latencies)
+        finally:
+            del connections.connections_info[CONNECTION_ALIAS]
+            connections._connections.pop(CONNECTION_ALIAS, None)  # haystack has no public way to close a connection
+            shutil.rmtree(path)
+
+    def search(self, query, highlight):
+        """Search as a member of a group, then get the first page of results and their number.
+
+        :return: the duration of the search (in milliseconds)
+        :rtype: float
+        """
+        begin = time.time()
+        queryset = SearchQuerySet(using=CONNECTION_ALIAS).models(Post).filter(content=AutoQuery(query)) \
+            .filter(SQ(permissions='public') | SQ(permissions__in=GROUPS[:1]))
+        if highlight:
+            queryset = queryset.highlight()
+        list(queryset[:20])
+        queryset.count()
+        return (time.time() - begin) * 1000.0
+
+    def write_latencies(self, label, latencies):
+        latencies = sorted(latencies)
+        if not latencies:
+            return
+        self.stdout.write(u'{:>12} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}'.format(
+            label,
+            sum(latencies) / len(latencies),
+            latencies[len(latencies) // 2],
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            latencies[-1]))
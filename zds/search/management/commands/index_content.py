@@ -1,8 +1,11 @@
 # coding: utf-8
+from multiprocessing import Pool
 from optparse import make_option
 import traceback
 
+from django.core.cache import caches
 from django.core.management import BaseCommand
+from django.db import connection
 import sys
 from zds.search.utils import reindex_content
 from zds.tutorialv2.models.models_database import PublishedContent
@@ -14,13 +17,19 @@ class Command(BaseCommand):
            'You can choose to only copy content with certain id. Pass as argument the content id, you want to copy.' \
            'Example, manage.py index_content 1, will copy content id 1 information into database.' \
            ''
+    # python manage.py index_content --only-flagged --jobs=4
 
     option_list = BaseCommand.option_list + tuple([
         make_option('--only-flagged',
                     action='store_true',
                     dest='only-flagged',
                     default=False,
-                    help='Only copy content informations that have been flagged by the system.')
+                    help='Only copy content informations that have been flagged by the system.'),
+        make_option('--jobs',
+                    type='int',
+                    dest='jobs',
+                    default=1,
+                    help='Number of processes copying the contents.')
     ])
 
     def handle(self, *args, **options):
@@ -28,12 +37,7 @@ class Command(BaseCommand):
         # Do the Query
         query_set = PublishedContent.objects.exclude(sha_public__isnull=True) \
                                             .exclude(sha_public__exact='') \
-                                            .exclude(must_redirect=True)\
-                                            .prefetch_related('content')\
-                                            .prefetch_related('content__subcategory')\
-                                            .prefetch_related('content__authors')\
-                                            .prefetch_related('content__licence')\
-                                            .prefetch_related('content__image')
+                                            .exclude(must_redirect=True)
 
         if args:
             query_set = query_set.filter(content__pk__in=args)
@@ -42,26 +46,58 @@ class Command(BaseCommand):
             if options['only-flagged']:
                 query_set = query_set.filter(content__must_reindex=True)
 
-        # Start to copy informations
-        for content in query_set.all():
-
-            try:
+        pks = list(query_set.values_list('pk', flat=True))
+        jobs = min(options.get('jobs') or 1, len(pks))
 
+        # Start to copy informations
+        if jobs <= 1:
+            results = (index(pk) for pk in pks)
+        else:
+            # the workers must not share the connections of this process
+            connection.close()
+            for backend in caches.all():
+                backend.close()
+            pool = Pool(jobs)
+            results = pool.imap_unordered(index, pks)
+
+        try:
+            for content_pk, title, error in results:
                 self.stdout.write('Copying content information with id {0} into database ({1})'
-                                  .format(content.content.id, content.content.title), ending='')
-
-                reindex_content(content)
-
-            # Voluntary broad exception, in any case, we must stop the process.
-            except:
-                self.stdout.write(' [FAIL]')
-                print_error()
-                continue
-
-            self.stdout.write(' [OK]')
-
-
-def print_error():
+                                  .format(content_pk, title), ending='')
+                if error:
+                    self.stdout.write(' [FAIL]')
+                    sys.stdout.write(error)
+                else:
+                    self.stdout.write(' [OK]')
+        finally:
+            if jobs > 1:
+                pool.close()
+                pool.join()
+
+
+def index(published_content_pk):
+    """Copy the informations of a content into the search tables (possibly in a worker process).
+
+    :param published_content_pk: pk of the ``PublishedContent``
+    :type published_content_pk: int
+    :return: ``(pk of the content, title of the content, traceback of the error or None)``
+    :rtype: tuple
+    """
+    published_content = PublishedContent.objects \
+        .select_related('content', 'content__licence', 'content__image') \
+        .prefetch_related('content__subcategory', 'content__authors') \
+        .get(pk=published_content_pk)
+
+    try:
+        reindex_content(published_content)
+    # Voluntary broad exception, in any case, we must stop the process.
+    except:
+        return published_content.content.id, published_content.content.title, format_error()
+
+    return published_content.content.id, published_content.content.title, None
+
+
+def format_error():
     exc_type, exc_value, exc_traceback = sys.exc_info()
     to_display = traceback.format_exception(exc_type, exc_value, exc_traceback)
-    sys.stdout.write('\n'.join(to_display))
+    return '\n'.join(to_display)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_auto_20150820_1950'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchindexcontainer',
+            name='content_hash',
+            field=models.CharField(max_length=40, verbose_name=b'Empreinte', blank=True),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='searchindexextract',
+            name='content_hash',
+            field=models.CharField(max_length=40, verbose_name=b'Empreinte', blank=True),
+            preserve_default=True,
+        ),
+        migrations.AlterField(
+            model_name='searchindexauthors',
+            name='username',
+            field=models.CharField(max_length=80, verbose_name=b'Pseudo', db_index=True),
+            preserve_default=True,
+        ),
+        migrations.AlterField(
+            model_name='searchindextag',
+            name='title',
+            field=models.CharField(max_length=80, verbose_name=b'Titre', db_index=True),
+            preserve_default=True,
+        ),
+    ]
@@ -8,7 +8,7 @@ class SearchIndexTag(models.Model):
         verbose_name = 'Tag'
         verbose_name_plural = 'Tags'
 
-    title = models.CharField('Titre', max_length=80)
+    title = models.CharField('Titre', max_length=80, db_index=True)
 
 
 class SearchIndexAuthors(models.Model):
@@ -16,7 +16,7 @@ class SearchIndexAuthors(models.Model):
         verbose_name = 'Author'
         verbose_name_plural = 'Authors'
 
-    username = models.CharField('Pseudo', max_length=80)
+    username = models.CharField('Pseudo', max_length=80, db_index=True)
 
 
 class SearchIndexContent(models.Model):
@@ -71,6 +71,9 @@ class SearchIndexContainer(models.Model):
 
     keywords = models.TextField('Mots clés du contenu')
 
+    # hash of what it was built from (see `zds.search.utils.get_hash()`)
+    content_hash = models.CharField('Empreinte', max_length=40, blank=True)
+
 
 class SearchIndexExtract(models.Model):
 
@@ -88,3 +91,6 @@ class SearchIndexExtract(models.Model):
     extract_content = models.TextField('Contenu', null=True, blank=True)
 
     keywords = models.TextField('Mots clés du contenu')
+
+    # hash of what it was built from (see `zds.search.utils.get_hash()`)
+    content_hash = models.CharField('Empreinte', max_length=40, blank=True)
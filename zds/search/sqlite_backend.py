@@ -0,0 +1,637 @@
+# coding: utf-8
+
+"""
+A haystack backend storing the index in a SQLite database, with its FTS5 full-text search, so that the search (and the
+filtering of its results by permissions, tags or models) works without Solr, for the development and the tests.
+
+To use it, in the settings:
+
+.. sourcecode:: python
+
+    HAYSTACK_CONNECTIONS = {
+        'default': {
+            'ENGINE': 'zds.search.sqlite_backend.SQLiteEngine',
+            'PATH': os.path.join(BASE_DIR, 'search.sqlite3'),
+        },
+    }
+
+Each document is a row of ``documents``, with its stored fields in JSON (to build the results and sort them). The text
+fields are indexed in the FTS5 table ``document_texts`` (one column per field, the row having the same id as the
+document), and the other ones (tags, permissions, dates...) in ``document_values`` (one row per value). The text fields
+are searched with FTS5 (and the results ranked by relevance, with BM25), the other ones compared to their values.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import warnings
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six, tree
+from django.utils.encoding import force_text
+from haystack.backends import BaseEngine, BaseSearchBackend, BaseSearchQuery, log_query
+from haystack.constants import DJANGO_CT, DJANGO_ID, ID
+from haystack.exceptions import SearchBackendError, SkipDocument
+from haystack.inputs import AutoQuery, Exact, Not, Raw
+from haystack.models import SearchResult
+from haystack.utils import get_identifier, get_model_ct
+from haystack.utils.app_loading import haystack_get_model
+
+from zds.utils.highlighter import SearchHighlighter
+
+logger = logging.getLogger(__name__)
+
+# fields searched with FTS5 (the other ones are compared to their values)
+TEXT_FIELD_TYPES = ['string', 'edge_ngram', 'ngram']
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS schema (text_fields TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS documents ('
+    '    id INTEGER PRIMARY KEY,'
+    '    identifier TEXT NOT NULL UNIQUE,'
+    '    django_ct TEXT NOT NULL,'
+    '    django_id TEXT NOT NULL,'
+    '    data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS documents_django_ct ON documents (django_ct)',
+    # no type for `value`, so that the numbers are compared as numbers
+    'CREATE TABLE IF NOT EXISTS document_values (document INTEGER NOT NULL, field TEXT NOT NULL, value)',
+    'CREATE INDEX IF NOT EXISTS document_values_field_value ON document_values (field, value)',
+    'CREATE INDEX IF NOT EXISTS document_values_document ON document_values (document)',
+]
+
+TABLES = ['schema', 'documents', 'document_values', 'document_texts']
+
+VALUE_OPERATORS = {
+    'contains': '= ?',
+    'exact': '= ?',
+    'fuzzy': '= ?',
+    'content': '= ?',
+    'gt': '> ?',
+    'gte': '>= ?',
+    'lt': '< ?',
+    'lte': '<= ?',
+}
+
+DOCUMENT_COLUMNS = {
+    ID: 'identifier',
+    DJANGO_CT: 'django_ct',
+    DJANGO_ID: 'django_id',
+}
+
+WORD_RE = re.compile(r'\w', re.UNICODE)
+
+
+def quote(name):
+    """
+    :return: a name (of a table or of a column) quoted for SQLite, and FTS5 queries
+    :rtype: unicode
+    """
+    return u'"{}"'.format(name.replace('"', '""'))
+
+
+def as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+class CompiledQuery(object):
+    """What a ``SQLiteSearchQuery`` is turned into: a condition on the ``documents`` (``d``), and the text searched
+    (to rank and highlight the results)."""
+
+    def __init__(self, where=u'1', params=None, matches=None, words=None):
+        """
+        :param where: SQL condition
+        :param params: parameters of the condition
+        :param matches: FTS5 queries of what is searched in the text fields, to rank the results
+        :param words: words searched, to highlight them
+        """
+        self.where = where
+        self.params = params or []
+        self.matches = matches or []
+        self.words = words or []
+
+    @property
+    def match(self):
+        """
+        :return: a FTS5 query matching any of the searched texts, or ``None`` if no text is searched
+        :rtype: unicode
+        """
+        if not self.matches:
+            return None
+        return u' OR '.join(u'({})'.format(match) for match in self.matches)
+
+    def __unicode__(self):
+        return u'{} {}'.format(self.where, self.params)
+
+    def __str__(self):
+        return force_text(self).encode('utf-8')
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+
+    def __init__(self, connection_alias, **connection_options):
+        super(SQLiteSearchBackend, self).__init__(connection_alias, **connection_options)
+        self.path = connection_options.get('PATH')
+        if not self.path:
+            raise ImproperlyConfigured(
+                "You must specify a 'PATH' in your settings for connection '{}'.".format(connection_alias))
+
+        self.setup_complete = False
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        """A connection per thread, and opened again after a fork."""
+        if getattr(self.local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            self.local.connection = sqlite3.connect(self.path)
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def build_schema(self, fields):
+        """
+        :param fields: the fields of the search indexes, by name
+        :type fields: dict
+        :return: ``(content field, text fields, value fields, stored fields, multi-valued fields)``
+        :rtype: tuple
+        """
+        content_field_name = ''
+        text_fields = []
+        value_fields = []
+        stored_fields = []
+        multivalued_fields = []
+
+        for field_name, field_class in sorted(fields.items()):
+            name = field_class.index_fieldname
+            if field_class.document:
+                content_field_name = name
+            if field_class.stored:
+                stored_fields.append(name)
+            if field_class.is_multivalued:
+                multivalued_fields.append(name)
+            if not field_class.indexed and not field_class.document:
+                continue
+            if not field_class.is_multivalued and field_class.field_type in TEXT_FIELD_TYPES:
+                text_fields.append(name)
+            else:
+                value_fields.append(name)
+
+        if not content_field_name:
+            raise SearchBackendError('No document field was found in any search_indexes.')
+
+        return content_field_name, text_fields, value_fields, stored_fields, multivalued_fields
+
+    def setup(self, fields=None):
+        """Create the tables if needed. If the text fields changed, the index is emptied (it must be rebuilt).
+
+        :param fields: the fields of the search indexes, the ones of all the registered indexes by default
+        :type fields: dict
+        """
+        if fields is None:
+            from haystack import connections
+            fields = connections[self.connection_alias].get_unified_index().all_searchfields()
+
+        self.content_field_name, self.text_fields, self.value_fields, self.stored_fields, self.multivalued_fields = \
+            self.build_schema(fields)
+        text_fields = json.dumps(self.text_fields)
+
+        with self.connection as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+            row = connection.execute('SELECT text_fields FROM schema').fetchone()
+            if row is not None and row[0] != text_fields:
+                logger.warning(u'The fields of the search indexes changed, the index of %s is emptied', self.path)
+                for table in TABLES:
+                    connection.execute(u'DROP TABLE IF EXISTS {}'.format(quote(table)))
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                row = None
+
+            connection.execute(u"CREATE VIRTUAL TABLE IF NOT EXISTS document_texts USING fts5({}, "
+                               u"tokenize = 'unicode61 remove_diacritics 1')"
+                               .format(u', '.join(quote(name) for name in self.text_fields)))
+            if row is None:
+                connection.execute('DELETE FROM schema')
+                connection.execute('INSERT INTO schema (text_fields) VALUES (?)', (text_fields,))
+
+        self.setup_complete = True
+
+    def ensure_setup(self):
+        if not self.setup_complete:
+            self.setup()
+
+    def from_python(self, value):
+        """Convert a value to store it: the dates as ISO strings, so that they are sorted as dates."""
+        if hasattr(value, 'strftime'):
+            if hasattr(value, 'hour'):
+                return value.strftime('%Y-%m-%dT%H:%M:%S')
+            return value.isoformat()
+        if isinstance(value, (list, tuple, set)):
+            return [self.from_python(item) for item in value]
+        if value is None or isinstance(value, (bool, float) + six.integer_types):
+            return value
+        return force_text(value)
+
+    def update(self, index, iterable, commit=True):
+        documents = []
+        for obj in iterable:
+            try:
+                documents.append(index.full_prepare(obj))
+            except SkipDocument:
+                logger.debug(u'Indexing for object `%s` skipped', obj)
+
+        try:
+            self.index_documents(documents)
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+            logger.error(u'%s while indexing %s objects', e, len(documents), exc_info=True)
+
+    def index_documents(self, documents):
+        """Add (or replace) documents, in a single transaction.
+
+        :param documents: documents, as prepared by ``SearchIndex.full_prepare()``
+        :type documents: list
+        """
+        self.ensure_setup()
+        texts_sql = u'INSERT INTO document_texts (rowid, {}) VALUES (?{})'.format(
+            u', '.join(quote(name) for name in self.text_fields), u', ?' * len(self.text_fields))
+
+        with self.connection as connection:
+            for document in documents:
+                self.delete_document(connection, document[ID])
+
+                data = {}
+                for name in self.stored_fields:
+                    if name in document:
+                        stored = as_list(document[name]) if name in self.multivalued_fields else document[name]
+                        data[name] = self.from_python(stored)
+                cursor = connection.execute(
+                    'INSERT INTO documents (identifier, django_ct, django_id, data) VALUES (?, ?, ?, ?)',
+                    (document[ID], document[DJANGO_CT], document[DJANGO_ID], json.dumps(data)))
+                rowid = cursor.lastrowid
+
+                connection.execute(texts_sql, [rowid] + [force_text(document.get(name) or u'')
+                                                         for name in self.text_fields])
+                connection.executemany(
+                    'INSERT INTO document_values (document, field, value) VALUES (?, ?, ?)',
+                    [(rowid, name, self.from_python(value))
+                     for name in self.value_fields for value in as_list(document.get(name)) if value is not None])
+
+    def delete_document(self, connection, identifier):
+        row = connection.execute('SELECT id FROM documents WHERE identifier = ?', (identifier,)).fetchone()
+        if row is not None:
+            connection.execute('DELETE FROM document_texts WHERE rowid = ?', row)
+            connection.execute('DELETE FROM document_values WHERE document = ?', row)
+            connection.execute('DELETE FROM documents WHERE id = ?', row)
+
+    def remove(self, obj_or_string, commit=True):
+        self.ensure_setup()
+        try:
+            with self.connection as connection:
+                self.delete_document(connection, get_identifier(obj_or_string))
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+            logger.error(u'Failed to remove document %s: %s', get_identifier(obj_or_string), e, exc_info=True)
+
+    def clear(self, models=None, commit=True):
+        self.ensure_setup()
+        try:
+            with self.connection as connection:
+                if models is None:
+                    for table in TABLES:
+                        connection.execute(u'DROP TABLE IF EXISTS {}'.format(quote(table)))
+                else:
+                    content_types = [get_model_ct(model) for model in models]
+                    documents = u'SELECT id FROM documents WHERE django_ct IN ({})'.format(
+                        u', '.join(u'?' * len(content_types)))
+                    connection.execute(u'DELETE FROM document_texts WHERE rowid IN ({})'.format(documents),
+                                       content_types)
+                    connection.execute(u'DELETE FROM document_values WHERE document IN ({})'.format(documents),
+                                       content_types)
+                    connection.execute(u'DELETE FROM documents WHERE id IN ({})'.format(documents), content_types)
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+            logger.error(u'Failed to clear the index: %s', e, exc_info=True)
+
+        if models is None:
+            self.setup_complete = False
+            self.ensure_setup()
+
+    @log_query
+    def search(self, query_string, sort_by=None, start_offset=0, end_offset=None, fields='', highlight=False,
+               facets=None, date_facets=None, query_facets=None, narrow_queries=None, spelling_query=None,
+               within=None, dwithin=None, distance_point=None, models=None, limit_to_registered_models=None,
+               result_class=None, **kwargs):
+        self.ensure_setup()
+
+        if not isinstance(query_string, CompiledQuery):
+            # a raw query, in the FTS5 syntax
+            match = u'{} : ({})'.format(quote(self.content_field_name), force_text(query_string))
+            query_string = CompiledQuery(
+                u'd.id IN (SELECT rowid FROM document_texts WHERE document_texts MATCH ?)', [match], [match])
+
+        for name, value in [('facets', facets), ('date facets', date_facets), ('query facets', query_facets),
+                            ('narrow queries', narrow_queries), ('spatial queries', within or dwithin)]:
+            if value:
+                warnings.warn(u'The SQLite backend does not handle {}.'.format(name), Warning, stacklevel=2)
+
+        where = [query_string.where]
+        params = list(query_string.params)
+
+        if limit_to_registered_models is None:
+            limit_to_registered_models = getattr(settings, 'HAYSTACK_LIMIT_TO_REGISTERED_MODELS', True)
+
+        if models:
+            model_choices = sorted(get_model_ct(model) for model in models)
+        elif limit_to_registered_models:
+            model_choices = self.build_models_list()
+        else:
+            model_choices = []
+
+        if model_choices:
+            where.append(u'd.django_ct IN ({})'.format(u', '.join(u'?' * len(model_choices))))
+            params.extend(model_choices)
+
+        where = u' AND '.join(u'({})'.format(condition) for condition in where)
+
+        try:
+            hits = self.connection.execute(u'SELECT COUNT(*) FROM documents AS d WHERE ' + where, params).fetchone()[0]
+            if not hits or (end_offset is not None and end_offset <= start_offset):
+                return {'results': [], 'hits': hits}
+
+            join, score, join_params = u'', u'NULL', []
+            if query_string.match:
+                join = u'LEFT JOIN (SELECT rowid, rank FROM document_texts WHERE document_texts MATCH ?) AS ranked ' \
+                       u'ON ranked.rowid = d.id'
+                score = u'ranked.rank'
+                join_params = [query_string.match]
+
+            order_by, order_params = self.build_order_by(sort_by, score)
+            rows = self.connection.execute(
+                u'SELECT d.django_ct, d.django_id, d.data, {} FROM documents AS d {} WHERE {} ORDER BY {} '
+                u'LIMIT ? OFFSET ?'.format(score, join, where, order_by),
+                join_params + params + order_params + [
+                    -1 if end_offset is None else end_offset - start_offset, start_offset]).fetchall()
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+            logger.error(u'Failed to query the index: %s', e, exc_info=True)
+            return {'results': [], 'hits': 0}
+
+        return self.process_results(rows, hits, highlight, query_string.words, result_class)
+
+    def build_order_by(self, sort_by, score):
+        """
+        :return: the ``ORDER BY`` clause (by stored fields, then by relevance) and its parameters
+        :rtype: tuple
+        """
+        order_by = []
+        params = []
+        for field in sort_by or []:
+            direction = u'DESC' if field.startswith('-') else u'ASC'
+            name = field.lstrip('-')
+            if name == 'score':
+                # the lower the rank, the more relevant
+                order_by.append(u'{} {}'.format(score, u'ASC' if direction == u'DESC' else u'DESC'))
+            elif name in self.stored_fields:
+                order_by.append(u'json_extract(d.data, ?) {}'.format(direction))
+                params.append(u'$.{}'.format(quote(name)))
+            else:
+                raise SearchBackendError(u'The SQLite backend can only sort by stored fields, not by "{}".'
+                                         .format(name))
+
+        if score != u'NULL':
+            order_by.append(u'{} IS NULL, {}'.format(score, score))
+        order_by.append(u'd.id')
+        return u', '.join(order_by), params
+
+    def process_results(self, rows, hits, highlight, words, result_class=None):
+        from haystack import connections
+        unified_index = connections[self.connection_alias].get_unified_index()
+        indexed_models = unified_index.get_indexed_models()
+
+        if result_class is None:
+            result_class = SearchResult
+
+        results = []
+        for django_ct, django_id, data, rank in rows:
+            app_label, model_name = django_ct.split('.')
+            model = haystack_get_model(app_label, model_name)
+            if model is None or model not in indexed_models:
+                hits -= 1
+                continue
+
+            index = unified_index.get_index(model)
+            additional_fields = {}
+            for key, value in json.loads(data).items():
+                key = str(key)
+                if key in index.fields and value is not None:
+                    value = index.fields[key].convert(value)
+                additional_fields[key] = value
+
+            if highlight:
+                highlighter = SearchHighlighter(u' '.join(words))
+                additional_fields['highlighted'] = {
+                    self.content_field_name: [highlighter.highlight(additional_fields.get(self.content_field_name)
+                                                                    or u'')],
+                }
+
+            score = -rank if rank is not None else 0
+            results.append(result_class(app_label, model_name, django_id, score, **additional_fields))
+
+        return {
+            'results': results,
+            'hits': hits,
+            'facets': {},
+            'spelling_suggestion': None,
+        }
+
+
+class SQLiteSearchQuery(BaseSearchQuery):
+
+    def __unicode__(self):
+        return force_text(self.build_query())
+
+    def __str__(self):
+        return force_text(self).encode('utf-8')
+
+    def build_query(self):
+        """Turn the filters into a SQL condition, instead of a query string.
+
+        :rtype: CompiledQuery
+        """
+        self.backend.ensure_setup()
+        query = CompiledQuery()
+        where, params = self.build_node(self.query_filter, query)
+        if where:
+            query.where = where
+            query.params = params
+        return query
+
+    def build_node(self, node, query, negated=False):
+        """
+        :param node: a node of the filters (``SQ``, or even Django's ``Q``)
+        :param query: where the searched texts are collected
+        :type query: CompiledQuery
+        :param negated: whether the node is in a negated one (its texts are then not used to rank or highlight)
+        :return: the SQL condition and its parameters
+        :rtype: tuple
+        """
+        negated = negated != node.negated
+        conditions = []
+        params = []
+
+        for child in node.children:
+            if isinstance(child, tree.Node):
+                condition, child_params = self.build_node(child, query, negated)
+            else:
+                expression, value = child
+                field, filter_type = self.query_filter.split_expression(expression)
+                condition, child_params = self.build_condition(field, filter_type, value, query, negated)
+            if condition:
+                conditions.append(condition)
+                params.extend(child_params)
+
+        if not conditions:
+            return u'', []
+
+        where = u' {} '.format(node.connector).join(conditions)
+        if node.negated:
+            return u'NOT ({})'.format(where), params
+        if len(conditions) > 1:
+            return u'({})'.format(where), params
+        return where, params
+
+    def build_query_fragment(self, field, filter_type, value):
+        condition, params = self.build_condition(field, filter_type, value, CompiledQuery())
+        return u'{} {}'.format(condition, params)
+
+    def build_condition(self, field, filter_type, value, query, negated=False):
+        """
+        :return: the SQL condition of a filter, and its parameters
+        :rtype: tuple
+        """
+        from haystack import connections
+        if field == 'content':
+            field = self.backend.content_field_name
+        else:
+            field = connections[self._using].get_unified_index().get_index_fieldname(field)
+
+        if field in DOCUMENT_COLUMNS:
+            values = [self.backend.from_python(item) for item in self.get_values(value, filter_type)]
+            return u'd.{} IN ({})'.format(DOCUMENT_COLUMNS[field], u', '.join(u'?' * len(values))), values
+
+        if field in self.backend.text_fields:
+            return self.build_match(field, filter_type, value, query, negated)
+
+        values = [self.backend.from_python(item) for item in self.get_values(value, filter_type)]
+        if filter_type == 'in':
+            if not values:
+                return u'0', []
+            operator = u'IN ({})'.format(u', '.join(u'?' * len(values)))
+        elif filter_type == 'range':
+            operator = u'BETWEEN ? AND ?'
+        elif filter_type == 'startswith':
+            operator = u"LIKE ? ESCAPE '\\'"
+            values = [re.sub(r'([\\%_])', r'\\\1', force_text(values[0])) + u'%']
+        else:
+            operator = VALUE_OPERATORS[filter_type]
+
+        return u'd.id IN (SELECT document FROM document_values WHERE field = ? AND value {})'.format(operator), \
+            [field] + values
+
+    def get_values(self, value, filter_type):
+        if hasattr(value, 'input_type_name'):
+            value = value.query_string
+        if hasattr(value, 'values_list'):
+            value = list(value)
+        if filter_type in ['in', 'range']:
+            return list(value)
+        return [value]
+
+    def build_match(self, field, filter_type, value, query, negated):
+        """Search a text field with FTS5.
+
+        :return: the SQL condition and its parameters
+        :rtype: tuple
+        """
+        prefix = filter_type == 'startswith'
+        positives = []
+        negatives = []
+
+        if isinstance(value, Raw):
+            positives.append(force_text(value.query_string))
+        elif isinstance(value, AutoQuery):
+            query_string = force_text(value.query_string)
+            exacts = value.exact_match_re.findall(query_string)
+            for rough_token in value.exact_match_re.split(query_string):
+                if rough_token in exacts:
+                    positives.append(self.build_phrase(rough_token, prefix, query, negated))
+                    continue
+                for token in rough_token.split():
+                    if token.startswith('-') and len(token) > 1:
+                        negatives.append(self.build_phrase(token[1:], prefix, query, True))
+                    else:
+                        positives.append(self.build_phrase(token, prefix, query, negated))
+        elif isinstance(value, Not):
+            negatives.extend(self.build_phrase(token, prefix, query, True)
+                             for token in force_text(value.query_string).split())
+        elif isinstance(value, Exact) or filter_type == 'exact':
+            positives.append(self.build_phrase(self.get_values(value, filter_type)[0], prefix, query, negated))
+        elif filter_type == 'in':
+            phrases = [self.build_phrase(item, prefix, query, negated) for item in self.get_values(value, 'in')]
+            phrases = [phrase for phrase in phrases if phrase]
+            if phrases:
+                positives.append(u'({})'.format(u' OR '.join(phrases)))
+        elif filter_type in ['contains', 'startswith', 'fuzzy', 'content']:
+            positives.extend(self.build_phrase(token, prefix, query, negated)
+                             for token in force_text(self.get_values(value, filter_type)[0]).split())
+        else:
+            raise SearchBackendError(u'The SQLite backend can not use "{}" on the text field "{}".'
+                                     .format(filter_type, field))
+
+        positives = [phrase for phrase in positives if phrase]
+        negatives = [phrase for phrase in negatives if phrase]
+        column = quote(field)
+        condition = u'd.id {} (SELECT rowid FROM document_texts WHERE document_texts MATCH ?)'
+
+        if positives:
+            match = u'{} : ({})'.format(column, u' AND '.join(positives))
+            if not negated:
+                query.matches.append(match)
+            if negatives:
+                match = u'{} : (({}) NOT ({}))'.format(column, u' AND '.join(positives), u' OR '.join(negatives))
+            return condition.format(u'IN'), [match]
+        if negatives:
+            return condition.format(u'NOT IN'), [u'{} : ({})'.format(column, u' OR '.join(negatives))]
+        return u'0', []
+
+    def build_phrase(self, text, prefix, query, negated):
+        """
+        :return: a FTS5 phrase, or ``None`` if there is no word in the text
+        :rtype: unicode
+        """
+        text = force_text(text).strip()
+        if not WORD_RE.search(text):
+            return None
+        if not negated:
+            query.words.append(text)
+        return u'"{}"{}'.format(text.replace(u'"', u'""'), u' *' if prefix else u'')
+
+
+class SQLiteEngine(BaseEngine):
+    backend = SQLiteSearchBackend
+    query = SQLiteSearchQuery
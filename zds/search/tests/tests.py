@@ -1,19 +1,28 @@
 # coding: utf-8
 import shutil
+import tempfile
 from django.test import override_settings, TestCase
 from django.contrib.auth.models import Group
 import os
 from zds import settings
 from zds.gallery.factories import UserGalleryFactory
 from zds.member.factories import StaffProfileFactory, UserFactory
-from zds.forum.factories import ForumFactory, CategoryFactory
+from zds.forum.factories import ForumFactory, CategoryFactory, TopicFactory, PostFactory
+from zds.forum.models import Post
+from zds.forum.search_indexes import PostIndex
 from zds.member.factories import ProfileFactory
-from zds.search.models import SearchIndexContent, SearchIndexContainer, SearchIndexExtract
+from zds.search.models import SearchIndexContent, SearchIndexContainer, SearchIndexExtract, SearchIndexTag, \
+    SearchIndexAuthors
 from zds.search.utils import filter_keyword, filter_text, reindex_content
 from zds.settings import BASE_DIR
 from zds.tutorialv2.factories import LicenceFactory, SubCategoryFactory, PublishableContentFactory, ContainerFactory, \
     ExtractFactory
 from zds.tutorialv2.publication_utils import publish_content
+from mock import patch
+from haystack import connections
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet, SQ
+from django.core.management import call_command
 
 overrided_zds_app = settings.ZDS_APP
 overrided_zds_app['content']['repo_private_path'] = os.path.join(BASE_DIR, 'contents-private-test')
@@ -139,6 +148,32 @@ class TryToIndexTutorialTests(TestCase):
                 self.assertEqual(content.tags.count(), 1)
                 self.assertEqual(content.authors.count(), 1)
 
+    def test_reindex_only_changes(self):
+        """The index of a content is updated in place: what did not change is neither rendered nor saved again, and
+        the tags and authors are shared by the contents."""
+
+        reindex_content(self.published_tuto)
+        reindex_content(self.published_article)
+
+        # same subcategory and same author for both contents
+        self.assertEqual(SearchIndexTag.objects.count(), 1)
+        self.assertEqual(SearchIndexAuthors.objects.count(), 1)
+
+        extracts = sorted(SearchIndexExtract.objects.values_list('pk', 'content_hash'))
+        containers = sorted(SearchIndexContainer.objects.values_list('pk', 'content_hash'))
+        self.assertTrue(all(content_hash for __, content_hash in extracts + containers))
+
+        with patch('zds.search.utils.emarkdown', return_value=u'<p>texte</p>') as emarkdown:
+            reindex_content(self.published_tuto)
+            # only the introduction and conclusion of the tutorial itself
+            self.assertEqual(emarkdown.call_count, 2)
+
+        self.assertEqual(SearchIndexContent.objects.count(), 2)
+        self.assertEqual(sorted(SearchIndexExtract.objects.values_list('pk', 'content_hash')), extracts)
+        self.assertEqual(sorted(SearchIndexContainer.objects.values_list('pk', 'content_hash')), containers)
+        self.assertEqual(SearchIndexTag.objects.count(), 1)
+        self.assertEqual(SearchIndexAuthors.objects.count(), 1)
+
     def test_filter_keyword(self):
         html = "<h1>Keyword h1</h1><h2>Keyword h2</h2><strong>Keyword strong</strong><em>Keyword italic</em>"
 
@@ -167,3 +202,70 @@ class TryToIndexTutorialTests(TestCase):
             shutil.rmtree(settings.ZDS_APP['content']['repo_public_path'])
         if os.path.isdir(settings.MEDIA_ROOT):
             shutil.rmtree(settings.MEDIA_ROOT)
+
+
+class SQLiteBackendTests(TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        connections.connections_info['sqlite-test'] = {
+            'ENGINE': 'zds.search.sqlite_backend.SQLiteEngine',
+            'PATH': os.path.join(self.path, 'search.sqlite3'),
+            'SILENTLY_FAIL': False,
+        }
+        self.backend = connections['sqlite-test'].get_backend()
+
+        self.user = ProfileFactory().user
+        self.staff_group = Group.objects.create(name='staff-search')
+        public_forum = ForumFactory(category=CategoryFactory(position=1), position_in_category=1)
+        private_forum = ForumFactory(category=CategoryFactory(position=2), position_in_category=1)
+        private_forum.group.add(self.staff_group)
+
+        public_topic = TopicFactory(forum=public_forum, author=self.user)
+        private_topic = TopicFactory(forum=private_forum, author=self.user)
+        PostFactory(topic=public_topic, author=self.user, position=1, text=u'Premier message sur les tomates')
+        self.public_post = PostFactory(topic=public_topic, author=self.user, position=2,
+                                       text=u'Les tomates et les courgettes du jardin')
+        self.private_post = PostFactory(topic=private_topic, author=self.user, position=2,
+                                        text=u'Les tomates des modérateurs')
+
+        self.backend.update(PostIndex(), PostIndex().index_queryset())
+
+    def search(self, query):
+        return SearchQuerySet(using='sqlite-test').models(Post).filter(content=AutoQuery(query))
+
+    def test_search(self):
+        # only the indexed posts (not the first ones), the words without their accents
+        self.assertEqual(sorted(int(result.pk) for result in self.search(u'tomates')),
+                         sorted([self.public_post.pk, self.private_post.pk]))
+        self.assertEqual([int(result.pk) for result in self.search(u'moderateurs')], [self.private_post.pk])
+        self.assertEqual([int(result.pk) for result in self.search(u'tomates -jardin')], [self.private_post.pk])
+        self.assertEqual([int(result.pk) for result in self.search(u'"courgettes du jardin"')], [self.public_post.pk])
+        self.assertEqual(self.search(u'"jardin des courgettes"').count(), 0)
+
+        # permissions, as in `CustomSearchView`
+        results = self.search(u'tomates').filter(permissions='public')
+        self.assertEqual([int(result.pk) for result in results], [self.public_post.pk])
+        results = self.search(u'tomates').filter(SQ(permissions='public') | SQ(permissions__in=['staff-search']))
+        self.assertEqual(results.count(), 2)
+
+        # highlighting
+        highlighted = self.search(u'courgettes').highlight()[0].highlighted
+        self.assertIn(u'<span class="highlighted">courgettes</span>', highlighted['text'][0])
+
+        # update and removal
+        self.public_post.text = u'Les poivrons du jardin'
+        self.public_post.save()
+        self.backend.update(PostIndex(), [self.public_post])
+        self.assertEqual([int(result.pk) for result in self.search(u'tomates')], [self.private_post.pk])
+        self.backend.remove(self.private_post)
+        self.assertEqual(self.search(u'tomates').count(), 0)
+        self.backend.clear()
+        self.assertEqual(self.search(u'poivrons').count(), 0)
+
+    def test_benchmark_search(self):
+        call_command('benchmark_search', posts=50, queries=2, batch_size=20)
+
+    def tearDown(self):
+        del connections.connections_info['sqlite-test']
+        connections._connections.pop('sqlite-test', None)
+        shutil.rmtree(self.path)
@@ -1,5 +1,6 @@
 # coding: utf-8
 
+import hashlib
 import os
 import zipfile
 import json as json_reader
@@ -7,8 +8,8 @@ from bs4 import BeautifulSoup
 from datetime import datetime
 from django.db import transaction
 from zds.tutorialv2.utils import get_content_from_json, BadManifestError
-from zds.utils.templatetags.emarkdown import emarkdown
-from zds.tutorialv2.models.models_versioned import Container, Extract
+from zds.utils.templatetags.emarkdown import emarkdown, RENDERING_SIGNATURE
+from zds.tutorialv2.models.models_versioned import Extract
 
 from zds.search.models import SearchIndexExtract, SearchIndexContainer, SearchIndexContent, \
     SearchIndexTag, SearchIndexAuthors
@@ -29,12 +30,24 @@ def get_file_content_in_zip(archive, path):
     return content
 
 
+def parse_html(html):
+    """
+    :param html: an HTML string, or an already parsed one
+    :return: the parsed HTML
+    :rtype: BeautifulSoup
+    """
+    if isinstance(html, BeautifulSoup):
+        return html
+    return BeautifulSoup(html)
+
+
 def filter_keyword(html):
     """Try to find important words in an HTML string. Search in all ``<i>``, ``<strong>`` and title (``<h*>``).
 
+    :param html: an HTML string, or an already parsed one (see ``parse_html()``)
     :return: list of important words
     """
-    bs = BeautifulSoup(html)
+    bs = parse_html(html)
 
     keywords = u''
     for tag in bs.findAll(['h1', 'h2', 'h3', 'em', 'strong']):
@@ -46,108 +59,166 @@ def filter_keyword(html):
 def filter_text(html):
     """Filter words from the HTML version of the text
 
-    :param html: The text from which words must be extract
+    :param html: The text from which words must be extract, either as a string or already parsed (see ``parse_html()``)
     :return: extracted words
     """
-    bs = BeautifulSoup(html)
+    bs = parse_html(html)
     return u' '.join(bs.findAll(text=True))
 
 
-def index_extract(extract, search_index_content, archive):
-    """Index an extract.
+def filter_markdown(text):
+    """Render a markdown text, then extract its words and its keywords from a single parsing of the HTML.
 
-    :param extract: extact to index
-    :type extract: Extract
-    :param search_index_content: parent index
-    :type search_index_content: SearchIndexContent
+    :param text: the markdown text
+    :type text: unicode
+    :return: ``(words, keywords)``, both empty if there is no text
+    :rtype: tuple
+    """
+    html = emarkdown(text) if text else u''
+    if not html:
+        return u'', u''
+
+    bs = parse_html(html)
+    return filter_text(bs), filter_keyword(bs)
+
+
+def read_text(archive, path):
+    """
     :param archive: zip archive containing the content
     :type archive: zipfile.ZipFile
+    :param path: path of the text in the archive, if any
+    :type path: str
+    :return: the text, or an empty string if there is none (or if it is not in the archive)
+    :rtype: unicode
     """
-    search_index_extract = SearchIndexExtract()
-    search_index_extract.search_index_content = search_index_content
-    search_index_extract.title = extract.title
-    search_index_extract.url_to_redirect = extract.get_absolute_url_online()
+    if not path:
+        return u''
+    try:
+        return get_file_content_in_zip(archive, path)
+    except KeyError:
+        return u''
+
 
-    html = u''
+def render_texts(texts):
+    """Get the fields of a ``SearchIndex*`` object from its markdown texts.
 
-    if extract.text:
-        try:
-            html = emarkdown(get_file_content_in_zip(archive, extract.text))
-        except KeyError:
-            pass
+    :param texts: ``(field, markdown text)``, in the order of the content
+    :type texts: list
+    :return: the words of each text (or ``None`` if empty), and the keywords of all of them (in ``keywords``)
+    :rtype: dict
+    """
+    fields = {}
+    keywords = u''
+    for field, text in texts:
+        words, text_keywords = filter_markdown(text)
+        fields[field] = words or None
+        keywords += text_keywords
+    fields['keywords'] = keywords
+    return fields
 
-    if html:
-        search_index_extract.extract_content = filter_text(html)
-        search_index_extract.keywords = filter_keyword(html)
 
-    search_index_extract.save()
+def get_hash(fields, texts):
+    """
+    :return: the hash of everything an object of the index is built from (including the way markdown is rendered), so
+        that it is only rendered again when one of them changed
+    :rtype: str
+    """
+    data = json_reader.dumps([RENDERING_SIGNATURE, fields, texts], sort_keys=True)
+    return hashlib.sha1(data).hexdigest()
 
 
-def index_container(container, search_index_content, archive):
-    """Index a container.
+def iter_children(container, archive):
+    """Walk the children of a container, depth-first.
 
-    :param container: container to index
+    :param container: container to index (or the content itself)
     :type container: Container
-    :param search_index_content: parent index
-    :type search_index_content: SearchIndexContent
     :param archive: zip archive containing the content
     :type archive: zipfile.ZipFile
+    :return: for each child, ``(model, fields, texts)``: the ``SearchIndex*`` model to use, the fields which does not
+        need to be rendered, and the markdown texts (see ``render_texts()``)
     """
-
-    search_index_container = SearchIndexContainer()
-    search_index_container.search_index_content = search_index_content
-    search_index_container.title = container.title
-    search_index_container.url_to_redirect = container.get_absolute_url_online()
-
-    # index introduction and conclusion:
-    if container.introduction:
-        try:
-            introduction_html = emarkdown(get_file_content_in_zip(archive, container.introduction))
-            all_html = introduction_html
-            search_index_container.introduction = filter_text(introduction_html)
-        except KeyError:
-            pass
-
-    if container.conclusion:
-        try:
-            conclusion_html = emarkdown(get_file_content_in_zip(archive, container.conclusion))
-            all_html = u'{}{}'.format(all_html, conclusion_html)
-            search_index_container.conclusion = filter_text(conclusion_html)
-        except KeyError:
-            pass
-
-    if all_html != u'':
-        search_index_container.keywords = filter_keyword(all_html)
-
-    # index children:
-    search_index_container.level = 'part'
-
     for child in container.children:
+        fields = {'title': child.title, 'url_to_redirect': child.get_absolute_url_online()}
+
         if isinstance(child, Extract):
-            search_index_container.level = 'chapter'  # only a chapter can contain extracts
-            index_extract(child, search_index_content, archive)
+            yield SearchIndexExtract, fields, [('extract_content', read_text(archive, child.text))]
         else:
-            index_container(child, search_index_content, archive)
+            fields['level'] = 'chapter' if child.has_extracts() else 'part'
+            texts = [('introduction', read_text(archive, child.introduction)),
+                     ('conclusion', read_text(archive, child.conclusion))]
+            yield SearchIndexContainer, fields, texts
+
+            for grandchild in iter_children(child, archive):
+                yield grandchild
 
-    search_index_container.save()
 
+def index_children(search_index_content, children):
+    """Update the containers and extracts of an index.
 
-def index_content(versioned, search_index_content, archive):
-    """Index the child of a content.
+    The objects are found again by their URL: only the ones which changed (see ``get_hash()``) are rendered and
+    updated, the new ones are created in bulk and the ones which no longer exist are deleted.
 
-    :param versioned: versioned content to index
-    :type versioned: VersionedContent
     :param search_index_content: parent index
     :type search_index_content: SearchIndexContent
-    :param archive: zip archive containing the content
-    :type archive: zipfile.ZipFile
+    :param children: the children of the content (see ``iter_children()``)
     """
-
-    for child in versioned.children:
-        if isinstance(child, Container):
-            index_container(child, search_index_content, archive)
+    models = [SearchIndexContainer, SearchIndexExtract]
+    existing = {}
+    removed = {model: [] for model in models}
+
+    for model in models:
+        for row in model.objects.filter(search_index_content=search_index_content).order_by('pk'):
+            previous = existing.get((model, row.url_to_redirect))
+            if previous is not None:  # indexed twice: only one is kept
+                removed[model].append(previous.pk)
+            existing[(model, row.url_to_redirect)] = row
+
+    created = {model: [] for model in models}
+    for model, fields, texts in children:
+        content_hash = get_hash(fields, texts)
+        row = existing.pop((model, fields['url_to_redirect']), None)
+        if row is not None and row.content_hash == content_hash:
+            continue
+
+        fields = dict(fields, content_hash=content_hash, **render_texts(texts))
+        if row is None:
+            created[model].append(model(search_index_content=search_index_content, **fields))
         else:
-            index_extract(child, search_index_content, archive)
+            model.objects.filter(pk=row.pk).update(**fields)
+
+    for (model, url), row in existing.items():
+        removed[model].append(row.pk)
+
+    for model in models:
+        if removed[model]:
+            model.objects.filter(pk__in=removed[model]).delete()
+        if created[model]:
+            model.objects.bulk_create(created[model])
+
+
+def get_or_create_rows(model, field, values):
+    """Get the rows of a model having some values for a field, the missing ones being created at once.
+
+    :param model: ``SearchIndexTag`` or ``SearchIndexAuthors``
+    :param field: the field
+    :type field: str
+    :param values: the values
+    :type values: list
+    :return: a row for each value
+    :rtype: list
+    """
+    rows = {}
+    # by decreasing pk, so that the oldest row is kept if a value was stored several times
+    for row in model.objects.filter(**{field + '__in': values}).order_by('-pk'):
+        rows[getattr(row, field)] = row
+
+    missing = [value for value in set(values) if value not in rows]
+    if missing:
+        model.objects.bulk_create([model(**{field: value}) for value in missing])
+        for row in model.objects.filter(**{field + '__in': missing}).order_by('-pk'):
+            rows[getattr(row, field)] = row
+
+    return [rows[value] for value in values if value in rows]
 
 
 @transaction.atomic
@@ -172,9 +243,6 @@ def reindex_content(published_content):
     :type published_content: PublishedContent
     """
 
-    # We just delete all index that correspond to the content
-    SearchIndexContent.objects.filter(publishable_content__pk=published_content.content_pk).delete()
-
     # Load the manifest:
     if not published_content.have_zip():
         raise Exception('Unable to index content due to the absence of ZIP file')
@@ -198,8 +266,15 @@ def reindex_content(published_content):
 
     published_content.content.insert_data_in_versioned(versioned)
 
-    # Index the content:
-    search_index_content = SearchIndexContent()
+    # Index the content, reusing its former index if any:
+    search_index_contents = list(
+        SearchIndexContent.objects.filter(publishable_content__pk=published_content.content_pk).order_by('pk'))
+    if search_index_contents:
+        search_index_content = search_index_contents[0]
+        SearchIndexContent.objects.filter(pk__in=[index.pk for index in search_index_contents[1:]]).delete()
+    else:
+        search_index_content = SearchIndexContent()
+
     search_index_content.publishable_content = published_content.content
     search_index_content.pubdate = published_content.publication_date or datetime.now()
     search_index_content.update_date = published_content.content.update_date or datetime.now()
@@ -216,54 +291,25 @@ def reindex_content(published_content):
 
     search_index_content.title = versioned.title
     search_index_content.description = versioned.description
-
-    search_index_content.save()
-
-    # Subcategory
-    for subcategory in published_content.content.subcategory.all():
-        search_index_tag = SearchIndexTag()
-        search_index_tag.title = subcategory.title
-        search_index_tag.save()
-
-        search_index_content.tags.add(search_index_tag)
-
-    # Authors
-    for author in published_content.content.authors.all():
-        search_index_authors = SearchIndexAuthors()
-        search_index_authors.username = author.username
-        search_index_authors.save()
-
-        search_index_content.authors.add(search_index_authors)
-
     search_index_content.url_to_redirect = published_content.get_absolute_url_online()
+    search_index_content.type = published_content.content_type.lower()
 
     # Save introduction and conclusion:
-    all_html = u''
-
-    if versioned.introduction:
-        try:
-            introduction_html = emarkdown(get_file_content_in_zip(archive, versioned.introduction))
-            all_html = introduction_html
-            search_index_content.introduction = filter_text(introduction_html)
-        except KeyError:
-            pass
-
-    if versioned.conclusion:
-        try:
-            conclusion_html = emarkdown(get_file_content_in_zip(archive, versioned.conclusion))
-            all_html = u'{}{}'.format(all_html, conclusion_html)
-            search_index_content.conclusion = filter_text(conclusion_html)
-        except KeyError:
-            pass
-
-    if all_html != u'':
-        search_index_content.keywords = filter_keyword(all_html)
+    texts = [('introduction', read_text(archive, versioned.introduction)),
+             ('conclusion', read_text(archive, versioned.conclusion))]
+    for field, value in render_texts(texts).items():
+        setattr(search_index_content, field, value)
 
-    search_index_content.type = published_content.content_type.lower()
     search_index_content.save()
 
+    # Subcategory and authors, shared by all the contents
+    search_index_content.tags = get_or_create_rows(
+        SearchIndexTag, 'title', [subcategory.title for subcategory in published_content.content.subcategory.all()])
+    search_index_content.authors = get_or_create_rows(
+        SearchIndexAuthors, 'username', [author.username for author in published_content.content.authors.all()])
+
     # Also index children
-    index_content(versioned, search_index_content, archive)
+    index_children(search_index_content, iter_children(versioned, archive))
 
     # no need to index the next time
     published_content.content.must_reindex = False
@@ -242,8 +242,10 @@ REST_FRAMEWORK = {
 
 REST_FRAMEWORK_EXTENSIONS = {
     # If the cache isn't specify in the API, the time of the cache
-    # is specified here in seconds.
-    'DEFAULT_CACHE_RESPONSE_TIMEOUT': 60 * 15
+    # is specified here in seconds. The cached responses are invalidated
+    # as soon as their resources change (see `zds.api.bits`), so they can
+    # be kept for a long time.
+    'DEFAULT_CACHE_RESPONSE_TIMEOUT': 60 * 60 * 24 * 7
 }
 
 SWAGGER_SETTINGS = {
@@ -356,6 +358,11 @@ HAYSTACK_CONNECTIONS = {
         # ...or for multicore...
         # 'URL': 'http://127.0.0.1:8983/solr/mysite',
     },
+    # ...or, without Solr (see `zds.search.sqlite_backend`):
+    # 'default': {
+    #     'ENGINE': 'zds.search.sqlite_backend.SQLiteEngine',
+    #     'PATH': os.path.join(BASE_DIR, 'search.sqlite3'),
+    # },
 }
 HAYSTACK_CUSTOM_HIGHLIGHTER = 'zds.utils.highlighter.SearchHighlighter'
 
@@ -398,6 +405,8 @@ ZDS_APP = {
         'email_noreply': u"noreply@zestedesavoir.com",
         'repository': u"https://github.com/zestedesavoir/zds-site",
         'bugtracker': u"https://github.com/zestedesavoir/zds-site/issues",
+        # written at deployment by `python manage.py write_version_file`, read instead of the repository if present
+        'version_file': os.path.join(BASE_DIR, 'version.json'),
         'forum_feedback_users': u"/forums/communaute/bug-suggestions/",
         'contribute_link': u"https://github.com/zestedesavoir/zds-site/blob/dev/CONTRIBUTING.md",
         'short_description': u"",
@@ -455,6 +464,13 @@ ZDS_APP = {
         'external_account': u"external",
         'bot_group': u'bot',
         'members_per_page': 100,
+        # rows handled in each transaction of an unregistration (see `zds.member.unregistration`)
+        'unregistration_chunk_size': 1000,
+        'unregistration_max_attempts': 3,
+        # an unregistration still running after this time (in seconds) is considered lost, and started again
+        'unregistration_job_timeout': 60 * 60,
+        # in seconds, time between two checks of the queue by `unregister_members --loop`
+        'unregistration_queue_interval': 5,
     },
     'gallery': {
         'image_max_size': 1024 * 1024,
@@ -476,13 +492,20 @@ ZDS_APP = {
         'repo_private_path': os.path.join(BASE_DIR, 'contents-private'),
         'repo_public_path': os.path.join(BASE_DIR, 'contents-public'),
         'extra_contents_dirname': 'extra_contents',
-        # can also be 'extra_content_generation_policy': "WATCHDOG"
+        # can also be 'extra_content_generation_policy': "QUEUE" (see the `generate_extra_contents` command)
         # or 'extra_content_generation_policy': "NOTHING"
         'extra_content_generation_policy': "SYNC",
-        'extra_content_watchdog_dir': os.path.join(BASE_DIR, "watchdog-build"),
+        'extra_content_max_attempts': 3,
+        # in seconds, doubled at each new attempt
+        'extra_content_retry_delay': 60,
+        # a generation still running after this time (in seconds) is considered lost, and started again
+        'extra_content_job_timeout': 60 * 60,
+        # in seconds, time between two checks of the queue by `generate_extra_contents --loop`
+        'extra_content_queue_interval': 5,
         'max_tree_depth': 3,
         'default_licence_pk': 7,
         'content_per_page': 50,
+        'validations_per_page': 50,
         'notes_per_page': 25,
         'helps_per_page': 20,
         'feed_length': 5,
@@ -490,7 +513,20 @@ ZDS_APP = {
         'default_image': os.path.join(BASE_DIR, "fixtures", "noir_black.png"),
         'import_image_prefix': 'archive',
         'build_pdf_when_published': True,
-        'maximum_slug_size': 150
+        'maximum_slug_size': 150,
+        # the tree of a version is read from git once, then cached for this time (in seconds, 0 to disable the cache)
+        'versioned_cache_timeout': 60 * 60 * 24,
+        # number of processes rendering the chapters of a content during its publication
+        'publication_jobs': 4,
+        # images of the exported contents, already converted (see `zds.tutorialv2.image_cache`)
+        'image_cache_dir': os.path.join(BASE_DIR, 'image-cache'),
+        'image_cache_max_size': 500 * 1024 * 1024,
+        # number of images of a content retrieved at the same time, and timeout of each download (in seconds)
+        'image_fetch_jobs': 8,
+        'image_fetch_timeout': 10,
+        # zip archives of the versions of the contents (see `zds.tutorialv2.archive`)
+        'archive_cache_dir': os.path.join(BASE_DIR, 'archive-cache'),
+        'archive_cache_max_size': 1024 * 1024 * 1024,
     },
     'forum': {
         'posts_per_page': 21,
@@ -502,7 +538,8 @@ ZDS_APP = {
         'max_post_length': 1000000,
         'top_tag_max': 5,
         'home_number': 5,
-        'old_post_limit_days': 90
+        'old_post_limit_days': 90,
+        'access_cache_timeout': 60 * 60 * 24,
     },
     'topic': {
         'home_number': 6,
@@ -512,7 +549,29 @@ ZDS_APP = {
         'home_number': 5,
     },
     'paginator': {
-        'folding_limit': 4
+        'folding_limit': 4,
+        'seek_cache_timeout': 60 * 60,
+    },
+    'notifications': {
+        'cache_timeout': 60 * 15,
+    },
+    'outbox': {
+        # number of e-mails sent over a single SMTP connection
+        'batch_size': 100,
+        # maximum number of e-mails sent per second, 0 for no limit
+        'rate': 10,
+        'max_attempts': 5,
+        # seconds before the first retry, doubled for each new attempt
+        'retry_delay': 60,
+        # seconds between two batches for `send_emails --loop`
+        'interval': 10,
+    },
+    'markdown': {
+        'cache_enabled': True,
+        'cache_alias': 'default',
+        'cache_timeout': 60 * 60 * 24 * 7,
+        'local_cache_size': 1000,
+        'generation_check_delay': 30,
     },
     'visual_changes': []
 }
@@ -2,10 +2,12 @@
 
 from django.contrib import admin
 
-from zds.tutorialv2.models.models_database import PublishableContent, Validation, ContentReaction, PublishedContent
+from zds.tutorialv2.models.models_database import PublishableContent, Validation, ContentReaction, PublishedContent, \
+    PublicationJob
 
 
 admin.site.register(PublishableContent)
 admin.site.register(PublishedContent)
+admin.site.register(PublicationJob)
 admin.site.register(Validation)
 admin.site.register(ContentReaction)
@@ -0,0 +1,153 @@
+# coding: utf-8
+
+"""
+Zip archives of the versions of the contents, built straight from the git objects.
+
+An archive is written file by file into a stream, so that it can be sent while it is built, without being kept in
+memory. Since the archive of a version never changes, it is also kept in `ZDS_APP['content']['archive_cache_dir']`
+for the next downloads; the least recently used archives are removed when this directory exceeds
+`ZDS_APP['content']['archive_cache_max_size']` bytes.
+"""
+
+import os
+import tempfile
+import time
+import zipfile
+
+from django.conf import settings
+
+from zds.utils.misc import remove_least_recently_used
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ZipStream(object):
+    """The file given to `zipfile.ZipFile`, which keeps what is written until it is taken with `pop()`. Only the
+    methods needed to write an archive without seeking are provided."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.position += len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_blobs(git_tree):
+    """Recursively list the files of a tree, the files of a directory before its subdirectories.
+
+    :param git_tree: Git tree (from ``repository.commit(sha).tree``)
+    """
+    for blob in git_tree.blobs:
+        yield blob
+    for subtree in git_tree.trees:
+        for blob in iter_blobs(subtree):
+            yield blob
+
+
+def iter_zip(repository, sha):
+    """Build the zip archive of a version, and yield it piece by piece: only one file is in memory at a time.
+
+    :param repository: the repository of the content
+    :type repository: git.Repo
+    :param sha: the version
+    :type sha: str
+    :return: the chunks of the archive
+    """
+    commit = repository.commit(sha)
+    # the date of the commit, so that the archive of a version is always the same
+    date_time = time.localtime(commit.committed_date)[:6]
+
+    stream = ZipStream()
+    zip_file = zipfile.ZipFile(stream, 'w')
+    for blob in iter_blobs(commit.tree):
+        info = zipfile.ZipInfo(blob.path, date_time=date_time)
+        info.external_attr = 0o600 << 16  # as `ZipFile.writestr()` does
+        zip_file.writestr(info, blob.data_stream.read())
+        yield stream.pop()
+    zip_file.close()
+    yield stream.pop()
+
+
+def iter_file(archive_file):
+    try:
+        while True:
+            chunk = archive_file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        archive_file.close()
+
+
+def get_archive_path(content_pk, sha):
+    return os.path.join(settings.ZDS_APP['content']['archive_cache_dir'], '{}-{}.zip'.format(content_pk, sha))
+
+
+def iter_archive(content_pk, repository, sha):
+    """Get the zip archive of a version, from the cache if possible, piece by piece.
+
+    :param content_pk: pk of the content
+    :type content_pk: int
+    :param repository: the repository of the content
+    :type repository: git.Repo
+    :param sha: the version
+    :type sha: str
+    :return: the chunks of the archive
+    """
+    path = get_archive_path(content_pk, sha)
+    try:
+        # opened right now, so that it can still be read if it is removed from the cache in the meantime
+        archive_file = open(path, 'rb')
+    except IOError:
+        return iter_and_cache(path, iter_zip(repository, sha))
+
+    os.utime(path, None)  # recently used
+    return iter_file(archive_file)
+
+
+def iter_and_cache(path, chunks):
+    """Yield the chunks of an archive while they are written in the cache. The archive is only put in the cache once
+    complete: nothing is kept if the download is interrupted.
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:  # created by another process in the meantime
+            pass
+
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.')
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            for chunk in chunks:
+                temp_file.write(chunk)
+                yield chunk
+        os.rename(temp_path, path)
+        remove_least_recently_used([directory], settings.ZDS_APP['content']['archive_cache_max_size'])
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_archive(path, content_pk, repository, sha):
+    """Write the zip archive of a version in a file.
+
+    :param path: path of the file
+    :type path: str
+    """
+    with open(path, 'wb') as archive_file:
+        for chunk in iter_archive(content_pk, repository, sha):
+            archive_file.write(chunk)
@@ -0,0 +1,237 @@
+# coding: utf-8
+
+"""
+Cache of the images of the contents, used to build the markdown export (see
+`zds.tutorialv2.utils.retrieve_and_update_images_links()`).
+
+Each image is stored once, under the hash of its original content, already converted into PNG when needed. An online
+image is found again from its URL: its server is only asked whether it changed (thanks to the ETag and the date of last
+modification it sent), and a gallery image from its path, size and modification time. The least recently used files
+are removed when the cache exceeds `ZDS_APP['content']['image_cache_max_size']` bytes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import urllib2
+from multiprocessing.pool import ThreadPool
+from urlparse import urlparse
+
+import cairosvg
+from PIL import Image as ImagePIL
+from django.conf import settings
+from django.utils.encoding import smart_str
+
+from zds.tutorialv2.utils import resize_svg
+from zds.utils.misc import remove_least_recently_used
+
+logger = logging.getLogger(__name__)
+
+
+def is_online(url):
+    """
+    :param url: URL of an image
+    :type url: str
+    :return: `True` if the image must be downloaded, `False` if it comes from a gallery
+    :rtype: bool
+    """
+    parsed_url = urlparse(url)
+    return parsed_url.scheme in ['http', 'https', 'ftp'] \
+        or parsed_url.netloc[:3] == 'www' or parsed_url.path[:3] == 'www'
+
+
+def get_conversion(url):
+    """
+    :param url: URL of an image
+    :type url: str
+    :return: `'svg'` (rasterized into PNG), `'png'` (GIF or no extension, converted into PNG by Pillow) or `''` (the
+        image is kept as is)
+    :rtype: str
+    """
+    img_basename = os.path.basename(urlparse(url).path)
+    img_basename_splitted = img_basename.split('.')
+    extension = img_basename_splitted[-1].lower().strip() if len(img_basename_splitted) > 1 else ''
+
+    if extension == 'svg':
+        return 'svg'
+    if extension in ['gif', '']:
+        return 'png'
+    return ''
+
+
+class ImageCache(object):
+
+    def __init__(self, directory=None, max_size=None):
+        """
+        :param directory: directory of the cache, `ZDS_APP['content']['image_cache_dir']` by default
+        :type directory: str
+        :param max_size: maximum size of the cache (in bytes), `ZDS_APP['content']['image_cache_max_size']` by default
+        :type max_size: int
+        """
+        config = settings.ZDS_APP['content']
+        self.directory = directory or config['image_cache_dir']
+        self.max_size = config['image_cache_max_size'] if max_size is None else max_size
+        self.urls_directory = os.path.join(self.directory, 'urls')
+        self.images_directory = os.path.join(self.directory, 'images')
+
+        for path in [self.urls_directory, self.images_directory]:
+            if not os.path.isdir(path):
+                try:
+                    os.makedirs(path)
+                except OSError:  # created by another process in the meantime
+                    pass
+
+    def get_entry_path(self, url, conversion):
+        key = smart_str(u'{}|{}'.format(url, conversion))
+        return os.path.join(self.urls_directory, hashlib.sha1(key).hexdigest() + '.json')
+
+    def read_entry(self, entry_path):
+        """
+        :return: what is known about an URL, or `None` if its image is not in the cache
+        :rtype: dict
+        """
+        try:
+            with open(entry_path) as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, ValueError):
+            return None
+
+        if not os.path.isfile(os.path.join(self.images_directory, entry['image'])):
+            return None
+        return entry
+
+    def write_file(self, path, data):
+        """Write a file at once, so that another process never reads it partially written."""
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.')
+        with os.fdopen(handle, 'wb') as temp_file:
+            temp_file.write(data)
+        os.rename(temp_path, path)
+
+    def hit(self, entry_path, entry):
+        """Mark an entry and its image as recently used.
+
+        :return: `(path, as_png)`, the path of the image in the cache and whether it was converted into PNG
+        :rtype: tuple
+        """
+        image_path = os.path.join(self.images_directory, entry['image'])
+        for path in [entry_path, image_path]:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+        return image_path, entry['as_png']
+
+    def fetch(self, url):
+        """Get an image, converted into PNG if needed, from the cache if possible.
+
+        :param url: URL of the image (either local or online)
+        :type url: str
+        :return: `(path, as_png)`, the path of the image in the cache and whether it was converted into PNG
+        :rtype: tuple
+        :raise IOError: if the image does not exist or can not be read
+        """
+        conversion = get_conversion(url)
+        entry_path = self.get_entry_path(url, conversion)
+        entry = self.read_entry(entry_path)
+
+        if is_online(url):
+            request = urllib2.Request(smart_str(url))
+            if entry is not None:
+                if entry.get('etag'):
+                    request.add_header('If-None-Match', entry['etag'])
+                if entry.get('last_modified'):
+                    request.add_header('If-Modified-Since', entry['last_modified'])
+            try:
+                response = urllib2.urlopen(request, timeout=settings.ZDS_APP['content']['image_fetch_timeout'])
+                data = response.read()
+            except urllib2.HTTPError as e:
+                if e.code == 304 and entry is not None:  # not modified
+                    return self.hit(entry_path, entry)
+                raise IOError(u'{}: HTTP {}'.format(url, e.code))
+            except (urllib2.URLError, ValueError, socket.error) as e:
+                raise IOError(u'{}: {}'.format(url, e))
+            validators = {
+                'etag': response.info().getheader('ETag'),
+                'last_modified': response.info().getheader('Last-Modified'),
+            }
+        else:
+            if url[0] == '/':  # because `os.path.join()` think it's an absolute path if it start with `/`
+                url = url[1:]
+            source_path = os.path.join(settings.BASE_DIR, url)
+            if not os.path.isfile(source_path):
+                raise IOError(source_path)
+            stat = os.stat(source_path)
+            validators = {'mtime': stat.st_mtime, 'size': stat.st_size}
+            if entry is not None and all(entry.get(key) == value for key, value in validators.items()):
+                return self.hit(entry_path, entry)
+            with open(source_path, 'rb') as source_file:
+                data = source_file.read()
+
+        # the same image may be found at another URL, or the URL may have been modified without changing the image
+        image_name = hashlib.sha1(data).hexdigest() + ('.' + conversion if conversion else '')
+        if not os.path.isfile(os.path.join(self.images_directory, image_name)):
+            self.store(data, conversion, os.path.join(self.images_directory, image_name))
+
+        entry = dict(validators, image=image_name, as_png=bool(conversion))
+        self.write_file(entry_path, json.dumps(entry))
+        return self.hit(entry_path, entry)
+
+    def store(self, data, conversion, image_path):
+        """Convert an image, if needed, and put it in the cache.
+
+        :raise IOError: if the image can not be read
+        """
+        handle, source_path = tempfile.mkstemp(dir=self.images_directory, prefix='.')
+        with os.fdopen(handle, 'wb') as source_file:
+            source_file.write(data)
+        converted_path = source_path + '.png'
+
+        try:
+            if conversion == 'svg':
+                resize_svg(source_path)
+                cairosvg.svg2png(url=source_path, write_to=converted_path)
+            elif conversion == 'png':
+                ImagePIL.open(source_path).save(converted_path, 'PNG')
+            else:
+                ImagePIL.open(source_path)  # only check that this is an image
+                converted_path = source_path
+            os.rename(converted_path, image_path)
+        except KeyError as e:  # Pillow cannot read it
+            raise IOError(e)
+        finally:
+            for path in [source_path, converted_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def fetch_all(self, urls):
+        """Get several images, concurrently (by `ZDS_APP['content']['image_fetch_jobs']` threads).
+
+        :param urls: URLs of the images
+        :type urls: list
+        :return: for each URL, `(path, as_png)` (see `fetch()`) or `None` if the image can not be retrieved
+        :rtype: dict
+        """
+        jobs = min(settings.ZDS_APP['content']['image_fetch_jobs'], len(urls))
+        if jobs <= 1:
+            return {url: self.fetch_or_none(url) for url in urls}
+
+        pool = ThreadPool(jobs)
+        try:
+            return dict(zip(urls, pool.map(self.fetch_or_none, urls)))
+        finally:
+            pool.close()
+            pool.join()
+
+    def fetch_or_none(self, url):
+        try:
+            return self.fetch(url)
+        except Exception as e:  # including errors of CairoSVG or lxml for a broken SVG
+            logger.info(u'Unable to retrieve the image %s: %s', url, e)
+            return None
+
+    def evict(self):
+        """Remove the least recently used files until the cache fits in its maximum size."""
+        remove_least_recently_used([self.urls_directory, self.images_directory], self.max_size)
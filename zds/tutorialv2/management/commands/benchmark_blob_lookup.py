@@ -0,0 +1,94 @@
+# coding: utf-8
+
+import os
+import shutil
+import tempfile
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from git import Repo, Actor
+
+from zds.tutorialv2.utils import get_blob_index, read_blob
+
+EXTRACTS_PER_CHAPTER = 10
+CHAPTERS_PER_PART = 5
+
+
+def walk_blob(tree, path):
+    """The former lookup of a file: every blob of every subtree is compared to the path."""
+    for blob in tree.blobs:
+        if os.path.abspath(blob.path) == os.path.abspath(path):
+            return blob.data_stream.read()
+    for subtree in tree.trees:
+        result = walk_blob(subtree, path)
+        if result is not None:
+            return result
+    return None
+
+
+def create_tutorial(path, extracts):
+    """
+    Create a repository with a big tutorial (parts, chapters and extracts), without database.
+
+    :return: the repository, the sha of the commit and the paths of the texts, as written in the manifest
+    :rtype: tuple
+    """
+    repo = Repo.init(path)
+    texts = []
+    for number in range(extracts):
+        part = 'partie-{}'.format(number // (EXTRACTS_PER_CHAPTER * CHAPTERS_PER_PART))
+        chapter = 'chapitre-{}'.format(number // EXTRACTS_PER_CHAPTER % CHAPTERS_PER_PART)
+        directory = os.path.join(path, part, chapter)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+            for name in ('introduction.md', 'conclusion.md'):
+                texts.append(os.path.join(part, chapter, name))
+        texts.append(os.path.join(part, chapter, 'extrait-{}.md'.format(number)))
+
+    for text in texts:
+        with open(os.path.join(path, text), 'w') as text_file:
+            text_file.write('Le texte de {}\n'.format(text) * 20)
+    repo.index.add(texts)
+    actor = Actor('benchmark', 'benchmark@zestedesavoir.com')
+    commit = repo.index.commit('Tutoriel de test', author=actor, committer=actor)
+    return repo, commit.hexsha, texts
+
+
+class Command(BaseCommand):
+    help = 'Compare the time needed to read all the texts of a big tutorial from git, with the former recursive ' \
+           'lookup and with the path index of a version.'
+    # python manage.py benchmark_blob_lookup --extracts=500
+
+    option_list = BaseCommand.option_list + (
+        make_option('--extracts',
+                    type='int',
+                    dest='extracts',
+                    default=500,
+                    help='Number of extracts of the biggest tutorial.'),
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(u'{:>9} {:>7} {:>16} {:>16}'.format('extracts', 'files', 'recursive (ms)', 'indexed (ms)'))
+
+        for extracts in [options['extracts'] // 4, options['extracts'] // 2, options['extracts']]:
+            path = tempfile.mkdtemp()
+            try:
+                repo, sha, texts = create_tutorial(path, extracts)
+
+                # as in the former `get_text()`: the tree is resolved again, then walked, for each text
+                start = time.time()
+                for text in texts:
+                    walk_blob(repo.commit(sha).tree, text)
+                recursive = (time.time() - start) * 1000.0
+
+                # as in `VersionedContent.get_blob()`: the version is indexed once
+                start = time.time()
+                index = get_blob_index(repo.commit(sha).tree)
+                for text in texts:
+                    read_blob(index[os.path.normpath(text)])
+                indexed = (time.time() - start) * 1000.0
+            finally:
+                shutil.rmtree(path)
+
+            self.stdout.write(u'{:>9} {:>7} {:>16.1f} {:>16.1f}'.format(extracts, len(texts), recursive, indexed))
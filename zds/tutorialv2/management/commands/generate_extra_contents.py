@@ -0,0 +1,74 @@
+# coding: utf-8
+
+import time
+from multiprocessing import Process
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from zds.tutorialv2.publication_utils import claim_publication_job, run_publication_job
+
+
+def work(stdout, loop):
+    """Run the jobs of the queue one after the other, until the queue is empty (or forever, if ``loop`` is set).
+
+    :param stdout: where the result of each job is written
+    :param loop: wait for new jobs instead of stopping when the queue is empty
+    :type loop: bool
+    :return: the number of jobs run
+    :rtype: int
+    """
+    done = 0
+    while True:
+        job = claim_publication_job()
+        if job is None:
+            if not loop:
+                return done
+            time.sleep(settings.ZDS_APP['content']['extra_content_queue_interval'])
+            continue
+
+        state = run_publication_job(job)
+        done += 1
+        stdout.write(u'{} of "{}" ({}, attempt {}): {}'.format(
+            job.format, job.published_content.content_public_slug, job.sha, job.attempts, state))
+
+
+class Command(BaseCommand):
+    help = 'Generate the extra contents (pdf, epub...) queued during the publications, when ' \
+           'ZDS_APP["content"]["extra_content_generation_policy"] is "QUEUE".'
+    # python manage.py generate_extra_contents --jobs=4 --loop
+
+    option_list = BaseCommand.option_list + (
+        make_option('--jobs',
+                    type='int',
+                    dest='jobs',
+                    default=1,
+                    help='Number of processes generating the extra contents.'),
+        make_option('--loop',
+                    action='store_true',
+                    dest='loop',
+                    default=False,
+                    help='Keep waiting for new jobs instead of stopping when the queue is empty.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['jobs'] <= 1:
+            try:
+                work(self.stdout, options['loop'])
+            except KeyboardInterrupt:
+                pass
+            return
+
+        # the workers must not share the database connection of this process
+        connection.close()
+        workers = [Process(target=work, args=(self.stdout, options['loop'])) for __ in range(options['jobs'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
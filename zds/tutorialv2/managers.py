@@ -2,6 +2,7 @@
 
 from django.conf import settings
 from django.db import models
+from django.db.models import Q
 
 
 class PublishedContentManager(models.Manager):
@@ -28,3 +29,26 @@ class PublishedContentManager(models.Manager):
 
     def last_articles_of_a_member_loaded(self, author):
         return self.last_contents_of_a_member_loaded(author, _type='ARTICLE')
+
+    def get_previous_and_next_articles(self, published):
+        """Get the articles published just before and just after an article, with two queries on the index of the
+        publication dates (the pk sorts the articles published at the same time).
+
+        :param published: the public version of an article
+        :type published: zds.tutorialv2.models.models_database.PublishedContent
+        :return: the previous and the next articles (`None` at the ends of the list)
+        :rtype: tuple
+        """
+        queryset = self.filter(content_type='ARTICLE', must_redirect=False, publication_date__isnull=False)\
+            .select_related('content')
+        date = published.publication_date
+
+        previous_article = queryset\
+            .filter(Q(publication_date__lt=date) | Q(publication_date=date, pk__lt=published.pk))\
+            .order_by('-publication_date', '-pk')\
+            .first()
+        next_article = queryset\
+            .filter(Q(publication_date__gt=date) | Q(publication_date=date, pk__gt=published.pk))\
+            .order_by('publication_date', 'pk')\
+            .first()
+        return previous_article, next_article
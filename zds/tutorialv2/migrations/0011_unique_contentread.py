@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicates(apps, schema_editor):
+    """Keep only the last ContentRead of each (content, user) pair."""
+    ContentRead = apps.get_model('tutorialv2', 'ContentRead')
+    duplicates = ContentRead.objects\
+        .values('content', 'user')\
+        .annotate(last_pk=Max('pk'), count=Count('pk'))\
+        .filter(count__gt=1)
+    for duplicate in duplicates:
+        ContentRead.objects\
+            .filter(content__pk=duplicate['content'], user__pk=duplicate['user'])\
+            .exclude(pk=duplicate['last_pk'])\
+            .delete()
+
+
+def keep_rows(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorialv2', '0010_publishedcontent_sizes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, keep_rows),
+        migrations.AlterUniqueTogether(
+            name='contentread',
+            unique_together=set([('content', 'user')]),
+        ),
+    ]
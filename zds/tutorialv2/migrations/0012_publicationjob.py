@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorialv2', '0011_unique_contentread'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicationJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('format', models.CharField(max_length=20, verbose_name=b'Format')),
+                ('sha', models.CharField(max_length=80, verbose_name=b'Sha1 de la version publi\xc3\xa9e')),
+                ('state', models.CharField(default=b'PENDING', max_length=10, verbose_name=b'\xc3\x89tat', db_index=True, choices=[(b'PENDING', 'En attente'), (b'RUNNING', 'En cours de g\xe9n\xe9ration'), (b'SUCCESS', 'G\xe9n\xe9r\xe9'), (b'FAILURE', '\xc9chec'), (b'STALE', 'Abandonn\xe9 (une version plus r\xe9cente a \xe9t\xe9 publi\xe9e)')])),
+                ('attempts', models.IntegerField(default=0, verbose_name=b"Nombre d'essais")),
+                ('next_attempt', models.DateTimeField(default=datetime.datetime.now, verbose_name=b'Date du prochain essai', db_index=True)),
+                ('start_date', models.DateTimeField(null=True, verbose_name=b'Date de d\xc3\xa9but de la g\xc3\xa9n\xc3\xa9ration', blank=True)),
+                ('last_error', models.TextField(verbose_name=b'Derni\xc3\xa8re erreur', blank=True)),
+                ('published_content', models.ForeignKey(related_name='publication_jobs', verbose_name=b'Contenu publi\xc3\xa9', to='tutorialv2.PublishedContent')),
+            ],
+            options={
+                'verbose_name': "G\xe9n\xe9ration d'un contenu t\xe9l\xe9chargeable",
+                'verbose_name_plural': 'G\xe9n\xe9rations des contenus t\xe9l\xe9chargeables',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='publicationjob',
+            unique_together=set([('published_content', 'format')]),
+        ),
+    ]
@@ -4,7 +4,7 @@ from django.views.generic import View
 
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
-from django.http import Http404, HttpResponse, HttpResponsePermanentRedirect
+from django.http import Http404, HttpResponse, HttpResponsePermanentRedirect, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.core.urlresolvers import reverse
 from django.views.generic import DetailView, FormView
@@ -477,7 +477,8 @@ class DownloadViewMixin(View):
     (inspired from https://djangosnippets.org/snippets/2549/ and
     http://stackoverflow.com/questions/16286666/send-a-file-through-django-class-based-views)
 
-    You just need to override `get_contents()` to make it works
+    You just need to override `get_contents()` to make it works. It returns either the whole file, or an iterator over
+    its chunks, which are then sent as soon as they are read (or built)
     """
     mimetype = None
     filename = None
@@ -496,9 +497,12 @@ class DownloadViewMixin(View):
         Access to a file with only get method then write the file content in response stream.
         Properly sets Content-Type and Content-Disposition headers
         """
-        response = HttpResponse(content_type=self.get_mimetype())
+        contents = self.get_contents()
+        if isinstance(contents, basestring):
+            response = HttpResponse(contents, content_type=self.get_mimetype())
+        else:
+            response = StreamingHttpResponse(contents, content_type=self.get_mimetype())
         response['Content-Disposition'] = 'filename=' + self.get_filename()
-        response.write(self.get_contents())
 
         return response
 
@@ -16,3 +16,12 @@ STATUS_CHOICES = (
     ('REJECT', _(u'Rejeté')),
     ('CANCEL', _(u'Annulé'))
 )
+
+# states of the generation of an extra content (pdf, epub...), see `PublicationJob`
+JOB_STATE_CHOICES = (
+    ('PENDING', _(u'En attente')),
+    ('RUNNING', _(u'En cours de génération')),
+    ('SUCCESS', _(u'Généré')),
+    ('FAILURE', _(u'Échec')),
+    ('STALE', _(u'Abandonné (une version plus récente a été publiée)')),
+)
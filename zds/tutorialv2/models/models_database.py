@@ -13,6 +13,7 @@ from math import ceil
 import shutil
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.db import models
 from django.http import Http404
@@ -20,17 +21,16 @@ from django.utils.http import urlencode
 from django.utils.translation import ugettext_lazy as _
 from django.db.models.signals import pre_delete, post_delete
 from django.dispatch import receiver
-from git import Repo, BadObject
+from git import Repo, BadObject, InvalidGitRepositoryError
 from gitdb.exc import BadName
 import os
 from uuslug import uuslug
 from zds.forum.models import Topic
 from zds.gallery.models import Image, Gallery
-from zds.tutorialv2.utils import get_content_from_json, BadManifestError
+from zds.tutorialv2.utils import get_content_from_json, get_blob, get_manifest_summary, BadManifestError
 from zds.utils import get_current_user
 from zds.utils.models import SubCategory, Licence, HelpWriting, Comment
-from zds.utils.tutorials import get_blob
-from zds.tutorialv2.models import TYPE_CHOICES, STATUS_CHOICES
+from zds.tutorialv2.models import TYPE_CHOICES, STATUS_CHOICES, JOB_STATE_CHOICES
 from zds.tutorialv2.models.models_versioned import NotAPublicVersion
 from zds.tutorialv2.managers import PublishedContentManager
 
@@ -327,10 +327,14 @@ class PublishableContent(models.Model):
             if sha != public.sha_public:
                 raise NotAPublicVersion
 
-            manifest = open(os.path.join(path, 'manifest.json'), 'r')
-            json = json_reader.loads(manifest.read())
-            versioned = get_content_from_json(json, public.sha_public,
-                                              slug, public=True, max_title_len=max_title_length)
+            cache_key = u'versioned:{}:{}:public:{}'.format(self.pk, sha, slug)
+            versioned = cache.get(cache_key)
+            if versioned is None:
+                manifest = open(os.path.join(path, 'manifest.json'), 'r')
+                json = json_reader.loads(manifest.read())
+                versioned = get_content_from_json(json, public.sha_public,
+                                                  slug, public=True, max_title_len=max_title_length)
+                self.cache_versioned(cache_key, versioned)
 
         else:  # draft version, use the repository (slower, but allows manipulation)
             path = self.get_repo_path()
@@ -339,19 +343,36 @@ class PublishableContent(models.Model):
             if not os.path.isdir(path):
                 raise IOError(path)
 
-            repo = Repo(path)
-            data = get_blob(repo.commit(sha).tree, 'manifest.json')
-            try:
-                json = json_reader.loads(data)
-            except ValueError:
-                raise BadManifestError(
-                    _(u'Une erreur est survenue lors de la lecture du manifest.json, est-ce du JSON ?'))
+            cache_key = u'versioned:{}:{}:draft:{}'.format(self.pk, sha, slug)
+            versioned = cache.get(cache_key)
+            if versioned is None:
+                repo = Repo(path)
+                data = get_blob(repo.commit(sha).tree, 'manifest.json')
+                try:
+                    json = json_reader.loads(data)
+                except ValueError:
+                    raise BadManifestError(
+                        _(u'Une erreur est survenue lors de la lecture du manifest.json, est-ce du JSON ?'))
 
-            versioned = get_content_from_json(json, sha, self.slug, max_title_len=max_title_length)
+                versioned = get_content_from_json(json, sha, self.slug, max_title_len=max_title_length)
+                self.cache_versioned(cache_key, versioned)
 
         self.insert_data_in_versioned(versioned)
         return versioned
 
+    @staticmethod
+    def cache_versioned(cache_key, versioned):
+        """Cache the tree of a version, before any information from database is inserted in it. A version never
+        changes, so the cache does not need to be invalidated. Each `cache.get()` gives a new copy of the tree, which
+        can be modified freely.
+
+        :param cache_key: the key, which contains the pk of the content and the sha of the version
+        :param versioned: the VersionedContent just read from the manifest
+        """
+        timeout = settings.ZDS_APP['content']['versioned_cache_timeout']
+        if timeout:
+            cache.set(cache_key, versioned, timeout)
+
     def insert_data_in_versioned(self, versioned):
         """Insert some additional data from database in a VersionedContent
 
@@ -431,8 +452,7 @@ class PublishableContent(models.Model):
                     .select_related('note')\
                     .select_related('note__related_content')\
                     .select_related('related_content__public_version')\
-                    .filter(content=self, user__pk=user.pk)\
-                    .latest('note__pubdate')
+                    .get(content=self, user__pk=user.pk)
                 if read is not None and read.note:  # one case can show a read without note : the author has just
                     # published his content and one comment has been posted by someone else.
                     return read.note
@@ -452,8 +472,8 @@ class PublishableContent(models.Model):
         if user and user.is_authenticated():
             try:
                 read = ContentRead.objects\
-                    .filter(content=self, user__pk=user.pk)\
-                    .latest('note__pubdate')
+                    .select_related('note')\
+                    .get(content=self, user__pk=user.pk)
 
                 if read and read.note:
                     last_note = read.note
@@ -511,6 +531,39 @@ class PublishableContent(models.Model):
         Validation.objects.filter(content=self).delete()
 
 
+def load_manifest_summaries(versions):
+    """Summarize the manifests of some versions (see `get_manifest_summary()`), without building their trees. A
+    version never changes, so its summary is kept in the cache (for `ZDS_APP['content']['versioned_cache_timeout']`
+    seconds) and all the summaries are fetched from the cache at once; only the missing ones are read from git.
+
+    :param versions: the versions, as ``(content, sha)`` pairs
+    :type versions: list
+    :return: the summaries, by ``(content pk, sha)`` (the versions which cannot be read are missing)
+    :rtype: dict
+    """
+    keys = {u'manifest_summary:{}:{}'.format(content.pk, sha): (content, sha) for content, sha in versions if sha}
+    summaries = {}
+    missing = {}
+    for key, summary in cache.get_many(keys.keys()).items():
+        content, sha = keys[key]
+        summaries[content.pk, sha] = summary
+
+    for key, (content, sha) in keys.items():
+        if (content.pk, sha) in summaries:
+            continue
+        try:
+            data = get_blob(Repo(content.get_repo_path()).commit(sha).tree, 'manifest.json')
+            summary = get_manifest_summary(json_reader.loads(data))
+        except (BadObject, BadName, InvalidGitRepositoryError, OSError, IOError, ValueError, TypeError, KeyError):
+            continue
+        summaries[content.pk, sha] = missing[key] = summary
+
+    timeout = settings.ZDS_APP['content']['versioned_cache_timeout']
+    if missing and timeout:
+        cache.set_many(missing, timeout)
+    return summaries
+
+
 @receiver(pre_delete, sender=PublishableContent)
 def delete_repo(sender, instance, **kwargs):
     """catch the pre_delete signal to ensure the deletion of the repository if a PublishableContent is deleted"""
@@ -808,6 +861,39 @@ class PublishedContent(models.Model):
     def get_last_action_date(self):
         return self.update_date or self.publication_date
 
+    def get_extra_contents_states(self):
+        """Get the state of the generation of each extra content of the current version (see `PublicationJob`)
+
+        :return: the state, by format
+        :rtype: dict
+        """
+        return {job.format: job.state for job in self.publication_jobs.filter(sha=self.sha_public)}
+
+
+class PublicationJob(models.Model):
+    """The generation of an extra content (pdf, epub...) of a published content, done out of the publication request by
+    the `generate_extra_contents` command (see `zds.tutorialv2.publication_utils`). There is a single job by format: it
+    is reset to the new sha when the content is published again.
+    """
+    class Meta:
+        verbose_name = 'Génération d\'un contenu téléchargeable'
+        verbose_name_plural = 'Générations des contenus téléchargeables'
+        unique_together = ('published_content', 'format')
+
+    published_content = models.ForeignKey(PublishedContent, verbose_name='Contenu publié',
+                                          related_name='publication_jobs')
+    # name of the publicator, in `PublicatorRegistery`
+    format = models.CharField('Format', max_length=20)
+    sha = models.CharField('Sha1 de la version publiée', max_length=80)
+    state = models.CharField('État', max_length=10, choices=JOB_STATE_CHOICES, default='PENDING', db_index=True)
+    attempts = models.IntegerField('Nombre d\'essais', default=0)
+    next_attempt = models.DateTimeField('Date du prochain essai', default=datetime.now, db_index=True)
+    start_date = models.DateTimeField('Date de début de la génération', null=True, blank=True)
+    last_error = models.TextField('Dernière erreur', blank=True)
+
+    def __unicode__(self):
+        return u'<Génération {0} de "{1}" ({2})>'.format(self.format, self.published_content, self.state)
+
 
 class ContentReaction(Comment):
     """
@@ -842,6 +928,7 @@ class ContentRead(models.Model):
     class Meta:
         verbose_name = 'Contenu lu'
         verbose_name_plural = 'Contenu lus'
+        unique_together = ('content', 'user')
 
     content = models.ForeignKey(PublishableContent, db_index=True)
     note = models.ForeignKey(ContentReaction, db_index=True, null=True)
@@ -14,7 +14,7 @@ from zds.settings import ZDS_APP
 from zds.tutorialv2.utils import default_slug_pool, export_content, get_commit_author, InvalidOperationError
 from uuslug import slugify
 from zds.utils.misc import compute_hash
-from zds.tutorialv2.utils import get_blob, InvalidSlugError, check_slug
+from zds.tutorialv2.utils import get_blob_index, read_blob, InvalidSlugError, check_slug
 
 
 class Container:
@@ -396,8 +396,7 @@ class Container:
         :rtype: str
         """
         if self.introduction:
-            return get_blob(self.top_container().repository.commit(self.top_container().current_version).tree,
-                            self.introduction)
+            return self.top_container().get_blob(self.introduction)
 
     def get_conclusion(self):
         """
@@ -405,8 +404,7 @@ class Container:
         :rtype: str
         """
         if self.conclusion:
-            return get_blob(self.top_container().repository.commit(self.top_container().current_version).tree,
-                            self.conclusion)
+            return self.top_container().get_blob(self.conclusion)
 
     def get_introduction_online(self):
         """The introduction content for online version.
@@ -874,9 +872,7 @@ class Extract:
         :rtype: str
         """
         if self.text:
-            return get_blob(
-                self.container.top_container().repository.commit(self.container.top_container().current_version).tree,
-                self.text)
+            return self.container.top_container().get_blob(self.text)
 
     def compute_hash(self):
         """Compute an MD5 hash from the text, for comparison purpose
@@ -1066,9 +1062,39 @@ class VersionedContent(Container):
         if self.slug != '' and os.path.exists(self.get_path()):
             self.repository = Repo(self.get_path())
 
+    def __getstate__(self):
+        """The git repository is not serialized (to cache the content), it is opened again when unserialized."""
+        state = self.__dict__.copy()
+        state.pop('repository', None)
+        state.pop('blob_index', None)
+        state.pop('blob_index_version', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not getattr(self, 'PUBLIC', False) and self.slug != '' and os.path.exists(self.get_path()):
+            self.repository = Repo(self.get_path())
+
     def __unicode__(self):
         return self.title
 
+    def get_blob(self, path):
+        """Get the content of a file in the current version. The files of the version are indexed the first time,
+        so that the texts of all the children are read in a time proportional to the size of the content.
+
+        :param path: path of the file, relative to the root of the repository
+        :type path: str
+        :return: the content of the file, or `None` if it does not exist
+        :rtype: bytearray
+        """
+        if getattr(self, 'blob_index_version', None) != self.current_version:
+            self.blob_index = get_blob_index(self.repository.commit(self.current_version).tree)
+            self.blob_index_version = self.current_version
+
+        blob = self.blob_index.get(os.path.normpath(path))
+        if blob is not None:
+            return read_blob(blob)
+
     def textual_type(self):
         """Create a internationalized string with the human readable type of this content e.g The Article
 
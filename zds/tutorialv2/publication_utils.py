@@ -1,23 +1,55 @@
 # coding: utf-8
 import codecs
 import copy
+import hashlib
+import json
 import logging
 import os
 import shutil
 import subprocess
-import zipfile
-from datetime import datetime
+import tempfile
+from datetime import datetime, timedelta
+from multiprocessing import Pool
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
+from django.db.models import F, Q
 from django.template.loader import render_to_string
 from django.utils import translation
+from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
-from os.path import isdir, dirname
+from git import Repo
 from zds import settings
 from zds.search.models import SearchIndexContent
+from zds.tutorialv2.archive import write_archive
 from zds.settings import ZDS_APP
 from zds.tutorialv2.utils import retrieve_and_update_images_links
-from zds.utils.templatetags.emarkdown import emarkdown
+from zds.utils.templatetags.emarkdown import emarkdown, RENDERING_SIGNATURE
+
+logger = logging.getLogger(__name__)
+
+CHAPTER_TEMPLATE = 'tutorialv2/export/chapter.html'
+
+# fingerprint of each HTML file of a publication, see `publish_container()`
+FINGERPRINTS_FILENAME = 'fingerprints.json'
+
+# values of `ZDS_APP['content']['extra_content_generation_policy']`
+EXTRA_CONTENT_GENERATION_POLICIES = ('SYNC', 'QUEUE', 'NOTHING')
+
+
+def get_extra_content_generation_policy():
+    """
+    :raise ImproperlyConfigured: if the policy is unknown (as the former "WATCHDOG" one), rather than publishing
+        without the extra contents
+    :return: the policy of the generation of the extra contents
+    :rtype: str
+    """
+    policy = settings.ZDS_APP['content']['extra_content_generation_policy']
+    if policy not in EXTRA_CONTENT_GENERATION_POLICIES:
+        raise ImproperlyConfigured(
+            u'Unknown extra_content_generation_policy "{}", it must be one of {} (see update.md)'.format(
+                policy, ', '.join(EXTRA_CONTENT_GENERATION_POLICIES)))
+    return policy
 
 
 def publish_content(db_object, versioned, is_major_update=True):
@@ -39,6 +71,8 @@ def publish_content(db_object, versioned, is_major_update=True):
 
     from zds.tutorialv2.models.models_database import PublishedContent
 
+    policy = get_extra_content_generation_policy()
+
     if is_major_update:
         versioned.pubdate = datetime.now()
 
@@ -49,10 +83,14 @@ def publish_content(db_object, versioned, is_major_update=True):
     if os.path.exists(tmp_path):
         shutil.rmtree(tmp_path)  # erase previous attempt, if any
 
-    # render HTML:
+    # render HTML, reusing the files of the current publication whose sources did not change:
     altered_version = copy.deepcopy(versioned)
-    publish_container(db_object, tmp_path, altered_version)
+    fingerprints = publish_container(db_object, tmp_path, altered_version,
+                                     previous_files=get_previous_files(db_object.public_version),
+                                     jobs=settings.ZDS_APP['content']['publication_jobs'])
     altered_version.dump_json(os.path.join(tmp_path, 'manifest.json'))
+    with open(os.path.join(tmp_path, FINGERPRINTS_FILENAME), 'w') as fingerprints_file:
+        json.dump(fingerprints, fingerprints_file)
 
     # make room for "extra contents"
     extra_contents_path = os.path.join(tmp_path, settings.ZDS_APP['content']['extra_contents_dirname'])
@@ -82,14 +120,9 @@ def publish_content(db_object, versioned, is_major_update=True):
     finally:
         md_file.close()
 
-    pandoc_debug_str = ""
-    if settings.PANDOC_LOG_STATE:
-        pandoc_debug_str = " 2>&1 | tee -a " + settings.PANDOC_LOG
-    if settings.ZDS_APP['content']['extra_content_generation_policy'] == "SYNC":
+    if policy == "SYNC":
         # ok, now we can really publish the thing !
-        generate_exernal_content(base_name, extra_contents_path, md_file_path, pandoc_debug_str)
-    elif settings.ZDS_APP['content']['extra_content_generation_policy'] == "WATCHDOG":
-        PublicatorRegistery.get("watchdog").publish(md_file_path, base_name, silently_pass=False)
+        generate_exernal_content(base_name, extra_contents_path, md_file_path, get_pandoc_debug_str())
 
     is_update = False
 
@@ -127,11 +160,7 @@ def publish_content(db_object, versioned, is_major_update=True):
         public_version.authors.add(author)
     public_version.save()
     # move the stuffs into the good position
-    if settings.ZDS_APP['content']['extra_content_generation_policy'] != "WATCHDOG":
-        shutil.move(tmp_path, public_version.get_prod_path())
-    else:  # if we use watchdog, we use copy to get md and zip file in prod but everything else will be handled by
-        # watchdog
-        shutil.copytree(tmp_path, public_version.get_prod_path())
+    shutil.move(tmp_path, public_version.get_prod_path())
     # save public version
     if is_major_update or not is_update:
         public_version.publication_date = datetime.now()
@@ -145,6 +174,9 @@ def publish_content(db_object, versioned, is_major_update=True):
     except IOError:
         pass
 
+    if policy == "QUEUE":
+        queue_extra_contents(public_version)
+
     return public_version
 
 
@@ -167,6 +199,135 @@ def generate_exernal_content(base_name, extra_contents_path, md_file_path, pando
         publicator.publish(md_file_path, base_name, change_dir=extra_contents_path, pandoc_debug_str=pandoc_debug_str)
 
 
+def get_pandoc_debug_str():
+    if settings.PANDOC_LOG_STATE:
+        return " 2>&1 | tee -a " + settings.PANDOC_LOG
+    return ""
+
+
+def queue_extra_contents(public_version):
+    """Ask the `generate_extra_contents` command to generate the extra contents (pdf, epub...) of a published content,
+    one job by registered publicator. The jobs of the previous versions which are not done yet are abandoned.
+
+    :param public_version: the published content
+    :type public_version: zds.tutorialv2.models.models_database.PublishedContent
+    """
+
+    from zds.tutorialv2.models.models_database import PublicationJob
+
+    # the previous version may have been published under another slug, thus with another `PublishedContent`
+    PublicationJob.objects\
+        .filter(published_content__content_pk=public_version.content_pk, state__in=['PENDING', 'RUNNING'])\
+        .exclude(published_content=public_version)\
+        .update(state='STALE')
+
+    for name, __ in PublicatorRegistery.get_all_registered():
+        PublicationJob.objects.update_or_create(
+            published_content=public_version,
+            format=name,
+            defaults={
+                'sha': public_version.sha_public,
+                'state': 'PENDING',
+                'attempts': 0,
+                'next_attempt': datetime.now(),
+                'start_date': None,
+                'last_error': '',
+            })
+
+
+def claim_publication_job():
+    """Take the next job to run, if any. Several workers may look for a job at the same time: a job belongs to the
+    worker which manages to switch it to "RUNNING". A job which is still running after
+    `ZDS_APP['content']['extra_content_job_timeout']` seconds is considered lost (the worker died) and is run again.
+
+    :return: the job, or `None` if there is nothing to do
+    :rtype: zds.tutorialv2.models.models_database.PublicationJob
+    """
+
+    from zds.tutorialv2.models.models_database import PublicationJob
+
+    config = settings.ZDS_APP['content']
+    now = datetime.now()
+    lost = Q(state='RUNNING', start_date__lte=now - timedelta(seconds=config['extra_content_job_timeout']))
+
+    PublicationJob.objects\
+        .filter(lost, attempts__gte=config['extra_content_max_attempts'])\
+        .update(state='FAILURE', last_error=u'Temps de génération dépassé')
+
+    candidates = PublicationJob.objects\
+        .filter(Q(state='PENDING', next_attempt__lte=now) | lost)\
+        .filter(attempts__lt=config['extra_content_max_attempts'])\
+        .order_by('next_attempt', 'pk')
+
+    for job in candidates[:10]:
+        claimed = PublicationJob.objects\
+            .filter(pk=job.pk, sha=job.sha, state=job.state, start_date=job.start_date)\
+            .update(state='RUNNING', start_date=now, attempts=F('attempts') + 1)
+        if claimed:
+            job.state = 'RUNNING'
+            job.start_date = now
+            job.attempts += 1
+            return job
+
+    return None
+
+
+def run_publication_job(job):
+    """Generate the extra content of a job in a temporary directory, then move it next to the other extra contents,
+    unless a newer version has been published in the meantime. If the generation fails, the job is tried again later,
+    after `ZDS_APP['content']['extra_content_retry_delay']` seconds, doubled at each attempt.
+
+    :param job: a job claimed with `claim_publication_job()`
+    :type job: zds.tutorialv2.models.models_database.PublicationJob
+    :return: the new state of the job
+    :rtype: str
+    """
+
+    from zds.tutorialv2.models.models_database import PublicationJob, PublishedContent
+
+    config = settings.ZDS_APP['content']
+    running = PublicationJob.objects.filter(pk=job.pk, sha=job.sha, state='RUNNING')
+
+    try:
+        published = PublishedContent.objects.get(pk=job.published_content_id, sha_public=job.sha)
+    except PublishedContent.DoesNotExist:
+        running.update(state='STALE')
+        return 'STALE'
+
+    extra_contents_path = published.get_extra_contents_directory()
+    base_name = os.path.join(extra_contents_path, published.content_public_slug)
+    building_path = None
+
+    try:
+        building_path = tempfile.mkdtemp(dir=extra_contents_path)
+        building_name = os.path.join(building_path, published.content_public_slug)
+        PublicatorRegistery.get(job.format).publish(base_name + '.md', building_name, change_dir=extra_contents_path,
+                                                    pandoc_debug_str=get_pandoc_debug_str())
+
+        generated = building_name + '.' + job.format
+        if not os.path.isfile(generated):
+            raise FailureDuringPublication(u'Le fichier {} n\'a pas été généré'.format(os.path.basename(generated)))
+
+        if not running.update(state='SUCCESS', last_error=''):
+            return 'STALE'  # published again, or unpublished, in the meantime
+        os.rename(generated, base_name + '.' + job.format)
+        return 'SUCCESS'
+
+    except Exception as e:
+        state = 'FAILURE' if job.attempts >= config['extra_content_max_attempts'] else 'PENDING'
+        delay = config['extra_content_retry_delay'] * 2 ** (job.attempts - 1)
+        error = u'{}: {}'.format(type(e).__name__, force_text(e, errors='replace'))
+        if not running.update(state=state, next_attempt=datetime.now() + timedelta(seconds=delay), last_error=error):
+            return 'STALE'
+        logger.warning(u'Unable to generate the %s of "%s" (attempt %s): %s',
+                       job.format, published.content_public_slug, job.attempts, error)
+        return state
+
+    finally:
+        if building_path is not None:
+            shutil.rmtree(building_path, ignore_errors=True)
+
+
 class PublicatorRegistery:
     """
     Register all publicator as a "human-readable name/publicator" instance key/value list
@@ -276,43 +437,110 @@ class PandocPublicator(Publicator):
             self.__logger.info("Finished {} generation".format(base_name + "." + self.format))
 
 
-@PublicatorRegistery.register("watchdog", settings.ZDS_APP['content']['extra_content_watchdog_dir'])
-class WatchdogFilePublicator(Publicator):
+class FailureDuringPublication(Exception):
+    """Exception raised if something goes wrong during publication process
     """
-    Just create a meta data file for watchdog
+
+    def __init__(self, *args, **kwargs):
+        super(FailureDuringPublication, self).__init__(*args, **kwargs)
+
+
+def get_fingerprint(template, context):
+    """Summarize everything an HTML file of a publication is made from: if it did not change, the file is the same.
+
+    :param template: template of the file, `None` for an introduction or a conclusion
+    :type template: str
+    :param context: what the file is rendered from
+    :type context: dict
+    :return: the fingerprint
+    :rtype: str
     """
-    def __init__(self, watched_dir):
-        self.watched_directory = watched_dir
-        if not isdir(self.watched_directory):
-            os.mkdir(self.watched_directory)
-        self.__logger = logging.getLogger("zds.watchdog-publicator")
+    data = json.dumps([RENDERING_SIGNATURE, template, context], sort_keys=True)
+    return hashlib.sha1(data).hexdigest()
 
-    def publish(self, md_file_path, base_name, silently_pass=True, **kwargs):
-        if silently_pass:
-            return
-        fname = base_name.replace(dirname(base_name), self.watched_directory)
-        with codecs.open(fname, "w", encoding='utf-8') as w_file:
-            w_file.write(";".join([base_name, md_file_path]))
-        self.__logger.debug("Registered {} for generation".format(md_file_path))
 
+def get_previous_files(public_version):
+    """Find the HTML files of the current publication of a content, to reuse them in the next one.
 
-class FailureDuringPublication(Exception):
-    """Exception raised if something goes wrong during publication process
+    :param public_version: the current publication, if any
+    :type public_version: zds.tutorialv2.models.models_database.PublishedContent
+    :return: the path of each file, by fingerprint
+    :rtype: dict
     """
+    if public_version is None:
+        return {}
 
-    def __init__(self, *args, **kwargs):
-        super(FailureDuringPublication, self).__init__(*args, **kwargs)
+    prod_path = public_version.get_prod_path()
+    fingerprints_path = os.path.join(prod_path, FINGERPRINTS_FILENAME)
+    if not os.path.isfile(fingerprints_path):  # published before the fingerprints existed
+        return {}
+
+    with open(fingerprints_path) as fingerprints_file:
+        try:
+            fingerprints = json.load(fingerprints_file)
+        except ValueError:
+            return {}
+
+    return {fingerprint: os.path.join(prod_path, path) for path, fingerprint in fingerprints.items()}
 
 
-def publish_container(db_object, base_dir, container):
-    """ "Publish" a given container, in a recursive way
+def render_file(task):
+    """Render an HTML file of a publication. Called in the worker processes, which never touch the database nor the
+    repository: everything is in the context.
+
+    :param task: `(path, template, context)`
+    :type task: tuple
+    :return: `(path, html)`
+    :rtype: tuple
+    """
+    path, template, context = task
+    if template is None:
+        return path, emarkdown(context['text'], context['is_js'])
+    return path, render_to_string(template, context)
+
+
+def render_files(tasks, jobs=1):
+    """Render HTML files, in `jobs` processes.
+
+    :param tasks: list of `(path, template, context)`
+    :type tasks: list
+    :param jobs: number of processes
+    :type jobs: int
+    :return: list of `(path, html)`
+    :rtype: list
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        return [render_file(task) for task in tasks]
+
+    # the workers must not share the connections of this process to the cache servers
+    for backend in caches.all():
+        backend.close()
+
+    pool = Pool(min(jobs, len(tasks)))
+    try:
+        return pool.map(render_file, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def read_text(text):
+    if text is not None:
+        return force_text(text)
+
+
+def collect_container(db_object, container, tasks, errors):
+    """List the HTML files of a container and of its children, in a recursive way, and remove from the container
+    what is now in these files.
 
     :param db_object: database representation of the content
     :type db_object: PublishableContent
-    :param base_dir: directory of the top container
-    :type base_dir: str
     :param container: a given container
     :type container: Container
+    :param tasks: list where the `(path, template, context)` of the files are appended
+    :type tasks: list
+    :param errors: dict where the error message of each file is set
+    :type errors: dict
     :raise FailureDuringPublication: if anything goes wrong
     """
 
@@ -321,31 +549,28 @@ def publish_container(db_object, base_dir, container):
     if not isinstance(container, Container):
         raise FailureDuringPublication(_(u'Le conteneur n\'en est pas un !'))
 
-    template = 'tutorialv2/export/chapter.html'
-
     # jsFiddle support
     if db_object.js_support:
         is_js = "js"
     else:
         is_js = ""
 
-    current_dir = os.path.dirname(os.path.join(base_dir, container.get_prod_path(relative=True)))
-
-    if not os.path.isdir(current_dir):
-        os.makedirs(current_dir)
-
     if container.has_extracts():  # the container can be rendered in one template
-        parsed = render_to_string(template, {'container': container, 'is_js': is_js})
-        f = codecs.open(os.path.join(base_dir, container.get_prod_path(relative=True)), 'w', encoding='utf-8')
-
-        try:
-            f.write(parsed)
-        except (UnicodeError, UnicodeEncodeError):
-            raise FailureDuringPublication(
-                _(u'Une erreur est survenue durant la publication de « {} », vérifiez le code markdown')
-                .format(container.title))
-
-        f.close()
+        path = container.get_prod_path(relative=True)
+        context = {
+            'introduction': read_text(container.get_introduction()),
+            'conclusion': read_text(container.get_conclusion()),
+            'extracts': [{
+                'position_in_parent': extract.position_in_parent,
+                'slug': extract.slug,
+                'title': extract.title,
+                'text': read_text(extract.get_text()),
+            } for extract in container.children],
+            'is_js': is_js,
+        }
+        tasks.append((path, CHAPTER_TEMPLATE, context))
+        errors[path] = _(u'Une erreur est survenue durant la publication de « {} », vérifiez le code markdown')\
+            .format(container.title)
 
         for extract in container.children:
             extract.text = None
@@ -354,40 +579,81 @@ def publish_container(db_object, base_dir, container):
         container.conclusion = None
 
     else:  # separate render of introduction and conclusion
-
-        current_dir = os.path.join(base_dir, container.get_prod_path(relative=True))  # create subdirectory
-
-        if not os.path.isdir(current_dir):
-            os.makedirs(current_dir)
-
         if container.introduction:
             path = os.path.join(container.get_prod_path(relative=True), 'introduction.html')
-            f = codecs.open(os.path.join(base_dir, path), 'w', encoding='utf-8')
-
-            try:
-                f.write(emarkdown(container.get_introduction(), db_object.js_support))
-            except (UnicodeError, UnicodeEncodeError):
-                raise FailureDuringPublication(
-                    _(u'Une erreur est survenue durant la publication de l\'introduction de « {} »,'
-                      u' vérifiez le code markdown').format(container.title))
+            context = {'text': read_text(container.get_introduction()), 'is_js': db_object.js_support}
+            tasks.append((path, None, context))
+            errors[path] = _(u'Une erreur est survenue durant la publication de l\'introduction de « {} »,'
+                             u' vérifiez le code markdown').format(container.title)
 
             container.introduction = path
 
         if container.conclusion:
             path = os.path.join(container.get_prod_path(relative=True), 'conclusion.html')
-            f = codecs.open(os.path.join(base_dir, path), 'w', encoding='utf-8')
-
-            try:
-                f.write(emarkdown(container.get_conclusion(), db_object.js_support))
-            except (UnicodeError, UnicodeEncodeError):
-                raise FailureDuringPublication(
-                    _(u'Une erreur est survenue durant la publication de la conclusion de « {} »,'
-                      u' vérifiez le code markdown').format(container.title))
+            context = {'text': read_text(container.get_conclusion()), 'is_js': db_object.js_support}
+            tasks.append((path, None, context))
+            errors[path] = _(u'Une erreur est survenue durant la publication de la conclusion de « {} »,'
+                             u' vérifiez le code markdown').format(container.title)
 
             container.conclusion = path
 
         for child in container.children:
-            publish_container(db_object, base_dir, child)
+            collect_container(db_object, child, tasks, errors)
+
+
+def publish_container(db_object, base_dir, container, previous_files=None, jobs=1):
+    """ "Publish" a given container and its children.
+
+    Each HTML file whose fingerprint is found in ``previous_files`` (its sources did not change since the previous
+    publication) is copied, the other ones are rendered in ``jobs`` processes.
+
+    :param db_object: database representation of the content
+    :type db_object: PublishableContent
+    :param base_dir: directory of the top container
+    :type base_dir: str
+    :param container: a given container
+    :type container: Container
+    :param previous_files: the path of the files of the previous publication, by fingerprint
+    :type previous_files: dict
+    :param jobs: number of processes rendering the files
+    :type jobs: int
+    :raise FailureDuringPublication: if anything goes wrong
+    :return: the fingerprint of each file, by path relative to ``base_dir``
+    :rtype: dict
+    """
+    tasks = []
+    errors = {}
+    collect_container(db_object, container, tasks, errors)
+
+    if not os.path.isdir(base_dir):
+        os.makedirs(base_dir)
+
+    fingerprints = {}
+    to_render = []
+    for path, template, context in tasks:
+        fingerprints[path] = get_fingerprint(template, context)
+
+        current_dir = os.path.dirname(os.path.join(base_dir, path))
+        if not os.path.isdir(current_dir):
+            os.makedirs(current_dir)
+
+        previous_path = (previous_files or {}).get(fingerprints[path])
+        if previous_path is not None and os.path.isfile(previous_path):
+            shutil.copyfile(previous_path, os.path.join(base_dir, path))
+        else:
+            to_render.append((path, template, context))
+
+    for path, html in render_files(to_render, jobs):
+        f = codecs.open(os.path.join(base_dir, path), 'w', encoding='utf-8')
+
+        try:
+            f.write(html)
+        except (UnicodeError, UnicodeEncodeError):
+            raise FailureDuringPublication(errors[path])
+        finally:
+            f.close()
+
+    return fingerprints
 
 
 def make_zip_file(published_content):
@@ -398,14 +664,9 @@ def make_zip_file(published_content):
     """
 
     publishable = published_content.content
-    publishable.sha_public = publishable.sha_draft  # ensure sha update so that archive is updated to
     path = os.path.join(published_content.get_extra_contents_directory(),
                         published_content.content_public_slug + ".zip")
-    zip_file = zipfile.ZipFile(path, 'w')
-    versioned = publishable.load_version(None, True)
-    from zds.tutorialv2.views.views_contents import DownloadContent
-    DownloadContent.insert_into_zip(zip_file, versioned.repository.commit(versioned.current_version).tree)
-    zip_file.close()
+    write_archive(path, publishable.pk, Repo(publishable.get_repo_path()), published_content.sha_public)
 
 
 def unpublish_content(db_object):
@@ -14,6 +14,7 @@ from zds.member.factories import ProfileFactory, StaffProfileFactory, UserFactor
 from zds.tutorialv2.factories import PublishableContentFactory, ContainerFactory, ExtractFactory, LicenceFactory, \
     SubCategoryFactory, PublishedContentFactory, ValidationFactory
 from zds.gallery.factories import UserGalleryFactory
+from zds.tutorialv2.views.views_validations import ValidationListView
 from zds.forum.factories import ForumFactory, CategoryFactory
 
 overrided_zds_app = settings.ZDS_APP
@@ -202,6 +203,24 @@ class ContentTests(TestCase):
 
         self.assertEqual(validations[0].content, article_reserved)  # the right content
 
+        # several filters at once
+        response = self.client.get(reverse('validation:list') + "?status=reserved&type=tuto", follow=False)
+        self.assertEqual(response.status_code, 200)
+        validations = response.context['validations']
+        self.assertEqual(1, len(validations))
+        self.assertEqual(validations[0].content, tuto_reserved)
+
+        # pagination
+        per_page = ValidationListView.paginate_by
+        ValidationListView.paginate_by = 3
+        try:
+            response = self.client.get(reverse('validation:list') + "?page=2", follow=False)
+        finally:
+            ValidationListView.paginate_by = per_page
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(4, response.context['paginator'].count)
+        self.assertEqual(1, len(response.context['validations']))
+
     def tearDown(self):
 
         if os.path.isdir(settings.ZDS_APP['content']['repo_private_path']):
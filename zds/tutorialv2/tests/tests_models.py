@@ -65,6 +65,22 @@ class ContentTests(TestCase):
         self.assertTrue(self.part1.slug in versioned.children_dict.keys())
         self.assertTrue(self.chapter1.slug in versioned.children_dict[self.part1.slug].children_dict)
 
+    def test_load_version_from_cache(self):
+        """
+        A version read twice gives two independent trees, filled with the current data of the database
+        """
+        versioned = self.tuto.load_version()
+        other = self.tuto.load_version()
+        self.assertIsNot(versioned, other)
+        self.assertEqual(self.extract1.title, other.children[0].children[0].children[0].title)
+        self.assertTrue(os.path.samefile(versioned.repository.working_dir, other.repository.working_dir))
+
+        other.children[0].title = u'Un autre titre'
+        self.assertEqual(self.part1.title, self.tuto.load_version().children[0].title)
+
+        self.tuto.source = u'Une nouvelle source'
+        self.assertEqual(u'Une nouvelle source', self.tuto.load_version().source)
+
     def test_ensure_unique_slug(self):
         """
         Ensure that slugs for a container or extract are always unique
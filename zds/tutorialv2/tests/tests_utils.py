@@ -3,9 +3,16 @@
 import os
 import shutil
 import tempfile
+import threading
 import datetime
+import zipfile
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from StringIO import StringIO
+
+from PIL import Image as ImagePIL
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 from django.test.utils import override_settings
 from zds.settings import BASE_DIR
@@ -18,14 +25,17 @@ from zds.gallery.factories import UserGalleryFactory
 from zds.tutorialv2.models.models_versioned import Container
 from zds.tutorialv2.utils import get_target_tagged_tree_for_container, \
     get_target_tagged_tree_for_extract, retrieve_and_update_images_links, last_participation_is_old, \
-    InvalidSlugError, BadManifestError, get_content_from_json, get_commit_author, slugify_raise_on_invalid, check_slug
-from zds.tutorialv2.publication_utils import publish_content, unpublish_content
-from zds.tutorialv2.models.models_database import PublishableContent, PublishedContent, ContentReaction, ContentRead
+    InvalidSlugError, BadManifestError, get_content_from_json, get_commit_author, slugify_raise_on_invalid, \
+    check_slug, get_manifest_summary
+from zds.tutorialv2.publication_utils import publish_content, unpublish_content, FINGERPRINTS_FILENAME, \
+    queue_extra_contents, claim_publication_job, run_publication_job
+from zds.tutorialv2.models.models_database import PublishableContent, PublishedContent, ContentReaction, ContentRead, \
+    PublicationJob, load_manifest_summaries
 from django.core.management import call_command
 from zds.tutorialv2.publication_utils import Publicator, PublicatorRegistery
-from watchdog.events import FileCreatedEvent
-from zds.tutorialv2.management.commands.publication_watchdog import TutorialIsPublished
-from mock import Mock
+from zds.tutorialv2.image_cache import ImageCache
+from zds.tutorialv2.archive import iter_archive, get_archive_path
+from mock import patch
 try:
     import ujson as json_reader
 except ImportError:
@@ -37,6 +47,8 @@ except ImportError:
 overrided_zds_app = settings.ZDS_APP
 overrided_zds_app['content']['repo_private_path'] = os.path.join(BASE_DIR, 'contents-private-test')
 overrided_zds_app['content']['repo_public_path'] = os.path.join(BASE_DIR, 'contents-public-test')
+overrided_zds_app['content']['image_cache_dir'] = os.path.join(BASE_DIR, 'image-cache-test')
+overrided_zds_app['content']['archive_cache_dir'] = os.path.join(BASE_DIR, 'archive-cache-test')
 overrided_zds_app['tutorial']['repo_path'] = os.path.join(BASE_DIR, 'tutoriels-private-test')
 overrided_zds_app['tutorial']['repo_public_path'] = os.path.join(BASE_DIR, 'tutoriels-public-test')
 overrided_zds_app['article']['repo_path'] = os.path.join(BASE_DIR, 'article-data-test')
@@ -258,6 +270,40 @@ class UtilsTests(TestCase):
                 self.assertIsNone(chapter.introduction)
                 self.assertIsNone(chapter.conclusion)
 
+    def test_publish_content_reuses_unchanged_files(self):
+        """republishing a content renders again only the files whose sources changed"""
+
+        tuto = PublishableContentFactory(type='TUTORIAL', author_list=[self.user_author])
+        tuto_draft = tuto.load_version()
+        chapter1 = ContainerFactory(parent=tuto_draft, db_object=tuto)
+        ExtractFactory(container=chapter1, db_object=tuto)
+        chapter2 = ContainerFactory(parent=tuto_draft, db_object=tuto)
+        extract2 = ExtractFactory(container=chapter2, db_object=tuto)
+
+        tuto = PublishableContent.objects.get(pk=tuto.pk)
+        published = publish_content(tuto, tuto_draft)
+        tuto.public_version = published
+        tuto.save()
+        self.assertTrue(os.path.isfile(os.path.join(published.get_prod_path(), FINGERPRINTS_FILENAME)))
+
+        # mark the files of the current publication, to know which ones are copied in the next one
+        public = tuto.load_version(sha=published.sha_public, public=published)
+        for chapter in public.children:
+            with open(chapter.get_prod_path(), 'a') as html_file:
+                html_file.write('<!-- previous publication -->')
+
+        # only the second chapter changes
+        extract2.repo_update(extract2.title, u'Un texte corrigé')
+        published = publish_content(tuto, tuto_draft, is_major_update=False)
+
+        public = tuto.load_version(sha=published.sha_public, public=published)
+        with open(public.children[0].get_prod_path()) as html_file:
+            self.assertIn('<!-- previous publication -->', html_file.read())
+        with open(public.children[1].get_prod_path()) as html_file:
+            html = html_file.read()
+            self.assertNotIn('<!-- previous publication -->', html)
+            self.assertIn('Un texte corrigé', html)
+
     def test_tagged_tree_extract(self):
         midsize = PublishableContentFactory(author_list=[self.user_author])
         midsize_draft = midsize.load_version()
@@ -377,6 +423,110 @@ class UtilsTests(TestCase):
         # finally, clean up:
         shutil.rmtree(tempdir)
 
+    def test_image_cache(self):
+        """the images which did not change since the previous export are retrieved from the image cache"""
+
+        images = {}
+        for path, image_format in [('/image.png', 'PNG'), ('/anim.gif', 'GIF')]:
+            image_data = StringIO()
+            ImagePIL.new('RGB', (4, 4)).save(image_data, image_format)
+            images[path] = image_data.getvalue()
+        requests = []
+
+        class ImageHandler(BaseHTTPRequestHandler):
+            """Serve the images, and answer "not modified" when asked for the current version of the PNG"""
+
+            def do_GET(self):
+                requests.append((self.path, self.headers.getheader('If-None-Match')))
+                if self.path == '/image.png' and self.headers.getheader('If-None-Match') == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                elif self.path in images:
+                    self.send_response(200)
+                    if self.path == '/image.png':
+                        self.send_header('ETag', '"v1"')
+                    self.end_headers()
+                    self.wfile.write(images[self.path])
+                else:
+                    self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), ImageHandler)
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+
+        base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+        md = '![a]({0}/image.png) ![b]({0}/anim.gif) ![c]({0}/missing.png)'.format(base_url)
+        new_md = '![a](images/image.png) ![b](images/anim.png) ![c](images/missing.png)'
+        tempdir = tempfile.mkdtemp()
+
+        try:
+            self.assertEqual(retrieve_and_update_images_links(md, tempdir), new_md)
+            for filename in ['image.png', 'anim.png', 'missing.png']:
+                self.assertTrue(os.path.isfile(os.path.join(tempdir, 'images', filename)))
+
+            # the PNG did not change, the GIF is downloaded again (no ETag) but is not converted again
+            other_dir = os.path.join(tempdir, 'other')
+            del requests[:]
+            with patch.object(ImageCache, 'store') as store:
+                self.assertEqual(retrieve_and_update_images_links(md, other_dir), new_md)
+                self.assertFalse(store.called)
+            self.assertIn(('/image.png', '"v1"'), requests)
+            for filename in ['image.png', 'anim.png', 'missing.png']:
+                self.assertTrue(os.path.isfile(os.path.join(other_dir, 'images', filename)))
+
+            # the least recently used files are removed when the cache is too big
+            ImageCache(max_size=0).evict()
+            cache_dir = settings.ZDS_APP['content']['image_cache_dir']
+            self.assertEqual(os.listdir(os.path.join(cache_dir, 'images')), [])
+            self.assertEqual(os.listdir(os.path.join(cache_dir, 'urls')), [])
+        finally:
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(tempdir)
+
+    def test_archive_cache(self):
+        """the zip archive of a version is built from git once, then taken from the cache"""
+
+        tuto = PublishableContent.objects.get(pk=self.tuto.pk)
+        repository = tuto.load_version().repository
+        sha = tuto.sha_draft
+        archive = ''.join(iter_archive(self.tuto.pk, repository, sha))
+        self.assertTrue(os.path.isfile(get_archive_path(self.tuto.pk, sha)))
+
+        zip_file = zipfile.ZipFile(StringIO(archive))
+        self.assertIsNone(zip_file.testzip())
+        self.assertIn('manifest.json', zip_file.namelist())
+
+        with patch('zds.tutorialv2.archive.iter_zip') as iter_zip:
+            self.assertEqual(''.join(iter_archive(self.tuto.pk, repository, sha)), archive)
+            self.assertFalse(iter_zip.called)
+
+    def test_manifest_summaries(self):
+        """the summary of a manifest counts the parts, chapters and extracts, without building the tree"""
+
+        ExtractFactory(container=self.chapter1, db_object=self.tuto)
+        ExtractFactory(container=self.chapter1, db_object=self.tuto)
+        tuto = PublishableContent.objects.get(pk=self.tuto.pk)
+
+        summaries = load_manifest_summaries([(tuto, tuto.sha_draft), (tuto, None)])
+        self.assertEqual([(tuto.pk, tuto.sha_draft)], summaries.keys())
+        summary = summaries[tuto.pk, tuto.sha_draft]
+        self.assertEqual(tuto.title, summary['title'])
+        self.assertEqual('TUTORIAL', summary['type'])
+        self.assertEqual((1, 1, 2), (summary['part_count'], summary['chapter_count'], summary['extract_count']))
+
+        # former manifests
+        summary = get_manifest_summary({
+            'title': u'Big', 'type': 'BIG',
+            'parts': [{'pk': 1, 'title': u'Part', 'chapters': [
+                {'pk': 1, 'title': u'Chapter', 'extracts': [{'pk': 1, 'title': u'Extract'}]}]}]})
+        self.assertEqual((1, 1, 1), (summary['part_count'], summary['chapter_count'], summary['extract_count']))
+        self.assertEqual('ARTICLE', get_manifest_summary({'title': u'Article', 'type': 'article'})['type'])
+
     def test_generate_pdf(self):
         """ensure the behavior of the `python manage.py generate_pdf` commmand"""
 
@@ -544,30 +694,70 @@ class UtilsTests(TestCase):
         too_damn_long_slug = 'a' * (settings.ZDS_APP['content']['maximum_slug_size'] + 1)
         self.assertFalse(check_slug(too_damn_long_slug))
 
-    def test_watchdog(self):
+    def test_unknown_extra_content_generation_policy(self):
+        """an unknown policy (as the former "WATCHDOG") stops the publication instead of ignoring the extra contents"""
+
+        settings.ZDS_APP['content']['extra_content_generation_policy'] = 'WATCHDOG'
+        article = PublishableContentFactory(type='ARTICLE', author_list=[self.user_author])
+        versioned = article.load_version()
+        with self.assertRaises(ImproperlyConfigured):
+            publish_content(article, versioned)
+        self.assertIsNone(PublishableContent.objects.get(pk=article.pk).public_version)
 
+    def test_publication_jobs(self):
+        """the extra contents are generated by the jobs of the queue, and the job of an old version is abandoned"""
+
+        settings.ZDS_APP['content']['extra_content_generation_policy'] = 'QUEUE'
         PublicatorRegistery.unregister("pdf")
         PublicatorRegistery.unregister("epub")
         PublicatorRegistery.unregister("html")
 
-        with open("path", "w") as f:
-            f.write("my_content;/path/to/markdown.md")
+        @PublicatorRegistery.register("txt")
+        class TextPublicator(Publicator):
+            fail = False
 
-        @PublicatorRegistery.register("test", "", "")
-        class TestPublicator(Publicator):
-            def __init__(self, *__):
-                pass
+            def publish(self, md_file_path, base_name, **kwargs):
+                if not self.fail:
+                    shutil.copy(md_file_path, base_name + '.txt')
 
-        PublicatorRegistery.get("test").publish = Mock()
-        event = FileCreatedEvent("path")
-        handler = TutorialIsPublished()
-        handler.prepare_generation = Mock()
-        handler.finish_generation = Mock()
-        handler.on_created(event)
+        article = PublishableContentFactory(type='ARTICLE', author_list=[self.user_author])
+        article_draft = article.load_version()
+        ExtractFactory(container=article_draft, db_object=article)
+        article = PublishableContent.objects.get(pk=article.pk)
+        published = publish_content(article, article_draft)
 
-        self.assertTrue(PublicatorRegistery.get("test").publish.called)
-        handler.finish_generation.assert_called_with("/path/to", "path")
-        handler.prepare_generation.assert_called_with("/path/to")
+        job = PublicationJob.objects.get(published_content=published)
+        self.assertEqual(job.format, 'txt')
+        self.assertEqual(job.state, 'PENDING')
+        self.assertEqual(job.sha, published.sha_public)
+        txt_path = os.path.join(published.get_extra_contents_directory(), published.content_public_slug + '.txt')
+        self.assertFalse(os.path.isfile(txt_path))
+
+        # the generation fails: tried again later
+        PublicatorRegistery.get("txt").fail = True
+        job = claim_publication_job()
+        self.assertEqual(run_publication_job(job), 'PENDING')
+        job = PublicationJob.objects.get(pk=job.pk)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt, datetime.datetime.now())
+        self.assertNotEqual(job.last_error, '')
+        self.assertIsNone(claim_publication_job())
+
+        # ... and succeeds
+        PublicatorRegistery.get("txt").fail = False
+        PublicationJob.objects.filter(pk=job.pk).update(next_attempt=datetime.datetime.now())
+        job = claim_publication_job()
+        self.assertEqual(run_publication_job(job), 'SUCCESS')
+        self.assertTrue(os.path.isfile(txt_path))
+        self.assertEqual(published.get_extra_contents_states(), {'txt': 'SUCCESS'})
+        self.assertIsNone(claim_publication_job())
+
+        # a newer version is published before the job runs
+        queue_extra_contents(published)
+        job = claim_publication_job()
+        PublishedContent.objects.filter(pk=published.pk).update(sha_public='0' * 40)
+        self.assertEqual(run_publication_job(job), 'STALE')
+        self.assertEqual(PublicationJob.objects.get(pk=job.pk).state, 'STALE')
 
     def tearDown(self):
         if os.path.isdir(settings.ZDS_APP['content']['repo_private_path']):
@@ -576,8 +766,11 @@ class UtilsTests(TestCase):
             shutil.rmtree(settings.ZDS_APP['content']['repo_public_path'])
         if os.path.isdir(settings.MEDIA_ROOT):
             shutil.rmtree(settings.MEDIA_ROOT)
-        if os.path.isdir(settings.ZDS_APP['content']['extra_content_watchdog_dir']):
-            shutil.rmtree(settings.ZDS_APP['content']['extra_content_watchdog_dir'])
+        if os.path.isdir(settings.ZDS_APP['content']['image_cache_dir']):
+            shutil.rmtree(settings.ZDS_APP['content']['image_cache_dir'])
+        if os.path.isdir(settings.ZDS_APP['content']['archive_cache_dir']):
+            shutil.rmtree(settings.ZDS_APP['content']['archive_cache_dir'])
         # re-active PDF build
         settings.ZDS_APP['content']['build_pdf_when_published'] = True
+        settings.ZDS_APP['content']['extra_content_generation_policy'] = 'SYNC'
         PublicatorRegistery.registry = self.old_registry
@@ -43,6 +43,7 @@ except ImportError:
 overrided_zds_app = settings.ZDS_APP
 overrided_zds_app['content']['repo_private_path'] = os.path.join(BASE_DIR, 'contents-private-test')
 overrided_zds_app['content']['repo_public_path'] = os.path.join(BASE_DIR, 'contents-public-test')
+overrided_zds_app['content']['archive_cache_dir'] = os.path.join(BASE_DIR, 'archive-cache-test')
 overrided_zds_app['content']['extra_content_generation_policy'] = "SYNC"
 
 
@@ -1238,7 +1239,7 @@ class ContentTests(TestCase):
         self.assertEqual(result.status_code, 200)
         draft_zip_path = os.path.join(tempfile.gettempdir(), '__draft1.zip')
         f = open(draft_zip_path, 'w')
-        f.write(result.content)
+        f.write(''.join(result.streaming_content))
         f.close()
 
         versioned = PublishableContent.objects.get(pk=tuto_pk).load_version()
@@ -1292,7 +1293,7 @@ class ContentTests(TestCase):
         self.assertEqual(result.status_code, 200)
         draft_zip_path_2 = os.path.join(tempfile.gettempdir(), '__draft2.zip')
         f = open(draft_zip_path_2, 'w')
-        f.write(result.content)
+        f.write(''.join(result.streaming_content))
         f.close()
 
         versioned = PublishableContent.objects.get(pk=tuto_pk).load_version()
@@ -1320,7 +1321,7 @@ class ContentTests(TestCase):
         self.assertEqual(result.status_code, 200)
         draft_zip_path_3 = os.path.join(tempfile.gettempdir(), '__draft3.zip')
         f = open(draft_zip_path_3, 'w')
-        f.write(result.content)
+        f.write(''.join(result.streaming_content))
         f.close()
 
         archive = zipfile.ZipFile(draft_zip_path_3, 'r')
@@ -1413,7 +1414,7 @@ class ContentTests(TestCase):
         self.assertEqual(result.status_code, 200)
         draft_zip_path = os.path.join(tempfile.gettempdir(), '__draft1.zip')
         f = open(draft_zip_path, 'w')
-        f.write(result.content)
+        f.write(''.join(result.streaming_content))
         f.close()
 
         first_version = PublishableContent.objects.get(pk=tuto_pk).load_version()
@@ -1534,7 +1535,7 @@ class ContentTests(TestCase):
         self.assertEqual(result.status_code, 200)
         draft_zip_path = os.path.join(tempfile.gettempdir(), '__draft1.zip')
         f = open(draft_zip_path, 'w')
-        f.write(result.content)
+        f.write(''.join(result.streaming_content))
         f.close()
 
         first_version = PublishableContent.objects.get(pk=tuto_pk).load_version()
@@ -1648,7 +1649,7 @@ class ContentTests(TestCase):
         self.assertEqual(result.status_code, 200)
         draft_zip_path = os.path.join(tempfile.gettempdir(), '__draft1.zip')
         f = open(draft_zip_path, 'w')
-        f.write(result.content)
+        f.write(''.join(result.streaming_content))
         f.close()
 
         # create the archive with images:
@@ -3633,6 +3634,8 @@ class ContentTests(TestCase):
             shutil.rmtree(settings.ZDS_APP['content']['repo_private_path'])
         if os.path.isdir(settings.ZDS_APP['content']['repo_public_path']):
             shutil.rmtree(settings.ZDS_APP['content']['repo_public_path'])
+        if os.path.isdir(settings.ZDS_APP['content']['archive_cache_dir']):
+            shutil.rmtree(settings.ZDS_APP['content']['archive_cache_dir'])
         if os.path.isdir(settings.MEDIA_ROOT):
             shutil.rmtree(settings.MEDIA_ROOT)
 
@@ -5087,6 +5090,14 @@ class PublishedContentTests(TestCase):
         self.assertEqual(result.context['previous_article'].pk, article1.public_version.pk)
         self.assertIsNone(result.context['next_article'])
 
+        # two queries, whatever the number of articles (the titles are fetched with the articles)
+        article3 = PublishedContentFactory(type="ARTICLE")
+        published = PublishedContent.objects.get(pk=article2.public_version.pk)
+        with self.assertNumQueries(2):
+            previous_article, next_article = PublishedContent.objects.get_previous_and_next_articles(published)
+            self.assertEqual((article1.title, article3.title),
+                             (previous_article.content.title, next_article.content.title))
+
     def test_validation_list_has_good_title(self):
         # aka fix 3172
         tuto = PublishableContentFactory(author_list=[self.user_author], type="TUTORIAL")
@@ -5144,6 +5155,8 @@ class PublishedContentTests(TestCase):
             shutil.rmtree(settings.ZDS_APP['content']['repo_private_path'])
         if os.path.isdir(settings.ZDS_APP['content']['repo_public_path']):
             shutil.rmtree(settings.ZDS_APP['content']['repo_public_path'])
+        if os.path.isdir(settings.ZDS_APP['content']['archive_cache_dir']):
+            shutil.rmtree(settings.ZDS_APP['content']['archive_cache_dir'])
         if os.path.isdir(settings.MEDIA_ROOT):
             shutil.rmtree(settings.MEDIA_ROOT)
 
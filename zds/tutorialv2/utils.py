@@ -3,10 +3,8 @@ import os
 import shutil
 from collections import OrderedDict
 from datetime import datetime
-from urllib import urlretrieve
 from urlparse import urlparse
 
-import cairosvg
 from PIL import Image as ImagePIL
 from django.http import Http404
 from django.utils.translation import ugettext_lazy as _
@@ -19,7 +17,9 @@ from zds.member.models import User
 from zds.tutorialv2 import REPLACE_IMAGE_PATTERN, VALID_SLUG
 from zds.utils import get_current_user
 from zds.utils import slugify as old_slugify
+from zds.utils.misc import upsert
 from zds.utils.models import Licence
+from zds.utils.signals import content_read
 
 
 def all_is_string_appart_from_children(dict_representation):
@@ -149,21 +149,15 @@ def mark_read(content, user=None):
     :param user: user that read the content, if ``None`` will use currrent user
     """
 
-    from zds.tutorialv2.models.models_database import ContentRead
+    from zds.tutorialv2.models.models_database import ContentRead, PublishableContent
 
     if not user:
         user = get_current_user()
 
     if user and user.is_authenticated():
         if content.last_note is not None:
-            ContentRead.objects.filter(
-                content__pk=content.pk,
-                user__pk=user.pk).delete()
-            a = ContentRead(
-                note=content.last_note,
-                content=content,
-                user=user)
-            a.save()
+            upsert(ContentRead, {'content_id': content.pk, 'user_id': user.pk}, {'note_id': content.last_note_id})
+            content_read.send(sender=PublishableContent, instance=content, user=user)
 
 
 class TooDeepContainerError(ValueError):
@@ -279,13 +273,15 @@ def get_target_tagged_tree_for_container(movable_child, root, bias=-1):
     return target_tagged_tree
 
 
-def retrieve_image(url, directory):
-    """For a given image, retrieve it, transform it into PNG (if needed) and store it
+def retrieve_image(url, directory, cached_image):
+    """For a given image, retrieved and transformed into PNG (if needed) by the image cache, store it
 
     :param url: URL of the image (either local or online)
     :type url: str
     :param directory: place where the image will be stored
     :type directory: str
+    :param cached_image: result of `ImageCache.fetch()` for this image, `None` if it cannot be retrieved
+    :type cached_image: tuple
     :return: the "transformed" path to the image
     :rtype: str
     """
@@ -314,42 +310,17 @@ def retrieve_image(url, directory):
         img_filename += "_" + str(datetime.now().microsecond)
         new_url = os.path.join('images', img_filename.replace(' ', '_') + '.' + img_extension)
         new_url_as_png = os.path.join('images', img_filename.replace(' ', '_') + '.png')
-        store_path = os.path.abspath(os.path.join(directory, new_url))
 
     try:
-        if parsed_url.scheme in ["http", "https", "ftp"] \
-                or parsed_url.netloc[:3] == "www" or parsed_url.path[:3] == "www":
-            urlretrieve(url, store_path)  # download online image
-        else:  # it's a local image, coming from a gallery
-
-            if url[0] == '/':  # because `os.path.join()` think it's an absolute path if it start with `/`
-                url = url[1:]
+        if cached_image is None:
+            raise IOError(url)  # HTTP 404, image does not exists, or Pillow cannot read it !
 
-            source_path = os.path.join(settings.BASE_DIR, url)
-            if os.path.isfile(source_path):
-                shutil.copy(source_path, store_path)
-            else:
-                raise IOError(source_path)  # ... will use the default image instead
-
-        if img_extension == "svg":  # if SVG, will transform it into PNG
-            resize_svg(store_path)
+        cached_path, as_png = cached_image
+        if as_png:
             new_url = new_url_as_png
-            cairosvg.svg2png(url=store_path, write_to=os.path.join(directory, new_url))
-            os.remove(store_path)
-        else:
-            img = ImagePIL.open(store_path)
-            if img_extension == "gif" or img_extension.strip() == '':
-                # if no extension or gif, will transform it into PNG !
-                new_url = new_url_as_png
-                img.save(os.path.join(directory, new_url))
-                os.remove(store_path)
-
-    except (IOError, KeyError):  # HTTP 404, image does not exists, or Pillow cannot read it !
-
-        # will be overwritten anyway, so it's better to remove whatever it was, for security reasons :
-        if os.path.exists(store_path):
-            os.remove(store_path)
+        shutil.copy(cached_path, os.path.join(directory, new_url))
 
+    except IOError:
         img = ImagePIL.open(settings.ZDS_APP['content']['default_image'])
         new_url = new_url_as_png
         img.save(os.path.join(directory, new_url))
@@ -409,7 +380,8 @@ def retrieve_image_and_update_link(group, previous_urls, directory='.'):
 
     # look for image URL, and make it if needed
     if url not in previous_urls:
-        new_url = retrieve_image(url, directory=directory)
+        from zds.tutorialv2.image_cache import ImageCache
+        new_url = retrieve_image(url, directory, ImageCache().fetch_or_none(url))
         previous_urls[url] = new_url
 
     return start + txt + previous_urls[url] + end
@@ -431,7 +403,24 @@ def retrieve_and_update_images_links(md_text, directory='.'):
     if not os.path.isdir(image_directory_path):
         os.makedirs(image_directory_path)  # make the directory if needed
 
+    from zds.tutorialv2.image_cache import ImageCache
+
+    # first, get all the images at once (from the cache, or concurrently from their servers) ...
+    urls = []
+    for match in REPLACE_IMAGE_PATTERN.finditer(md_text):
+        if match.group('url') not in urls:
+            urls.append(match.group('url'))
+
+    image_cache = ImageCache()
+    cached_images = image_cache.fetch_all(urls)
+
+    # ... then name them, in the order of the text
     previous_urls = {}
+    for url in urls:
+        previous_urls[url] = retrieve_image(url, directory, cached_images[url])
+
+    image_cache.evict()
+
     new_text = REPLACE_IMAGE_PATTERN.sub(
         lambda g: retrieve_image_and_update_link(g, previous_urls, directory), md_text)
 
@@ -652,6 +641,55 @@ def slugify_raise_on_invalid(title, use_old_slugify=False):
     return slug
 
 
+def get_manifest_summary(json):
+    """Summarize a manifest, without building the tree of the content: only its title, description and type, and the
+    number of its parts (containers of containers), chapters (the other containers) and extracts.
+
+    :param json: JSON data from a `manifest.json` file
+    :return: the summary, with the keys ``title``, ``description``, ``type``, ``part_count``, ``chapter_count`` and \
+    ``extract_count``
+    :rtype: dict
+    """
+
+    summary = {
+        'title': json['title'],
+        'description': json.get('description', u''),
+        'part_count': 0,
+        'chapter_count': 0,
+        'extract_count': 0,
+    }
+
+    if 'version' in json and json['version'] == 2:
+        summary['type'] = json['type'] if json.get('type') in ('ARTICLE', 'TUTORIAL') else 'TUTORIAL'
+
+        def count_children(json_sub):
+            children = json_sub.get('children', [])
+            containers = [child for child in children if child.get('object') == 'container']
+            summary['extract_count'] += len(children) - len(containers)
+            for container in containers:
+                if any(child.get('object') == 'container' for child in container.get('children', [])):
+                    summary['part_count'] += 1
+                else:
+                    summary['chapter_count'] += 1
+                count_children(container)
+
+        count_children(json)
+    else:  # version 1.0, as read by `get_content_from_json()`
+        summary['type'] = 'TUTORIAL' if json.get('type', 'article') != 'article' else 'ARTICLE'
+        if summary['type'] == 'ARTICLE':
+            summary['extract_count'] = 1
+        elif json['type'] == 'MINI':
+            summary['extract_count'] = len(json.get('chapter', {}).get('extracts', []))
+        elif json['type'] == 'BIG':
+            for part in json.get('parts', []):
+                summary['part_count'] += 1
+                for chapter in part.get('chapters', []):
+                    summary['chapter_count'] += 1
+                    summary['extract_count'] += len(chapter.get('extracts', []))
+
+    return summary
+
+
 def fill_containers_from_json(json_sub, parent):
     """Function which call itself to fill container
 
@@ -878,23 +916,39 @@ def get_blob(tree, path):
     :return: contains
     :rtype: bytearray
     """
-    # get all extracts
-    for blob in tree.blobs:
-        try:
-            if os.path.abspath(blob.path) == os.path.abspath(path):
-                data = blob.data_stream.read()
-                return data
-        except (OSError, IOError):  # in case of deleted files, or the system cannot get the lock, juste return ""
-            return ""
-    # traverse directories when we are at root or in a part or chapter
-    if len(tree.trees) > 0:
-        for subtree in tree.trees:
-            result = get_blob(subtree, path)
-            if result is not None:
-                return result
+    # direct lookup, each directory of the path is read once
+    try:
+        blob = tree[os.path.normpath(path)]
+    except KeyError:
         return None
-    else:
+    if blob.type != 'blob':
         return None
+    return read_blob(blob)
+
+
+def read_blob(blob):
+    """Return the data contained into a given git blob
+
+    :param blob: Git Blob object
+    :type blob: git.objects.blob.Blob
+    :return: contains
+    :rtype: bytearray
+    """
+    try:
+        return blob.data_stream.read()
+    except (OSError, IOError):  # in case of deleted files, or the system cannot get the lock, juste return ""
+        return ""
+
+
+def get_blob_index(tree):
+    """Index all the files of a git tree by path, in a single traversal of the tree
+
+    :param tree: Git Tree object
+    :type tree: git.objects.tree.Tree
+    :return: the blobs, by normalized path
+    :rtype: dict
+    """
+    return {os.path.normpath(item.path): item for item in tree.traverse() if item.type == 'blob'}
 
 
 class BadArchiveError(Exception):
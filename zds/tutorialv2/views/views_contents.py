@@ -33,6 +33,7 @@ from zds.member.models import Profile
 from zds.tutorialv2.forms import ContentForm, JsFiddleActivationForm, AskValidationForm, AcceptValidationForm, \
     RejectValidationForm, RevokeValidationForm, WarnTypoForm, ImportContentForm, ImportNewContentForm, ContainerForm, \
     ExtractForm, BetaForm, MoveElementForm, AuthorForm, CancelValidationForm
+from zds.tutorialv2.archive import iter_archive
 from zds.tutorialv2.mixins import SingleContentDetailViewMixin, SingleContentFormViewMixin, SingleContentViewMixin, \
     SingleContentDownloadViewMixin, SingleContentPostMixin
 from zds.tutorialv2.models import TYPE_CHOICES_DICT
@@ -391,38 +392,14 @@ class DownloadContent(LoggedWithReadWriteHability, SingleContentDownloadViewMixi
     only_draft_version = False  # beta version can also be downloaded
     must_be_author = False  # other user can download archive
 
-    @staticmethod
-    def insert_into_zip(zip_file, git_tree):
-        """Recursively add file into zip
-
-        :param zip_file: a ``zipfile`` object (with writing permissions)
-        :param git_tree: Git tree (from ``repository.commit(sha).tree``)
-        """
-        for blob in git_tree.blobs:  # first, add files :
-            zip_file.writestr(blob.path, blob.data_stream.read())
-        if len(git_tree.trees) is not 0:  # then, recursively add dirs :
-            for subtree in git_tree.trees:
-                DownloadContent.insert_into_zip(zip_file, subtree)
-
     def get_contents(self):
-        """get the zip file stream
+        """get the zip file stream, built from git (or taken from the cache of the archives)
 
-        :return: a zip file
-        :rtype: byte
+        :return: the chunks of the zip file
+        :rtype: iterator
         """
         versioned = self.versioned_object
-
-        # create and fill zip
-        path = self.object.get_repo_path()
-        zip_path = path + self.get_filename()
-        zip_file = zipfile.ZipFile(zip_path, 'w')
-        self.insert_into_zip(zip_file, versioned.repository.commit(versioned.current_version).tree)
-        zip_file.close()
-
-        # return content
-        response = open(zip_path, "rb").read()
-        os.remove(zip_path)
-        return response
+        return iter_archive(self.object.pk, versioned.repository, versioned.current_version)
 
     def get_filename(self):
         return self.get_object().slug + '.zip'
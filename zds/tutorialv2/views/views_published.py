@@ -17,13 +17,15 @@ import os
 from zds.member.decorator import LoggedWithReadWriteHability, LoginRequiredMixin, PermissionRequiredMixin
 from zds.member.views import get_client_ip
 from zds.tutorialv2.forms import RevokeValidationForm, WarnTypoForm, NoteForm, NoteEditForm
+from zds.tutorialv2.archive import iter_file
 from zds.tutorialv2.mixins import SingleOnlineContentDetailViewMixin, SingleOnlineContentViewMixin, DownloadViewMixin, \
     ContentTypeMixin, SingleOnlineContentFormViewMixin, MustRedirect
 from zds.tutorialv2.models.models_database import PublishableContent, PublishedContent, ContentReaction
 from zds.tutorialv2.utils import search_container_or_404, mark_read, last_participation_is_old
 from zds.utils.models import CommentDislike, CommentLike, SubCategory, Alert
 from zds.utils.mps import send_mp
-from zds.utils.paginator import make_pagination, ZdSPagingListView
+from zds.utils.paginator import make_pagination, ZdSPagingListView, PositionPaginator
+from zds.utils.signals import new_message
 from zds.utils.templatetags.topbar import top_categories_content
 from django.db.models import F
 
@@ -75,36 +77,24 @@ class DisplayOnlineContent(SingleOnlineContentDetailViewMixin):
         # pagination of articles
         context['paginate_articles'] = False
 
-        if self.object.type == 'ARTICLE':
-            # fetch all articles in order to find the previous and the next one
-            all_articles = \
-                [a for a in PublishedContent.objects
-                    .filter(content_type="ARTICLE", must_redirect=False)
-                    .order_by('publication_date')
-                    .all()]
-            articles_count = len(all_articles)
-
-            try:
-                position = all_articles.index(self.public_content_object)
-            except ValueError:
-                pass  # for an unknown reason, the article is not in the list. This should not happen
-            else:
-                context['paginate_articles'] = True
-                context['previous_article'] = None
-                context['next_article'] = None
-
-                if position > 0:
-                    context['previous_article'] = all_articles[position - 1]
-                if position < articles_count - 1:
-                    context['next_article'] = all_articles[position + 1]
+        published = self.public_content_object
+        if self.object.type == 'ARTICLE' and not published.must_redirect and published.publication_date is not None:
+            context['paginate_articles'] = True
+            context['previous_article'], context['next_article'] = \
+                PublishedContent.objects.get_previous_and_next_articles(published)
 
         # pagination of comments
+        # (the page of a reaction is given by its position, see `ContentReaction.get_absolute_url()`)
+        last_position = self.object.last_note.position if self.object.last_note else None
         make_pagination(context,
                         self.request,
                         queryset_reactions,
                         settings.ZDS_APP['content']['notes_per_page'],
                         context_list_name='reactions',
-                        with_previous_item=True)
+                        with_previous_item=True,
+                        paginator=PositionPaginator(queryset_reactions,
+                                                    settings.ZDS_APP['content']['notes_per_page'],
+                                                    last_position=last_position))
 
         # is JS activated ?
         context["is_js"] = True
@@ -209,11 +199,11 @@ class DownloadOnlineContent(SingleOnlineContentViewMixin, DownloadViewMixin):
     def get_contents(self):
         path = os.path.join(self.public_content_object.get_extra_contents_directory(), self.get_filename())
         try:
-            response = open(path, 'rb').read()
+            extra_content = open(path, 'rb')
         except IOError:
             raise Http404(_(u"Le fichier n'existe pas."))
 
-        return response
+        return iter_file(extra_content)
 
 
 class DownloadOnlineArticle(DownloadOnlineContent):
@@ -454,6 +444,7 @@ class SendNoteFormView(LoggedWithReadWriteHability, SingleOnlineContentFormViewM
         if is_new:  # we first need to save the reaction
             self.object.last_note = self.reaction
             self.object.save()
+            new_message.send(sender=ContentReaction, message=self.reaction)
             mark_read(self.object)
 
         self.success_url = self.reaction.get_absolute_url()
@@ -10,30 +10,33 @@ from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _
-from django.views.generic import ListView, FormView
+from django.views.generic import FormView
 from zds.member.decorator import LoginRequiredMixin, PermissionRequiredMixin, LoggedWithReadWriteHability
 from zds.tutorialv2.forms import AskValidationForm, RejectValidationForm, AcceptValidationForm, RevokeValidationForm, \
     CancelValidationForm
 from zds.tutorialv2.mixins import SingleContentFormViewMixin, SingleContentDetailViewMixin, ModalFormView
-from zds.tutorialv2.models.models_database import Validation, PublishableContent, ContentRead
+from zds.tutorialv2.models.models_database import Validation, PublishableContent, ContentRead, \
+    load_manifest_summaries
 from zds.tutorialv2.publication_utils import publish_content, FailureDuringPublication, unpublish_content
 from zds.utils.models import SubCategory
+from zds.utils.paginator import ZdSPagingListView
 from zds.utils.mps import send_mp
 
 
-class ValidationListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
-    """List the validations, with possibilities of filters"""
+class ValidationListView(LoginRequiredMixin, PermissionRequiredMixin, ZdSPagingListView):
+    """List the validations, paginated, with filters on the status, the type and the subcategory (which can be used
+    together)"""
 
     permissions = ["tutorialv2.change_validation"]
     context_object_name = "validations"
     template_name = "tutorialv2/validation/index.html"
+    paginate_by = settings.ZDS_APP['content']['validations_per_page']
     subcategory = None
+    status = None
+    type = None
 
     def get_queryset(self):
 
-        # TODO: many filter at the same time ?
-        # TODO: paginate ?
-
         queryset = Validation.objects\
             .prefetch_related("validator")\
             .prefetch_related("content")\
@@ -41,27 +44,32 @@ class ValidationListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
             .prefetch_related("content__subcategory")\
             .filter(Q(status="PENDING") | Q(status="PENDING_V"))
 
+        self.status = self.request.GET.get("status")
+        self.type = self.request.GET.get("type")
+        if self.type in ["orphan", "reserved"]:  # former filters, when only one filter could be used
+            self.status, self.type = self.type, None
+
+        # filtering by status
+        if self.status == "orphan":
+            queryset = queryset.filter(
+                validator__isnull=True,
+                status="PENDING")
+        elif self.status == "reserved":
+            queryset = queryset.filter(
+                validator__isnull=False,
+                status="PENDING_V")
+        else:
+            self.status = None
+
         # filtering by type
-        try:
-            type_ = self.request.GET["type"]
-            if type_ == "orphan":
-                queryset = queryset.filter(
-                    validator__isnull=True,
-                    status="PENDING")
-            if type_ == "reserved":
-                queryset = queryset.filter(
-                    validator__isnull=False,
-                    status="PENDING_V")
-            if type_ == "article":
-                queryset = queryset.filter(
-                    content__type="ARTICLE")
-            if type_ == "tuto":
-                queryset = queryset.filter(
-                    content__type="TUTORIAL")
-            else:
-                raise KeyError()
-        except KeyError:
-            pass
+        if self.type == "article":
+            queryset = queryset.filter(
+                content__type="ARTICLE")
+        elif self.type == "tuto":
+            queryset = queryset.filter(
+                content__type="TUTORIAL")
+        else:
+            self.type = None
 
         # filtering by category
         try:
@@ -73,14 +81,22 @@ class ValidationListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         except ValueError:
             raise Http404(_(u"Format invalide pour le paramètre de la sous-catégorie."))
 
-        return queryset.order_by("date_proposition").all()
+        return queryset.order_by("date_proposition", "pk").all()
 
     def get_context_data(self, **kwargs):
         context = super(ValidationListView, self).get_context_data(**kwargs)
-        for validation in context["validations"]:
-            validation.versioned_content = validation.content.load_version(sha=validation.content.sha_validation)
 
-        context['category'] = self.subcategory
+        # only the summaries of the manifests are needed, not the whole contents
+        validations = list(context["validations"])
+        summaries = load_manifest_summaries([(validation.content, validation.content.sha_validation)
+                                             for validation in validations])
+        for validation in validations:
+            validation.summary = summaries.get((validation.content.pk, validation.content.sha_validation))
+
+        context["validations"] = validations
+        context["category"] = self.subcategory
+        context["status"] = self.status
+        context["type"] = self.type
         return context
 
 
@@ -84,6 +84,7 @@ urlpatterns = patterns('',
                        url('', include('django.contrib.auth.urls', namespace='auth')),
                        ('^munin/', include('munin.urls')),
 
+                       url(r'^version/$', 'zds.pages.views.version'),
                        url(r'^$', 'zds.pages.views.home'),
 
                        ) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
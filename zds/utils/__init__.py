@@ -2,6 +2,7 @@
 
 from django.template import defaultfilters
 
+default_app_config = 'zds.utils.apps.UtilsConfig'
 
 try:
     from threading import local
@@ -0,0 +1,11 @@
+# coding: utf-8
+
+from django.apps import AppConfig
+
+
+class UtilsConfig(AppConfig):
+    name = 'zds.utils'
+
+    def ready(self):
+        # connect the receivers invalidating the notifications cache
+        import zds.utils.notifications  # noqa
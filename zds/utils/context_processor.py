@@ -1,22 +1,76 @@
 # coding: utf-8
 
+import json
+import os
+
 from django.conf import settings
 
-from git import Repo
+from git import Repo, InvalidGitRepositoryError, NoSuchPathError
 
+# The version of the site does not change while a process is running: it is computed on the first call to
+# `get_git_version()`, from the file written at deployment by `python manage.py write_version_file` if any, or else
+# from the repository.
+_git_version = None
 
-def get_git_version():
+
+def read_git_version():
     """
-    Get the git version of the site.
+    Read the git version of the site from the repository.
+
+    :return: the branch and the sha of the commit, as a dictionary (`None` if they cannot be read)
+    :rtype: dict
     """
     try:
         repo = Repo(settings.BASE_DIR)
-        branch = repo.active_branch
-        commit = repo.head.commit.hexsha
-        name = u'{0}/{1}'.format(branch, commit[:7])
-        return {'name': name, 'url': u'{}/tree/{}'.format(settings.ZDS_APP['site']['repository'], commit)}
-    except (KeyError, TypeError):
-        return {'name': '', 'url': ''}
+        return {'branch': repo.active_branch.name, 'commit': repo.head.commit.hexsha}
+    except (KeyError, TypeError, ValueError, InvalidGitRepositoryError, NoSuchPathError):
+        return None
+
+
+def write_version_file():
+    """
+    Write the git version of the site in `ZDS_APP['site']['version_file']`, so that the processes do not need to read
+    the repository.
+
+    :return: the version written (`None` if it cannot be read, and then the former file is removed)
+    :rtype: dict
+    """
+    path = settings.ZDS_APP['site']['version_file']
+    version = read_git_version()
+    if version is not None:
+        with open(path, 'w') as version_file:
+            json.dump(version, version_file)
+    elif os.path.exists(path):
+        # the version of a former deployment must not be shown instead
+        os.remove(path)
+    return version
+
+
+def get_git_version():
+    """
+    Get the git version of the site.
+
+    :return: the name (branch and short sha), the URL, the branch and the sha of the version, as a dictionary
+    :rtype: dict
+    """
+    global _git_version
+    if _git_version is None:
+        try:
+            with open(settings.ZDS_APP['site']['version_file']) as version_file:
+                version = json.load(version_file)
+        except (IOError, ValueError):
+            version = read_git_version()
+
+        if version:
+            _git_version = {
+                'name': u'{0}/{1}'.format(version['branch'], version['commit'][:7]),
+                'url': u'{}/tree/{}'.format(settings.ZDS_APP['site']['repository'], version['commit']),
+                'branch': version['branch'],
+                'commit': version['commit'],
+            }
+        else:
+            _git_version = {'name': '', 'url': '', 'branch': '', 'commit': ''}
+    return _git_version
 
 
 def git_version(request):
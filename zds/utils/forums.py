@@ -3,10 +3,9 @@
 import json
 
 from datetime import datetime
-from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
 from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, render_to_response
-from django.template.loader import render_to_string
 from django.utils.translation import ugettext as _
 from django.views.generic import CreateView
 from django.views.generic.detail import SingleObjectMixin
@@ -15,6 +14,8 @@ from zds import settings
 from zds.forum.models import Topic, Post, follow, TopicRead
 from zds.member.views import get_client_ip
 from zds.utils.mixins import QuoteMixin
+from zds.utils.outbox import queue_email
+from zds.utils.signals import new_message
 
 
 def get_tag_by_title(title):
@@ -109,27 +110,24 @@ def send_post(request, topic, author, text, send_by_mail=False,):
     else:
         post.position = 1
     post.ip_address = get_client_ip(request)
-    post.save()
-
-    topic.last_message = post
-    topic.save()
-
-    # Send mail
+    # the counters of the topic and its forum are updated with the post (see `zds.forum.models.count_new_post()`)
+    with transaction.atomic():
+        post.save()
+        topic.last_message = post
+        topic.save()
+    new_message.send(sender=Post, message=post)
+
+    # Send mail, only to the followers who read the previous post (the others were already notified)
     if send_by_mail:
         subject = u"{} - {} : {}".format(settings.ZDS_APP['site']['litteral_name'], _(u'Forum'), topic.title)
-        from_email = "{} <{}>".format(settings.ZDS_APP['site']['litteral_name'],
-                                      settings.ZDS_APP['site']['email_noreply'])
+        followers = topic.get_followers_by_email().exclude(user=post.author)
+        readers = set(TopicRead.objects
+                      .filter(topic=topic, post__position=post.position - 1, user__in=followers.values('user'))
+                      .values_list('user__pk', flat=True))
 
-        followers = topic.get_followers_by_email()
         for follower in followers:
             receiver = follower.user
-            if receiver == post.author:
-                continue
-            last_read = TopicRead.objects.filter(
-                topic=topic,
-                post__position=post.position - 1,
-                user=receiver).count()
-            if last_read > 0:
+            if receiver.pk in readers:
                 context = {
                     'username': receiver.username,
                     'title': topic.title,
@@ -137,12 +135,7 @@ def send_post(request, topic, author, text, send_by_mail=False,):
                     'author': post.author.username,
                     'site_name': settings.ZDS_APP['site']['litteral_name']
                 }
-                message_html = render_to_string('email/forum/new_post.html', context)
-                message_txt = render_to_string('email/forum/new_post.txt', context)
-
-                msg = EmailMultiAlternatives(subject, message_txt, from_email, [receiver.email])
-                msg.attach_alternative(message_html, "text/html")
-                msg.send()
+                queue_email(receiver.email, subject, 'email/forum/new_post', context)
 
     # Follow topic on answering
     if not topic.is_followed(user=post.author):
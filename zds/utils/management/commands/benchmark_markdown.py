@@ -0,0 +1,104 @@
+# coding: utf-8
+
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zds.utils.templatetags.emarkdown import get_markdown_instance, render_markdown, acquire_markdown_instance, \
+    release_markdown_instance, invalidate_markdown_cache
+
+POST_TEXT = u"""Bonjour à tous :)
+
+J'ai un souci avec mon code, **impossible** de faire fonctionner la boucle suivante :
+
+```python
+for i in range(10):
+    print(i)
+```
+
+J'ai pourtant suivi [le tutoriel](http://zestedesavoir.com/tutoriels/) à la lettre ^^ :
+
+1. installer *Python* ;
+2. lancer l'interpréteur ;
+3. copier le code.
+
+> Une erreur est survenue
+Source: la console
+
+Merci d'avance !"""
+
+SIGNATURE_TEXT = u"**Membre** de [Zeste de Savoir](http://zestedesavoir.com) - *la connaissance pour tous* :D"
+
+
+class Command(BaseCommand):
+    help = 'Compare the cost of building a markdown parser to the cost of a conversion on a forum page.'
+    # python manage.py benchmark_markdown --posts=20 --rounds=10
+
+    option_list = BaseCommand.option_list + (
+        make_option('--posts',
+                    type='int',
+                    dest='posts',
+                    default=20,
+                    help='Number of posts (and signatures) displayed on the page.'),
+        make_option('--rounds',
+                    type='int',
+                    dest='rounds',
+                    default=10,
+                    help='Number of times the page is rendered.'),
+    )
+
+    def handle(self, *args, **options):
+        posts = options['posts']
+        rounds = options['rounds']
+
+        def page_with_new_parsers():
+            for _ in range(posts):
+                get_markdown_instance().convert(POST_TEXT)
+                get_markdown_instance(inline=True).convert(SIGNATURE_TEXT)
+
+        def convert_with_pool(text, inline=False):
+            markdown = acquire_markdown_instance(inline=inline)
+            markdown.convert(text)
+            release_markdown_instance(markdown, inline=inline)
+
+        def page_with_pool():
+            for _ in range(posts):
+                convert_with_pool(POST_TEXT)
+                convert_with_pool(SIGNATURE_TEXT, inline=True)
+
+        def page_with_cache():
+            for _ in range(posts):
+                render_markdown(POST_TEXT)
+                render_markdown(SIGNATURE_TEXT, inline=True)
+
+        def build_only():
+            for _ in range(posts):
+                get_markdown_instance()
+                get_markdown_instance(inline=True)
+
+        invalidate_markdown_cache()
+        build = self.measure(build_only, rounds)
+        fresh = self.measure(page_with_new_parsers, rounds)
+        pooled = self.measure(page_with_pool, rounds)
+        cached = self.measure(page_with_cache, rounds)
+
+        self.stdout.write(u'Page with {} posts and {} signatures, mean of {} rounds:'.format(posts, posts, rounds))
+        self.stdout.write(u'  parsers construction: {:8.2f} ms'.format(build))
+        self.stdout.write(u'  conversion:           {:8.2f} ms'.format(fresh - build))
+        self.stdout.write(u'  total, new parsers:   {:8.2f} ms'.format(fresh))
+        self.stdout.write(u'  total, pooled parsers:{:8.2f} ms'.format(pooled))
+        self.stdout.write(u'  total, render cache:  {:8.2f} ms'.format(cached))
+        if fresh:
+            self.stdout.write(u'  construction share:   {:8.1%}'.format(build / fresh))
+
+    @staticmethod
+    def measure(function, rounds):
+        """
+        :return: mean execution time of `function`, in milliseconds
+        :rtype: float
+        """
+        start = time.time()
+        for _ in range(rounds):
+            function()
+        return (time.time() - start) * 1000.0 / max(rounds, 1)
@@ -0,0 +1,14 @@
+# coding: utf-8
+
+from django.core.management.base import BaseCommand
+
+from zds.utils.templatetags.emarkdown import invalidate_markdown_cache
+
+
+class Command(BaseCommand):
+    help = 'Invalidate the html rendered from markdown in every process (for instance after a ZMarkdown upgrade).'
+    # python manage.py invalidate_markdown_cache
+
+    def handle(self, *args, **options):
+        invalidate_markdown_cache()
+        self.stdout.write(u'Markdown rendering cache invalidated.')
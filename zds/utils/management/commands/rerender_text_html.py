@@ -0,0 +1,142 @@
+# coding: utf-8
+
+import json
+import os
+from multiprocessing import Pool
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils.encoding import force_text
+
+from zds.mp.models import PrivatePost
+from zds.utils.models import Comment
+from zds.utils.templatetags.emarkdown import render_markdown
+
+# `text_html` of every `Comment` subclass (forum posts, content reactions) is stored in the `Comment` table
+MODELS = {
+    'comment': Comment,
+    'privatepost': PrivatePost,
+}
+
+
+def render_row(row):
+    """
+    Render the text of a row. Called in the worker processes, which never touch the database.
+
+    Unlike the `emarkdown` filter, a failure is not rendered as an error message, which would replace the stored html.
+
+    :param tuple row: `(pk, text)`
+    :return: `(pk, html, None)`, or `(pk, None, error)` if the text could not be rendered
+    :rtype: tuple
+    """
+    pk, text = row
+    try:
+        return pk, force_text(render_markdown(text)), None
+    except Exception as e:
+        return pk, None, u'{}: {}'.format(type(e).__name__, force_text(e, errors='replace'))
+
+
+class Command(BaseCommand):
+    args = '[comment] [privatepost]'
+    help = 'Render again the stored html of comments (forum posts, content reactions) and private posts, ' \
+           'for instance after a ZMarkdown upgrade. Rows are updated one by one, so the site stays available.'
+    # python manage.py rerender_text_html --jobs=4 --resume
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=500,
+                    help='Number of rows read from the database at once.'),
+        make_option('--jobs',
+                    type='int',
+                    dest='jobs',
+                    default=1,
+                    help='Number of processes rendering markdown.'),
+        make_option('--state-file',
+                    dest='state_file',
+                    default='rerender_text_html.json',
+                    help='File where the progress is saved after each batch.'),
+        make_option('--resume',
+                    action='store_true',
+                    dest='resume',
+                    default=False,
+                    help='Start after the last row saved in the state file instead of from the beginning.'),
+    )
+
+    def handle(self, *args, **options):
+        names = args or sorted(MODELS.keys())
+        for name in names:
+            if name not in MODELS:
+                self.stderr.write(u'Unknown model "{}", choose among: {}'.format(name, ', '.join(sorted(MODELS))))
+                return
+
+        state = {}
+        if options['resume'] and os.path.exists(options['state_file']):
+            with open(options['state_file']) as state_file:
+                state = json.load(state_file)
+
+        pool = None
+        if options['jobs'] > 1:
+            # the workers must not share the database connection of this process
+            connection.close()
+            pool = Pool(options['jobs'])
+
+        try:
+            for name in names:
+                self.rerender(name, MODELS[name], state, pool, options)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.stdout.write(u'Done.')
+
+    def rerender(self, name, model, state, pool, options):
+        last_pk = state.get(name, 0)
+        total = model.objects.filter(pk__gt=last_pk).count()
+        done = 0
+        failed = 0
+        self.stdout.write(u'{}: {} rows to render (starting after pk {})'.format(name, total, last_pk))
+
+        while True:
+            rows = list(model.objects
+                        .filter(pk__gt=last_pk)
+                        .order_by('pk')
+                        .values_list('pk', 'text', 'text_html')[:options['batch_size']])
+            if not rows:
+                break
+
+            stored = {pk: html for pk, _, html in rows}
+            to_render = [(pk, text) for pk, text, _ in rows]
+            if pool is not None:
+                rendered = pool.map(render_row, to_render, chunksize=max(1, len(to_render) // (4 * options['jobs'])))
+            else:
+                rendered = [render_row(row) for row in to_render]
+
+            updated = 0
+            for pk, html, error in rendered:
+                if error is not None:
+                    # the stored html is kept
+                    self.stderr.write(u'{} {}: unable to render the text ({}), skipped'.format(name, pk, error))
+                    failed += 1
+                elif html != stored[pk]:
+                    model.objects.filter(pk=pk).update(text_html=html)
+                    updated += 1
+
+            last_pk = rows[-1][0]
+            done += len(rows)
+            state[name] = last_pk
+            self.save_state(state, options['state_file'])
+            self.stdout.write(u'{}: {}/{} rows ({} updated in this batch)'.format(name, done, total, updated))
+
+        if failed:
+            self.stderr.write(u'{}: {} rows could not be rendered, their html was not changed'.format(name, failed))
+
+    @staticmethod
+    def save_state(state, path):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as state_file:
+            json.dump(state, state_file)
+        os.rename(temp_path, path)
@@ -0,0 +1,48 @@
+# coding: utf-8
+
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from zds.utils.outbox import send_queued_emails, get_outbox_stats
+
+
+class Command(BaseCommand):
+    help = 'Send the notification e-mails waiting in the outbox, in batches.'
+    # python manage.py send_emails --loop
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=None,
+                    help='Number of e-mails sent over a single connection.'),
+        make_option('--rate',
+                    type='float',
+                    dest='rate',
+                    default=None,
+                    help='Maximum number of e-mails sent per second, 0 for no limit.'),
+        make_option('--loop',
+                    action='store_true',
+                    dest='loop',
+                    default=False,
+                    help='Keep waiting for new e-mails instead of stopping once the outbox is empty.'),
+    )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or settings.ZDS_APP['outbox']['batch_size']
+
+        while True:
+            fetched, sent = send_queued_emails(batch_size, options['rate'])
+            if int(options['verbosity']) > 1 and fetched:
+                self.stdout.write(u'{} e-mails sent out of {}.'.format(sent, fetched))
+            # the e-mails which failed are retried later: a full batch means that more e-mails may be due
+            if fetched < batch_size:
+                if not options['loop']:
+                    break
+                time.sleep(settings.ZDS_APP['outbox']['interval'])
+
+        stats = get_outbox_stats()
+        self.stdout.write(u'Outbox: {sent} sent, {retried} retried, {failed} given up.'.format(**stats))
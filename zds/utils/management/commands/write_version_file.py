@@ -0,0 +1,19 @@
+# coding: utf-8
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from zds.utils.context_processor import write_version_file
+
+
+class Command(BaseCommand):
+    help = 'Write the git version of the site in ZDS_APP["site"]["version_file"] (to run at each deployment).'
+    # python manage.py write_version_file
+
+    def handle(self, *args, **options):
+        version = write_version_file()
+        if version is None:
+            raise CommandError(u'The git version cannot be read, no version is written.')
+        else:
+            self.stdout.write(u'Version {}/{} written in {}.'.format(
+                version['branch'], version['commit'], settings.ZDS_APP['site']['version_file']))
@@ -1,15 +1,27 @@
+import os
+from datetime import datetime
+from StringIO import StringIO
+
+from django.core import mail
 from django.core.management import call_command
+from django.conf import settings
 from django.test import TestCase
+from mock import patch
 
 from django.contrib.auth.models import User, Permission
 from zds.member.models import Profile
-from zds.forum.models import Forum, Topic, Category as FCategory
+from zds.forum.models import Forum, Topic, Post, Category as FCategory
 from zds.utils.models import Tag, Category as TCategory, CategorySubCategory, SubCategory, \
-    HelpWriting, Licence
+    HelpWriting, Licence, OutboxEmail
 from zds.member.factories import ProfileFactory
 from zds.tutorialv2.models.models_database import PublishableContent, PublishedContent, ContentReaction, \
     Validation as CValidation
 from zds.gallery.models import Gallery, UserGallery
+from zds.forum.factories import CategoryFactory, ForumFactory, TopicFactory, PostFactory
+from zds.mp.factories import PrivateTopicFactory, PrivatePostFactory
+from zds.mp.models import PrivatePost
+from zds.utils.outbox import queue_email
+from zds.utils.templatetags.emarkdown import emarkdown
 
 
 class CommandsTestCase(TestCase):
@@ -55,3 +67,68 @@ class CommandsTestCase(TestCase):
 
         result = self.client.get("/?prof", follow=True)
         self.assertEqual(result.status_code, 200)
+
+    def test_rerender_text_html(self):
+        profile = ProfileFactory()
+        forum = ForumFactory(category=CategoryFactory(position=1), position_in_category=1)
+        topic = TopicFactory(forum=forum, author=profile.user)
+        post = PostFactory(topic=topic, author=profile.user, position=1, text=u'Un **message**', text_html=u'old')
+        private_topic = PrivateTopicFactory(author=profile.user)
+        private_post = PrivatePostFactory(privatetopic=private_topic, author=profile.user, position_in_topic=1,
+                                          text=u'Un *MP*', text_html=u'old')
+
+        state_file = os.path.join(settings.BASE_DIR, 'rerender-test-state.json')
+        call_command('rerender_text_html', state_file=state_file, batch_size=1)
+        self.assertEqual(emarkdown(u'Un **message**'), Post.objects.get(pk=post.pk).text_html)
+        self.assertEqual(emarkdown(u'Un *MP*'), PrivatePost.objects.get(pk=private_post.pk).text_html)
+
+        # when resuming, rows already rendered are skipped
+        Post.objects.filter(pk=post.pk).update(text_html=u'old')
+        call_command('rerender_text_html', 'comment', state_file=state_file, resume=True)
+        self.assertEqual(u'old', Post.objects.get(pk=post.pk).text_html)
+
+        os.remove(state_file)
+
+    def test_rerender_text_html_keeps_the_html_on_failure(self):
+        profile = ProfileFactory()
+        forum = ForumFactory(category=CategoryFactory(position=1), position_in_category=1)
+        topic = TopicFactory(forum=forum, author=profile.user)
+        post = PostFactory(topic=topic, author=profile.user, position=1, text=u'Un **message**', text_html=u'old')
+
+        state_file = os.path.join(settings.BASE_DIR, 'rerender-test-state.json')
+        stderr = StringIO()
+        with patch('zds.utils.management.commands.rerender_text_html.render_markdown', side_effect=ValueError):
+            call_command('rerender_text_html', 'comment', state_file=state_file, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(u'old', Post.objects.get(pk=post.pk).text_html)
+        self.assertIn(u'comment {}'.format(post.pk), stderr.getvalue())
+
+        os.remove(state_file)
+
+    def test_send_emails(self):
+        queue_email('membre@example.com', u'Nouveau message', 'email/mp/new',
+                    {'username': 'membre', 'url': 'http://example.com/', 'author': 'auteur', 'site_name': 'ZdS'})
+        queue_email('autre@example.com', u'Gabarit inexistant', 'email/does_not_exist', {})
+        self.assertEqual(0, len(mail.outbox))
+
+        call_command('send_emails', rate=0, stdout=StringIO())
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_send_emails_after_a_failure(self):
+        # a full batch with only a failure does not stop the command
+        queue_email('autre@example.com', u'Gabarit inexistant', 'email/does_not_exist', {})
+        queue_email('membre@example.com', u'Nouveau message', 'email/mp/new',
+                    {'username': 'membre', 'url': 'http://example.com/', 'author': 'auteur', 'site_name': 'ZdS'})
+
+        call_command('send_emails', rate=0, batch_size=1, stdout=StringIO())
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual(['membre@example.com'], mail.outbox[0].to)
+        self.assertEqual(['membre@example.com'], mail.outbox[0].to)
+        self.assertIn('auteur', mail.outbox[0].body)
+
+        # the e-mail which can not be rendered is kept to be tried again later
+        failed = OutboxEmail.objects.get()
+        self.assertEqual('autre@example.com', failed.recipient)
+        self.assertEqual(1, failed.attempts)
+        self.assertGreater(failed.next_attempt, datetime.now())
+        call_command('send_emails', rate=0, stdout=StringIO())
+        self.assertEqual(1, len(mail.outbox))
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0002_comment_update_index_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('recipient', models.EmailField(max_length=254, verbose_name=b'Destinataire')),
+                ('subject', models.CharField(max_length=255, verbose_name=b'Sujet')),
+                ('template', models.CharField(max_length=100, verbose_name=b'Gabarit')),
+                ('context', models.TextField(verbose_name=b'Contexte du gabarit')),
+                ('pubdate', models.DateTimeField(auto_now_add=True, verbose_name=b'Date de cr\xc3\xa9ation')),
+                ('attempts', models.IntegerField(default=0, verbose_name=b"Nombre d'essais")),
+                ('next_attempt', models.DateTimeField(default=datetime.datetime.now, verbose_name=b'Date du prochain essai', db_index=True)),
+                ('last_error', models.TextField(verbose_name=b'Derni\xc3\xa8re erreur', blank=True)),
+            ],
+            options={
+                'verbose_name': 'Courriel en attente',
+                'verbose_name_plural': 'Courriels en attente',
+            },
+            bases=(models.Model,),
+        ),
+    ]
@@ -1,5 +1,8 @@
 # coding: utf-8
 import hashlib
+import os
+
+from django.db import connection, transaction, IntegrityError
 
 THUMB_MAX_WIDTH = 80
 THUMB_MAX_HEIGHT = 80
@@ -28,6 +31,38 @@ def content_has_changed(filenames, md5):
     return md5 != compute_hash(filenames)
 
 
+def remove_least_recently_used(directories, max_size):
+    """Remove the least recently modified files of a file cache until it fits in its maximum size. The files whose name
+    starts with a dot (being written) are ignored.
+
+    :param directories: the directories of the cache
+    :type directories: list
+    :param max_size: maximum size of the cache, in bytes
+    :type max_size: int
+    """
+    files = []
+    for directory in directories:
+        for name in os.listdir(directory):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(size for __, size, __ in files)
+    for __, size, path in sorted(files):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total_size -= size
+
+
 def has_changed(instance, field, manager='objects'):
     """Returns true if a field has changed in a model May be used in a
     model.save() method."""
@@ -36,3 +71,35 @@ def has_changed(instance, field, manager='objects'):
     manager = getattr(instance.__class__, manager)
     old = getattr(manager.get(pk=instance.pk), field)
     return not getattr(instance, field) == old
+
+
+def upsert(model, keys, values):
+    """Insert a row, or update the row with the same unique keys if it already exists.
+
+    On MySQL, this is a single ``insert ... on duplicate key update`` statement. On other databases, the row is updated
+    and only inserted if there was nothing to update. Do not rely on the model signals.
+
+    :param model: the model, with a unique constraint on the fields of ``keys``
+    :param keys: values of the unique fields, by column name (``topic_id`` for a foreign key)
+    :type keys: dict
+    :param values: values of the other fields, by column name
+    :type values: dict
+    """
+    columns = list(keys) + list(values)
+    params = [keys[column] for column in keys] + [values[column] for column in values]
+
+    if connection.vendor == 'mysql':
+        quote = connection.ops.quote_name
+        sql = 'insert into {} ({}) values ({}) on duplicate key update {}'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+            ', '.join('{0} = values({0})'.format(quote(column)) for column in values))
+        connection.cursor().execute(sql, params)
+    elif model.objects.filter(**keys).update(**values) == 0:
+        try:
+            with transaction.atomic():
+                model.objects.create(**dict(zip(columns, params)))
+        except IntegrityError:
+            # inserted by a concurrent request in the meantime
+            model.objects.filter(**keys).update(**values)
@@ -3,6 +3,7 @@
 import os
 import string
 import uuid
+from datetime import datetime
 
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
@@ -296,3 +297,25 @@ class HelpWriting(models.Model):
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title)
         super(HelpWriting, self).save(*args, **kwargs)
+
+
+class OutboxEmail(models.Model):
+
+    """An e-mail waiting to be sent by the `send_emails` command (see `zds.utils.outbox`)."""
+    class Meta:
+        verbose_name = 'Courriel en attente'
+        verbose_name_plural = 'Courriels en attente'
+
+    recipient = models.EmailField('Destinataire', max_length=254)
+    subject = models.CharField('Sujet', max_length=255)
+    # rendered with ".html" and ".txt" extensions
+    template = models.CharField('Gabarit', max_length=100)
+    # JSON dictionary
+    context = models.TextField('Contexte du gabarit')
+    pubdate = models.DateTimeField('Date de création', auto_now_add=True)
+    attempts = models.IntegerField('Nombre d\'essais', default=0)
+    next_attempt = models.DateTimeField('Date du prochain essai', default=datetime.now, db_index=True)
+    last_error = models.TextField('Dernière erreur', blank=True)
+
+    def __unicode__(self):
+        return u'<Courriel "{0}" pour {1}>'.format(self.subject, self.recipient)
@@ -6,7 +6,9 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _
 
-from zds.mp.models import PrivateTopic, PrivatePost, PrivateTopicRead
+from zds.mp.models import PrivateTopic, PrivatePost, PrivateTopicRead, mark_unread
+from zds.utils.outbox import queue_email
+from zds.utils.signals import new_message
 from zds.utils.templatetags.emarkdown import emarkdown
 
 
@@ -81,6 +83,8 @@ def send_message_mp(
 
     n_topic.last_message = post
     n_topic.save()
+    mark_unread(n_topic)
+    new_message.send(sender=PrivatePost, message=post)
 
     # send email
     if send_by_mail:
@@ -121,22 +125,10 @@ def send_email(author, n_topic, to, pos):
             context = {
                 'username': to.username,
                 'url': settings.ZDS_APP['site']['url'] + n_topic.get_absolute_url(),
-                'author': author,
+                'author': author.username,
                 'site_name': settings.ZDS_APP['site']['litteral_name']
             }
-            message_html = render_to_string('email/mp/new.html', context)
-            message_txt = render_to_string('email/mp/new.txt', context)
-
             subject = u"{} - {} : {}".format(settings.ZDS_APP['site']['litteral_name'],
                                              _(u'Message Privé'),
                                              n_topic.title)
-
-            from_email = u"{} <{}>".format(settings.ZDS_APP['site']['litteral_name'],
-                                           settings.ZDS_APP['site']['email_noreply'])
-
-            msg = EmailMultiAlternatives(subject, message_txt, from_email, [to.email])
-            msg.attach_alternative(message_html, "text/html")
-            try:
-                msg.send()
-            except:
-                msg = None
+            queue_email(to.email, subject, 'email/mp/new', context)
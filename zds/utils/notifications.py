@@ -0,0 +1,247 @@
+# coding: utf-8
+
+"""
+Resolution of the unread messages displayed in the notification menu.
+
+The first unread message of every followed topic and content is found with a fixed number of queries, whatever the
+number of followed items.
+
+The notification menu of a user is cached, part by part (see `get_cached_notifications()`). Each part is invalidated
+by the signals of `zds.utils.signals`, only for the users concerned: a new post in a topic invalidates the followers
+of this topic, reading a topic invalidates the reader.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from zds.forum.models import TopicFollowed, TopicRead, Post, Topic
+from zds.mp.models import PrivateTopic, PrivatePost
+from zds.tutorialv2.models.models_database import ContentRead, ContentReaction, PublishableContent
+from zds.utils.models import Alert
+from zds.utils.signals import new_message, content_read, content_followed
+
+# Parts of the notification menu
+PRIVATE_TOPICS = 'privatetopics'
+TOPICS = 'topics'
+FOLLOWED_TOPICS = 'followed_topics'
+ALERTS = 'alerts'  # shared by all the staff members
+
+# For each topic followed by the user (first parameter), the first post after the last post read.
+FIRST_UNREAD_POSTS_SQL = '''
+    select fp.comment_ptr_id
+    from forum_post fp
+    inner join utils_comment fc on fc.id = fp.comment_ptr_id
+    inner join (
+        select p.topic_id as topic_id, min(c.position) as position
+        from forum_post p
+        inner join utils_comment c on c.id = p.comment_ptr_id
+        inner join (
+            select r.topic_id as topic_id, max(rc.position) as position
+            from forum_topicread r
+            inner join forum_topicfollowed tf on tf.topic_id = r.topic_id and tf.user_id = r.user_id
+            inner join utils_comment rc on rc.id = r.post_id
+            where r.user_id = %s
+            group by r.topic_id
+        ) lr on lr.topic_id = p.topic_id
+        where c.position > lr.position
+        group by p.topic_id
+    ) fu on fu.topic_id = fp.topic_id and fu.position = fc.position'''
+
+# For each content read by the user (first parameter), the first reaction after the last reaction read (or the first
+# reaction of the content if the user never read one).
+FIRST_UNREAD_NOTES_SQL = '''
+    select min(cr.comment_ptr_id)
+    from tutorialv2_contentreaction cr
+    inner join (
+        select r.content_id as content_id, max(r.note_id) as note_id
+        from tutorialv2_contentread r
+        where r.user_id = %s
+        group by r.content_id
+    ) lr on lr.content_id = cr.related_content_id
+    where cr.comment_ptr_id > coalesce(lr.note_id, 0)
+    group by cr.related_content_id'''
+
+
+def get_unread_topics(user):
+    """
+    Find the first unread post of each topic followed by the user whose last message is not read yet.
+    Done in two queries.
+
+    :param user: the user
+    :return: a list of dictionaries (`pubdate`, `author`, `title` and `url` keys), one per topic.
+    :rtype: list
+    """
+    topics_followed = TopicFollowed.objects.filter(user=user).values('topic')
+
+    unread_topics = {}
+    for topic_read in TopicRead.objects\
+            .filter(user=user, topic__in=topics_followed)\
+            .exclude(post=F('topic__last_message'))\
+            .select_related('topic', 'topic__last_message', 'topic__last_message__author'):
+        unread_topics[topic_read.topic_id] = topic_read.topic
+
+    if not unread_topics:
+        return []
+
+    first_unread_posts = {}
+    for post in Post.objects\
+            .select_related('author')\
+            .extra(where=['forum_post.comment_ptr_id in ({})'.format(FIRST_UNREAD_POSTS_SQL)], params=[user.pk]):
+        first_unread_posts[post.topic_id] = post
+
+    posts_unread = []
+    for topic_pk, topic in unread_topics.items():
+        post = first_unread_posts.get(topic_pk, topic.last_message)
+        post.topic = topic  # avoid one query per post to build the url
+        posts_unread.append({'pubdate': post.pubdate,
+                             'author': post.author,
+                             'title': topic.title,
+                             'url': post.get_absolute_url()})
+    return posts_unread
+
+
+def get_unread_contents(user):
+    """
+    Find the first unread reaction of each public content the user reacted to, or is an author of, whose last
+    reaction is not read yet. Done in four queries.
+
+    :param user: the user
+    :return: a list of dictionaries (`pubdate`, `author`, `title` and `url` keys), one per content.
+    :rtype: list
+    """
+    unread_contents = {}
+    last_read_notes = {}
+    for read in ContentRead.objects\
+            .filter(user=user)\
+            .exclude(note__pk=F('content__last_note__pk'))\
+            .select_related('content', 'content__public_version', 'note', 'note__author'):
+        unread_contents[read.content_id] = read.content
+        last_note = last_read_notes.get(read.content_id)
+        if read.note and (last_note is None or read.note.pubdate > last_note.pubdate):
+            last_read_notes[read.content_id] = read.note
+
+    if not unread_contents:
+        return []
+
+    followed_pks = set(ContentReaction.objects
+                       .filter(author=user, related_content__public_version__isnull=False)
+                       .values_list('related_content__pk', flat=True))
+    followed_pks |= set(PublishableContent.authors.through.objects
+                        .filter(user=user, publishablecontent__pk__in=unread_contents.keys())
+                        .values_list('publishablecontent__pk', flat=True))
+
+    first_unread_notes = {}
+    for note in ContentReaction.objects\
+            .select_related('author')\
+            .extra(where=['tutorialv2_contentreaction.comment_ptr_id in ({})'.format(FIRST_UNREAD_NOTES_SQL)],
+                   params=[user.pk]):
+        first_unread_notes[note.related_content_id] = note
+
+    notes_unread = []
+    for content_pk, content in unread_contents.items():
+        if content_pk not in followed_pks:
+            continue
+        note = first_unread_notes.get(content_pk, last_read_notes.get(content_pk))
+        if note is None:
+            continue
+        note.related_content = content  # avoid one query per note to build the url
+        notes_unread.append({'pubdate': note.pubdate,
+                             'author': note.author,
+                             'title': content.title,
+                             'url': note.get_absolute_url()})
+    return notes_unread
+
+
+def get_notifications_key(part, user=None):
+    if user is None:
+        return 'notifications:{}'.format(part)
+    return 'notifications:{}:{}'.format(part, user.pk)
+
+
+def get_cached_notifications(part, user, compute):
+    """
+    Get a part of the notification menu from the cache, or compute it and cache it.
+
+    :param str part: the part of the menu (`PRIVATE_TOPICS`, `TOPICS`, `FOLLOWED_TOPICS` or `ALERTS`)
+    :param user: the user, `None` for the parts shared by every user
+    :param compute: function called with `user` to compute the value when it is not cached
+    :return: the value of this part of the menu
+    """
+    key = get_notifications_key(part, user)
+    value = cache.get(key)
+    if value is None:
+        value = compute(user)
+        cache.set(key, value, settings.ZDS_APP['notifications']['cache_timeout'])
+    return value
+
+
+def invalidate_notifications(user_pks, *parts):
+    """
+    Drop some parts of the cached notification menu of some users.
+
+    :param user_pks: primary keys of the users
+    :param parts: the parts of the menu to invalidate
+    """
+    keys = ['notifications:{}:{}'.format(part, pk) for pk in set(user_pks) for part in parts]
+    if keys:
+        cache.delete_many(keys)
+
+
+@receiver(new_message, sender=Post)
+def invalidate_topic_followers(sender, message, **kwargs):
+    followers = TopicFollowed.objects.filter(topic__pk=message.topic_id).values_list('user__pk', flat=True)
+    invalidate_notifications(followers, TOPICS, FOLLOWED_TOPICS)
+
+
+@receiver(new_message, sender=PrivatePost)
+def invalidate_private_topic_participants(sender, message, **kwargs):
+    topic = message.privatetopic
+    participants = list(topic.participants.values_list('pk', flat=True)) + [topic.author_id]
+    invalidate_notifications(participants, PRIVATE_TOPICS)
+
+
+@receiver(new_message, sender=ContentReaction)
+def invalidate_content_followers(sender, message, **kwargs):
+    content = message.related_content
+    followers = list(ContentReaction.objects
+                     .filter(related_content__pk=content.pk)
+                     .values_list('author__pk', flat=True)
+                     .distinct())
+    followers += list(content.authors.values_list('pk', flat=True))
+    invalidate_notifications(followers, TOPICS)
+
+
+@receiver(content_read, sender=Topic)
+@receiver(content_read, sender=PublishableContent)
+def invalidate_reader_topics(sender, instance, user, **kwargs):
+    invalidate_notifications([user.pk], TOPICS)
+
+
+@receiver(content_read, sender=PrivateTopic)
+def invalidate_reader_private_topics(sender, instance, user, **kwargs):
+    invalidate_notifications([user.pk], PRIVATE_TOPICS)
+
+
+@receiver(content_followed, sender=Topic)
+def invalidate_follower_topics(sender, instance, user, **kwargs):
+    invalidate_notifications([user.pk], TOPICS, FOLLOWED_TOPICS)
+
+
+@receiver(m2m_changed, sender=PrivateTopic.participants.through)
+def invalidate_new_or_old_participants(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove') and pk_set and isinstance(instance, PrivateTopic):
+        invalidate_notifications(pk_set, PRIVATE_TOPICS)
+
+
+@receiver(post_delete, sender=PrivateTopic)
+def invalidate_deleted_private_topic_author(sender, instance, **kwargs):
+    invalidate_notifications([instance.author_id], PRIVATE_TOPICS)
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def invalidate_alerts(sender, **kwargs):
+    cache.delete(get_notifications_key(ALERTS))
@@ -0,0 +1,123 @@
+# coding: utf-8
+
+"""
+Outbox of the notification e-mails.
+
+The e-mails are queued during the request with `queue_email()`, then rendered and sent in batches by the
+`send_emails` command, each batch over a single SMTP connection. An e-mail which can not be sent is tried again later,
+up to `ZDS_APP['outbox']['max_attempts']` times.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils.encoding import force_text
+
+from zds.utils.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# counters kept in the cache, shared by every worker
+METRICS = ('sent', 'retried', 'failed')
+
+
+def get_from_email():
+    return u'{} <{}>'.format(settings.ZDS_APP['site']['litteral_name'], settings.ZDS_APP['site']['email_noreply'])
+
+
+def queue_email(recipient, subject, template, context):
+    """
+    Put an e-mail in the outbox.
+
+    :param str recipient: e-mail address of the recipient
+    :param str subject: subject of the e-mail
+    :param str template: template of the e-mail, without extension (both ``.html`` and ``.txt`` are rendered)
+    :param dict context: context of the template, which must be serializable in JSON
+    """
+    OutboxEmail.objects.create(recipient=recipient, subject=subject, template=template, context=json.dumps(context))
+
+
+def count(metric, value=1):
+    key = 'outbox:{}'.format(metric)
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        cache.set(key, value, None)
+
+
+def get_outbox_stats():
+    """
+    :return: the number of e-mails sent, retried and given up since the counters were created
+    :rtype: dict
+    """
+    return {metric: cache.get('outbox:{}'.format(metric), 0) for metric in METRICS}
+
+
+def build_email(email, connection):
+    context = json.loads(email.context)
+    message_txt = render_to_string(email.template + '.txt', context)
+    message_html = render_to_string(email.template + '.html', context)
+
+    msg = EmailMultiAlternatives(email.subject, message_txt, get_from_email(), [email.recipient],
+                                 connection=connection)
+    msg.attach_alternative(message_html, 'text/html')
+    return msg
+
+
+def send_queued_emails(batch_size=None, rate=None):
+    """
+    Send a batch of the e-mails of the outbox whose sending is due, over a single connection.
+
+    :param int batch_size: maximum number of e-mails sent, `ZDS_APP['outbox']['batch_size']` by default
+    :param float rate: maximum number of e-mails sent per second, `ZDS_APP['outbox']['rate']` by default
+    :return: the number of e-mails taken from the outbox (the batch is full if it is `batch_size`), and the number of
+        e-mails sent
+    :rtype: tuple
+    """
+    config = settings.ZDS_APP['outbox']
+    batch_size = batch_size or config['batch_size']
+    rate = config['rate'] if rate is None else rate
+
+    emails = list(OutboxEmail.objects
+                  .filter(next_attempt__lte=datetime.now(), attempts__lt=config['max_attempts'])
+                  .order_by('next_attempt', 'pk')[:batch_size])
+    if not emails:
+        return 0, 0
+
+    sent = []
+    connection = get_connection()
+    try:
+        for email in emails:
+            if sent and rate:
+                time.sleep(1.0 / rate)
+            try:
+                # does nothing if the connection is already open
+                connection.open()
+                build_email(email, connection).send()
+            except Exception as e:
+                email.attempts += 1
+                email.last_error = u'{}: {}'.format(type(e).__name__, force_text(e, errors='replace'))
+                delay = config['retry_delay'] * 2 ** (email.attempts - 1)
+                email.next_attempt = datetime.now() + timedelta(seconds=delay)
+                email.save()
+                given_up = email.attempts >= config['max_attempts']
+                count('failed' if given_up else 'retried')
+                logger.warning(u'Unable to send the e-mail %s to %s (attempt %s): %s',
+                               email.pk, email.recipient, email.attempts, email.last_error)
+                # the connection may be broken, open a new one for the next e-mail
+                connection.close()
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+        OutboxEmail.objects.filter(pk__in=sent).delete()
+        if sent:
+            count('sent', len(sent))
+
+    return len(emails), len(sent)
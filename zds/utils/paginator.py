@@ -1,5 +1,7 @@
 # coding: utf-8
 
+from django.core.cache import cache
+from django.db.models import Max, Q
 from django.views.generic import ListView
 from django.views.generic.list import MultipleObjectMixin
 from django.core.paginator import Paginator, EmptyPage
@@ -8,8 +10,139 @@ from django.http import Http404
 from zds.settings import ZDS_APP
 
 
+class ZdSPaginator(Paginator):
+
+    def get_previous_item(self, page):
+        """
+        :return: the last item of the page before `page`, `None` for the first page
+        """
+        if page.number == 1:
+            return None
+        return self.object_list[(page.number - 1) * self.per_page - 1]
+
+
+class PositionPaginator(ZdSPaginator):
+    """
+    Paginate items numbered from 1 (as the posts of a topic): the page `n` holds the items whose positions are between
+    `(n - 1) * per_page + 1` and `n * per_page`. A page is fetched by its range of positions, with the index of the
+    positions, and the items are neither counted nor skipped up to the page. The page of an item is known from its
+    position (see `Post.get_absolute_url()`), even if some positions are missing.
+    """
+
+    def __init__(self, object_list, per_page, position_field='position', last_position=None, **kwargs):
+        """
+        :param position_field: the field of the positions
+        :param last_position: the position of the last item, if known (otherwise, it is looked for in `object_list`)
+        """
+        super(PositionPaginator, self).__init__(object_list, per_page, **kwargs)
+        self.position_field = position_field
+        self._count = last_position
+
+    def _get_count(self):
+        if self._count is None:
+            self._count = self.object_list.aggregate(last=Max(self.position_field))['last'] or 0
+        return self._count
+    count = property(_get_count)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list.filter(**{
+            self.position_field + '__gt': bottom,
+            self.position_field + '__lte': bottom + self.per_page,
+        })
+        return self._get_page(object_list, number, self)
+
+    def get_previous_item(self, page):
+        if page.number == 1:
+            return None
+        return self.object_list\
+            .filter(**{self.position_field + '__lte': (page.number - 1) * self.per_page})\
+            .order_by('-' + self.position_field)\
+            .first()
+
+
+class SeekPaginator(ZdSPaginator):
+    """
+    Paginate a list by seeking the first item of the page in the ordering of the list, instead of skipping the items
+    of the previous pages. The number of items and the values of the ordering fields of the first item of each page are
+    kept in the cache, under `cache_key`, for `ZDS_APP['paginator']['seek_cache_timeout']` seconds or until this key
+    is deleted: a page is then fetched from its first item on, with the indexes of the ordering.
+
+    The fields of the ordering must not be null. The primary key is added to the ordering if needed, so that each item
+    has its own place.
+    """
+
+    def __init__(self, object_list, per_page, cache_key, **kwargs):
+        ordering = list(object_list.query.order_by)
+        if 'pk' not in ordering and '-pk' not in ordering:
+            ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+        super(SeekPaginator, self).__init__(object_list.order_by(*ordering), per_page, **kwargs)
+        self.ordering = ordering
+        self.cache_key = cache_key
+        self._pages = None
+
+    def get_pages(self):
+        """
+        :return: the number of items, and the values of the ordering fields of the first item of each page
+        :rtype: tuple
+        """
+        if self._pages is None:
+            self._pages = cache.get(self.cache_key)
+        if self._pages is None:
+            rows = self.object_list\
+                .prefetch_related(None)\
+                .values_list(*[field.lstrip('-') for field in self.ordering])
+            count = 0
+            first_items = []
+            for row in rows.iterator():
+                if count % self.per_page == 0:
+                    first_items.append(row)
+                count += 1
+            self._pages = (count, first_items)
+            cache.set(self.cache_key, self._pages, ZDS_APP['paginator']['seek_cache_timeout'])
+        return self._pages
+
+    def _get_count(self):
+        if self._count is None:
+            self._count = self.get_pages()[0]
+        return self._count
+    count = property(_get_count)
+
+    def get_seek_filter(self, values):
+        """
+        :return: the filter of the items from the one with these values of the ordering fields on
+        :rtype: Q
+        """
+        seek_filter = None
+        for field, value in reversed(zip(self.ordering, values)):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            field = field.lstrip('-')
+            if seek_filter is None:  # the last field, included
+                seek_filter = Q(**{field + '__' + lookup + 'e': value})
+            else:
+                seek_filter = Q(**{field + '__' + lookup: value}) | (Q(**{field: value}) & seek_filter)
+        return seek_filter
+
+    def page(self, number):
+        number = self.validate_number(number)
+        object_list = self.object_list
+        if number > 1:
+            object_list = object_list.filter(self.get_seek_filter(self.get_pages()[1][number - 1]))
+        return self._get_page(object_list[:self.per_page], number, self)
+
+    def get_previous_item(self, page):
+        if page.number == 1:
+            return None
+        return self.object_list\
+            .exclude(self.get_seek_filter(self.get_pages()[1][page.number - 1]))\
+            .reverse()\
+            .first()
+
+
 class ZdSPagingListView(ListView):
     paginator = None
+    paginator_class = ZdSPaginator
     page = 1
 
     def get_context_data(self, **kwargs):
@@ -47,16 +180,13 @@ class ZdSPagingListView(ListView):
         For some list paginated, we would like to display the last item of the previous page.
         This function returns the list paginated with this previous item.
         """
-        original_list = queryset.all()
         items_list = []
         # If necessary, add the last item in the previous page.
-        if self.page.number != 1:
-            last_page = self.paginator.page(self.page.number - 1).object_list
-            last_item = (last_page)[len(last_page) - 1]
-            items_list.append(last_item)
+        previous_item = self.paginator.get_previous_item(self.page)
+        if previous_item is not None:
+            items_list.append(previous_item)
         # Adds all items of the list paginated.
-        for item in original_list:
-            items_list.append(item)
+        items_list.extend(queryset.all())
         return items_list
 
 
@@ -92,7 +222,8 @@ def paginator_range(current, stop, start=1):
 
 
 def make_pagination(
-        context, request, queryset_objs, page_size, context_list_name='object_list', with_previous_item=False):
+        context, request, queryset_objs, page_size, context_list_name='object_list', with_previous_item=False,
+        paginator=None):
     """This function will fill the context to use it for the paginator template, usefull if you cannot use
     `ZdSPagingListView`.
 
@@ -108,9 +239,11 @@ def make_pagination(
     :param page_size: number of objects in a pages (last one from previous page not included!)
     :param context_list_name: control the name of the list object in the context
     :param with_previous_item: if `True`, will include the last object of the previous page to the list of shown objects
+    :param paginator: the paginator of `queryset_objs`, a `ZdSPaginator` by default
     """
 
-    paginator = Paginator(queryset_objs, page_size)
+    if paginator is None:
+        paginator = ZdSPaginator(queryset_objs, page_size)
 
     # retrieve page number
     if "page" in request.GET and request.GET["page"].isdigit():
@@ -126,14 +259,10 @@ def make_pagination(
 
     page_objects_list = page_obj.object_list
 
-    if page_number != 1 and with_previous_item:
-        new_list = []
-        last_page = paginator.page(page_obj.number - 1).object_list
-        last_item = last_page[len(last_page) - 1]
-        new_list.append(last_item)
-        for item in page_objects_list:
-            new_list.append(item)
-        page_objects_list = new_list
+    if with_previous_item:
+        previous_item = paginator.get_previous_item(page_obj)
+        if previous_item is not None:
+            page_objects_list = [previous_item] + list(page_objects_list)
 
     # fill context
     context['paginator'] = paginator
@@ -0,0 +1,14 @@
+# coding: utf-8
+
+from django.dispatch import Signal
+
+# Sent when a message has been posted and its topic is up to date. The sender is the class of the message (`Post`,
+# `PrivatePost` or `ContentReaction`).
+new_message = Signal(providing_args=['message'])
+
+# Sent when a user has marked something as read. The sender is the class of the read object (`Topic`, `PrivateTopic`
+# or `PublishableContent`).
+content_read = Signal(providing_args=['instance', 'user'])
+
+# Sent when a user started or stopped following a topic. The sender is the class of the followed object (`Topic`).
+content_followed = Signal(providing_args=['instance', 'user'])
@@ -1,11 +1,19 @@
 # coding: utf-8
 
+import hashlib
 import re
+import threading
+import time
+from collections import OrderedDict
 
 from django import template
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.encoding import smart_str
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 
+import markdown as zmarkdown
 from markdown import Markdown
 from markdown.extensions.zds import ZdsExtension
 
@@ -20,6 +28,13 @@ Markdown related filters.
 # Constant strings
 __MD_ERROR_PARSING = _(u'Une erreur est survenue dans la génération de texte Markdown. Veuillez rapporter le bug.')
 
+# Parsers ready to be reused, one pool per thread (a parser is not thread-safe)
+_parsers = threading.local()
+
+# Everything that changes the html produced for a given text: the rendered html is cached under a key derived from it
+ZMARKDOWN_VERSION = getattr(zmarkdown, 'version', '')
+RENDERING_SIGNATURE = hashlib.sha1(smart_str(u'{}|{}'.format(ZMARKDOWN_VERSION, sorted(smileys.items())))).hexdigest()
+
 
 def get_markdown_instance(inline=False, js_support=False):
     """
@@ -45,9 +60,200 @@ def get_markdown_instance(inline=False, js_support=False):
     return markdown
 
 
+def _get_parser_pool():
+    """
+    :return: the parser pool of the current thread, a dictionary of lists of parsers keyed by `(inline, js_support)`.
+    :rtype: dict
+    """
+    pool = getattr(_parsers, 'pool', None)
+    if pool is None:
+        pool = _parsers.pool = {}
+    return pool
+
+
+def acquire_markdown_instance(inline=False, js_support=False):
+    """
+    Take a parser from the pool of the current thread, or build a new one if none is available.
+    The parser must be given back with `release_markdown_instance()` once the conversion is done.
+
+    :param bool inline: If `True`, configure parser to parse only inline content.
+    :param bool js_support: Enable JS in generated html.
+    :return: A ZMarkdown parser, not used by anybody else.
+    """
+    parsers = _get_parser_pool().get((inline, js_support))
+    if parsers:
+        return parsers.pop()
+    return get_markdown_instance(inline=inline, js_support=js_support)
+
+
+def release_markdown_instance(markdown, inline=False, js_support=False):
+    """
+    Reset a parser and put it back in the pool of the current thread.
+
+    :param markdown: A parser obtained with `acquire_markdown_instance()`.
+    :param bool inline: the `inline` value used to acquire the parser.
+    :param bool js_support: the `js_support` value used to acquire the parser.
+    """
+    markdown.reset()
+    _get_parser_pool().setdefault((inline, js_support), []).append(markdown)
+
+
+def clear_markdown_pool():
+    """
+    Drop every pooled parser of the current thread (for instance when the smileys changed).
+    """
+    _get_parser_pool().clear()
+
+
+class LocalLRUCache(object):
+    """
+    A small thread-safe in-process cache, which drops the least recently used entry when full.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._entries[key] = value  # mark as most recently used
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MarkdownCache(object):
+    """
+    Cache of rendered html, keyed by a hash of the source text, the parser configuration and the rendering signature
+    (ZMarkdown version and smileys). The shared Django cache (memcached) is used behind an in-process LRU cache.
+
+    The whole cache is invalidated by bumping a generation number stored in the shared cache. Each process checks it
+    again after ``ZDS_APP['markdown']['generation_check_delay']`` seconds.
+    """
+
+    generation_key = 'markdown:generation'
+
+    def __init__(self):
+        self.config = settings.ZDS_APP['markdown']
+        self.local = LocalLRUCache(self.config['local_cache_size'])
+        self._generation = None
+        self._generation_checked_at = 0
+        self.reset_stats()
+
+    @property
+    def shared(self):
+        return caches[self.config['cache_alias']]
+
+    def reset_stats(self):
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    def get_generation(self):
+        """
+        :return: the current generation of the cache, read from the shared cache at most once per check delay.
+        :rtype: int
+        """
+        now = time.time()
+        if self._generation is None or now - self._generation_checked_at > self.config['generation_check_delay']:
+            generation = self.shared.get(self.generation_key)
+            if generation is None:
+                self.shared.add(self.generation_key, 1, None)
+                generation = self.shared.get(self.generation_key) or 1
+            if generation != self._generation:
+                self.local.clear()
+            self._generation = generation
+            self._generation_checked_at = now
+        return self._generation
+
+    def make_key(self, text, inline, js_support):
+        digest = hashlib.sha1()
+        digest.update('{}|{:d}|{:d}|'.format(RENDERING_SIGNATURE, inline, js_support))
+        digest.update(smart_str(text))
+        return 'markdown:{}:{}'.format(self.get_generation(), digest.hexdigest())
+
+    def get_or_render(self, text, inline, js_support, render):
+        """
+        :param render: function called with the same arguments to render the text when it is not cached
+        :return: the html for the given text
+        :rtype: str
+        """
+        if not self.config['cache_enabled']:
+            return render(text, inline, js_support)
+
+        key = self.make_key(text, inline, js_support)
+        html = self.local.get(key)
+        if html is not None:
+            self.stats['local_hits'] += 1
+            return html
+
+        html = self.shared.get(key)
+        if html is not None:
+            self.stats['shared_hits'] += 1
+        else:
+            self.stats['misses'] += 1
+            html = render(text, inline, js_support)
+            self.shared.set(key, html, self.config['cache_timeout'])
+        self.local.set(key, html)
+        return html
+
+    def invalidate(self):
+        """
+        Invalidate every rendered html, in every process.
+        """
+        try:
+            self.shared.incr(self.generation_key)
+        except ValueError:  # the generation is not in the shared cache anymore
+            self.shared.set(self.generation_key, int(time.time()), None)
+        self.local.clear()
+        self._generation = None
+
+
+markdown_cache = MarkdownCache()
+
+
+def get_markdown_cache_stats():
+    """
+    :return: number of local hits, shared hits and misses of the rendering cache of the current process.
+    :rtype: dict
+    """
+    return dict(markdown_cache.stats)
+
+
+def invalidate_markdown_cache():
+    """
+    Drop every cached rendering (to be called when the smileys or the ZMarkdown extension changed).
+    """
+    markdown_cache.invalidate()
+    clear_markdown_pool()
+
+
+def _render_markdown(text, inline, js_support):
+    markdown = acquire_markdown_instance(inline=inline, js_support=js_support)
+    # If the conversion fails, the parser is in an unknown state, so it is not given back to the pool
+    html = markdown.convert(text)
+    release_markdown_instance(markdown, inline=inline, js_support=js_support)
+    return html.encode('utf-8').strip()
+
+
 def render_markdown(text, inline=False, js_support=False):
     """
-    Render a markdown text to html.
+    Render a markdown text to html. The result is cached, see `MarkdownCache`.
 
     :param str text: Text to render.
     :param bool inline: If `True`, parse only inline content.
@@ -55,7 +261,7 @@ def render_markdown(text, inline=False, js_support=False):
     :return: Equivalent html string.
     :rtype: str
     """
-    return get_markdown_instance(inline=inline, js_support=js_support).convert(text).encode('utf-8').strip()
+    return markdown_cache.get_or_render(text, inline, js_support, _render_markdown)
 
 
 @register.filter(needs_autoescape=False)
@@ -4,13 +4,14 @@ from datetime import datetime, timedelta
 import time
 
 from django import template
-from django.db.models import F
 from django.utils.translation import ugettext_lazy as _
 
-from zds.forum.models import TopicFollowed, never_read as never_read_topic, Post, TopicRead
-from zds.mp.models import PrivateTopic
+from zds.forum.models import TopicFollowed, never_read as never_read_topic, Post
+from zds.mp.models import list_unread_privatetopics
 from zds.utils.models import Alert
-from zds.tutorialv2.models.models_database import ContentRead, ContentReaction
+from zds.utils.notifications import get_unread_topics, get_unread_contents, get_cached_notifications, \
+    PRIVATE_TOPICS, TOPICS, FOLLOWED_TOPICS, ALERTS
+from zds.tutorialv2.models.models_database import ContentReaction
 
 register = template.Library()
 
@@ -44,6 +45,10 @@ def humane_delta(value):
 
 @register.filter('followed_topics')
 def followed_topics(user):
+    return get_cached_notifications(FOLLOWED_TOPICS, user, _followed_topics)
+
+
+def _followed_topics(user):
     topicsfollowed = TopicFollowed.objects.select_related("topic").filter(user=user)\
         .order_by('-topic__last_message__pubdate')[:10]
     # This period is a map for link a moment (Today, yesterday, this week, this month, etc.) with
@@ -80,51 +85,11 @@ def comp(dated_element1, dated_element2):
 
 @register.filter('interventions_topics')
 def interventions_topics(user):
-    topicsfollowed = TopicFollowed.objects.filter(user=user).values("topic").distinct().all()
-
-    topics_never_read = TopicRead.objects\
-        .filter(user=user)\
-        .filter(topic__in=topicsfollowed)\
-        .select_related("topic")\
-        .exclude(post=F('topic__last_message')).all()
-
-    content_followed_pk = ContentReaction.objects\
-        .filter(author=user, related_content__public_version__isnull=False)\
-        .values_list('related_content__pk', flat=True)
-
-    content_to_read = ContentRead.objects\
-        .select_related('note')\
-        .select_related('note__author')\
-        .select_related('content')\
-        .select_related('note__related_content__public_version')\
-        .filter(user=user)\
-        .exclude(note__pk=F('content__last_note__pk')).all()
-
-    posts_unread = []
-
-    for top in topics_never_read:
-        content = top.topic.first_unread_post()
-        if content is None:
-            content = top.topic.last_message
-        posts_unread.append({'pubdate': content.pubdate,
-                             'author': content.author,
-                             'title': top.topic.title,
-                             'url': content.get_absolute_url()})
-
-    for content_read in content_to_read:
-        content = content_read.content
-        if content.pk not in content_followed_pk and user not in content.authors.all():
-            continue
-        reaction = content.first_unread_note()
-        if reaction is None:
-            reaction = content.first_note()
-        if reaction is None:
-            continue
-        posts_unread.append({'pubdate': reaction.pubdate,
-                             'author': reaction.author,
-                             'title': content.title,
-                             'url': reaction.get_absolute_url()})
+    return get_cached_notifications(TOPICS, user, _interventions_topics)
+
 
+def _interventions_topics(user):
+    posts_unread = get_unread_topics(user) + get_unread_contents(user)
     posts_unread.sort(cmp=comp)
 
     return posts_unread
@@ -132,27 +97,21 @@ def interventions_topics(user):
 
 @register.filter('interventions_privatetopics')
 def interventions_privatetopics(user):
+    return get_cached_notifications(PRIVATE_TOPICS, user, _interventions_privatetopics)
 
-    # Raw query because ORM doesn't seems to allow this kind of "left outer join" clauses.
-    # Parameters = list with 3x the same ID because SQLite backend doesn't allow map parameters.
-    privatetopics_unread = PrivateTopic.objects.raw(
-        '''
-        select distinct t.*
-        from mp_privatetopic t
-        left outer join mp_privatetopic_participants p on p.privatetopic_id = t.id
-        left outer join mp_privatetopicread r on r.user_id = %s and r.privatepost_id = t.last_message_id
-        where (t.author_id = %s or p.user_id = %s)
-          and r.id is null
-        order by t.pubdate desc''',
-        [user.id, user.id, user.id])
-
-    # "total" re-do the query, but there is no other way to get the length as __len__ is not available on raw queries.
-    topics = list(privatetopics_unread)
+
+def _interventions_privatetopics(user):
+    topics = list(list_unread_privatetopics(user))
     return {'unread': topics, 'total': len(topics)}
 
 
 @register.filter(name='alerts_list')
 def alerts_list(user):
+    # alerts are the same for every staff member
+    return get_cached_notifications(ALERTS, None, _alerts_list)
+
+
+def _alerts_list(user):
     total = []
     alerts = Alert.objects.select_related('author', 'comment').all().order_by('-pubdate')[:10]
     nb_alerts = Alert.objects.count()
@@ -3,6 +3,9 @@
 from django.test import TestCase
 from django.template import Context, Template
 
+from zds.utils.templatetags.emarkdown import render_markdown, acquire_markdown_instance, \
+    release_markdown_instance, invalidate_markdown_cache, get_markdown_cache_stats, markdown_cache, LocalLRUCache
+
 
 class EMarkdownTest(TestCase):
     def setUp(self):
@@ -54,3 +57,61 @@ class EMarkdownTest(TestCase):
                          "##### Titre **2**\n\n"
                          "###### Titre 3\n\n"
                          "&gt; test", tr)
+
+    def test_parser_pool(self):
+        invalidate_markdown_cache()
+
+        # a parser is built on first use, then given back to the pool and reused
+        render_markdown(u'premier message')
+        parser = acquire_markdown_instance()
+        release_markdown_instance(parser)
+        render_markdown(u'second message')
+        self.assertIs(parser, acquire_markdown_instance())
+
+        # parsers are not shared between configurations
+        self.assertIsNot(parser, acquire_markdown_instance(inline=True))
+        self.assertIsNot(parser, acquire_markdown_instance(js_support=True))
+
+        invalidate_markdown_cache()
+
+    def test_pooled_parser_is_reset(self):
+        # state of a previous conversion (footnotes here) does not leak into the next one
+        text = u"Texte[^note]\n\n[^note]: Une note"
+        parser = acquire_markdown_instance()
+        first = parser.convert(text)
+        release_markdown_instance(parser)
+        parser = acquire_markdown_instance()
+        second = parser.convert(text)
+        release_markdown_instance(parser)
+        self.assertEqual(first, second)
+
+    def test_render_cache(self):
+        invalidate_markdown_cache()
+        markdown_cache.reset_stats()
+
+        html = render_markdown(u'Un **message** en cache')
+        self.assertEqual(1, get_markdown_cache_stats()['misses'])
+        self.assertEqual(html, render_markdown(u'Un **message** en cache'))
+        self.assertEqual(1, get_markdown_cache_stats()['local_hits'])
+
+        # the configuration is part of the key
+        render_markdown(u'Un **message** en cache', inline=True)
+        self.assertEqual(2, get_markdown_cache_stats()['misses'])
+
+        # after an invalidation, the text is rendered again
+        key = markdown_cache.make_key(u'Un **message** en cache', False, False)
+        invalidate_markdown_cache()
+        self.assertNotEqual(key, markdown_cache.make_key(u'Un **message** en cache', False, False))
+        self.assertEqual(html, render_markdown(u'Un **message** en cache'))
+        self.assertEqual(3, get_markdown_cache_stats()['misses'])
+
+    def test_local_lru_cache(self):
+        cache = LocalLRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)  # 'b' is the least recently used entry
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(2, len(cache))
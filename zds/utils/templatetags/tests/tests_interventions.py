@@ -4,13 +4,18 @@ from datetime import datetime, timedelta
 
 from django.core.urlresolvers import reverse
 from django.template import Context, Template
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+from django.test.utils import override_settings
 
 from zds.forum.factories import CategoryFactory, ForumFactory, PostFactory, TopicFactory
+from zds.forum.models import TopicFollowed, TopicRead, Topic, mark_read
 from zds.member.factories import ProfileFactory, StaffFactory
 from zds.mp.factories import PrivateTopicFactory, PrivatePostFactory
 from zds.utils.models import Alert
-from zds.utils.templatetags.interventions import alerts_list
+from zds.utils.forums import send_post
+from zds.utils.notifications import get_unread_topics, get_unread_contents, get_notifications_key, TOPICS
+from zds.utils.templatetags.interventions import alerts_list, interventions_topics
 
 
 class InterventionsTest(TestCase):
@@ -112,6 +117,75 @@ class InterventionsTest(TestCase):
         self.assertEqual(u"Plus ancien", tr)
 
 
+class InterventionsTopicsTest(TestCase):
+    """
+    The unread topics of the notification menu must be found with a fixed number of queries.
+    """
+
+    def setUp(self):
+        self.user = ProfileFactory().user
+        self.other = ProfileFactory().user
+        self.forum = ForumFactory(category=CategoryFactory(position=1), position_in_category=1)
+
+    def follow_topic_with_unread_post(self):
+        topic = TopicFactory(forum=self.forum, author=self.other)
+        read_post = PostFactory(topic=topic, author=self.other, position=1)
+        unread_post = PostFactory(topic=topic, author=self.other, position=2)
+        PostFactory(topic=topic, author=self.other, position=3)
+        TopicFollowed(topic=topic, user=self.user).save()
+        TopicRead(topic=topic, post=read_post, user=self.user).save()
+        return unread_post
+
+    def test_first_unread_post(self):
+        unread_post = self.follow_topic_with_unread_post()
+
+        # a followed topic completely read is not listed
+        read_topic = TopicFactory(forum=self.forum, author=self.other)
+        last_post = PostFactory(topic=read_topic, author=self.other, position=1)
+        TopicFollowed(topic=read_topic, user=self.user).save()
+        TopicRead(topic=read_topic, post=last_post, user=self.user).save()
+
+        unread = get_unread_topics(self.user)
+        self.assertEqual(1, len(unread))
+        self.assertEqual(unread_post.get_absolute_url(), unread[0]['url'])
+        self.assertEqual(self.other, unread[0]['author'])
+
+    def test_number_of_queries(self):
+        self.follow_topic_with_unread_post()
+        # 2 queries for the topics, 1 for the contents (none read)
+        with self.assertNumQueries(3):
+            self.assertEqual(1, len(get_unread_topics(self.user) + get_unread_contents(self.user)))
+
+        for _ in range(10):
+            self.follow_topic_with_unread_post()
+        with self.assertNumQueries(3):
+            self.assertEqual(11, len(get_unread_topics(self.user) + get_unread_contents(self.user)))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_invalidation(self):
+        topic = TopicFactory(forum=self.forum, author=self.other)
+        post = PostFactory(topic=topic, author=self.other, position=1)
+        TopicFollowed(topic=topic, user=self.user).save()
+        mark_read(topic, self.user)
+        not_follower = ProfileFactory().user
+
+        self.assertEqual([], interventions_topics(self.user))
+        self.assertEqual([], interventions_topics(not_follower))
+        self.assertIsNotNone(cache.get(get_notifications_key(TOPICS, self.user)))
+
+        # a new post only invalidates the followers of the topic
+        send_post(RequestFactory().get('/'), topic, self.other, u'Une réponse')
+        self.assertIsNone(cache.get(get_notifications_key(TOPICS, self.user)))
+        self.assertIsNotNone(cache.get(get_notifications_key(TOPICS, not_follower)))
+        unread = interventions_topics(self.user)
+        self.assertEqual(1, len(unread))
+        self.assertNotEqual(post.get_absolute_url(), unread[0]['url'])
+
+        # reading the topic invalidates the reader
+        mark_read(Topic.objects.get(pk=topic.pk), self.user)
+        self.assertEqual([], interventions_topics(self.user))
+
+
 class AlertsTest(TestCase):
     """
         This class intend to test the templatetag 'alerts_list'
@@ -4,7 +4,7 @@ from collections import OrderedDict
 from django import template
 from django.conf import settings
 
-from zds.forum.models import Forum, Topic
+from zds.forum.models import Forum, Topic, get_readable_forum_pks
 from zds.tutorialv2.models.models_database import PublishedContent
 from zds.utils.models import CategorySubCategory, Tag
 from django.db.models import Count
@@ -16,15 +16,8 @@ register = template.Library()
 def top_categories(user):
     cats = {}
 
-    forums_pub = Forum.objects.filter(group__isnull=True).select_related("category").distinct().all()
-    if user and user.is_authenticated():
-        forums_prv = Forum\
-            .objects\
-            .filter(group__isnull=False, group__in=user.groups.all())\
-            .select_related("category").distinct().all()
-        forums = list(forums_pub | forums_prv)
-    else:
-        forums = list(forums_pub)
+    readable_forum_pks = get_readable_forum_pks(user)
+    forums = list(Forum.objects.filter(pk__in=readable_forum_pks).select_related("category"))
 
     for forum in forums:
         key = forum.category.title
@@ -36,7 +29,7 @@ def top_categories(user):
     tags = Topic.objects\
         .values_list('tags__pk', flat=True)\
         .distinct()\
-        .filter(forum__in=forums, tags__isnull=False)\
+        .filter(forum__pk__in=readable_forum_pks, tags__isnull=False)\
         .annotate(nb_tags=Count("tags"))\
         .order_by("-nb_tags")[:settings.ZDS_APP['forum']['top_tag_max']]
 